@@ -1,7 +1,8 @@
 import os
-import glob
-import json
-import datetime as dt
+from agents.item_store import default_store
+from agents.db import default_db
+from agents.work_queue import default_queue
+from agents.rl_feedback import reward_stats
 
 def thresholds():
     pr = float(os.environ.get("AUTOMATOR_PRIORITY_THRESHOLD", "0.5"))
@@ -34,84 +35,116 @@ def decide(item, reward):
         return "requeue"
     return "none"
 
-def _today_dir(base):
-    d = dt.datetime.utcnow().strftime("%Y%m%d")
-    p = os.path.join(base, d)
-    os.makedirs(p, exist_ok=True)
-    return p
-
 def _avg_reward():
-    path = os.path.join("logs", "rl_events.log")
     try:
-        if not os.path.exists(path):
-            return None
-        vals = []
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f.readlines()[-200:]:
-                try:
-                    obj = json.loads(line.strip())
-                    if "reward" in obj:
-                        vals.append(float(obj.get("reward")))
-                except Exception:
-                    continue
-        if not vals:
-            return None
-        return sum(vals)/float(len(vals))
+        st = reward_stats()
     except Exception:
         return None
+    if os.environ.get("AUTOMATOR_DYNAMIC_STAT", "mean") == "ewma":
+        return st.get("ewma")
+    return st.get("mean")
 
 def _find_processed_by_id(item_id):
-    pdir = _today_dir(os.path.join("data","processed"))
-    for f in glob.glob(os.path.join(pdir, "item_*.json")):
-        try:
-            with open(f, "r", encoding="utf-8") as fd:
-                obj = json.load(fd)
-            if obj.get("id") == item_id:
-                return f, obj
-        except Exception:
-            continue
-    return None, None
+    # The item's JSON file is the document (audio and metadata writers only
+    # touch the file) with the database's state columns laid over it; items
+    # with no file come from the database alone. Read-only: files the
+    # database has not seen yet are recorded by the next state write.
+    path, obj = default_store().get(item_id)
+    try:
+        db = default_db()
+        if obj is None:
+            return db.get_item(item_id)
+        db.overlay_state(item_id, obj)
+    except Exception:
+        pass
+    return path, obj
 
-def _modify_item(item_id, mutator):
-    path, obj = _find_processed_by_id(item_id)
-    if not path or not obj:
-        return False
+def _mirror_json():
+    return os.environ.get("DB_MIRROR_JSON", "1") != "0"
+
+def _apply(item_id, mutators, reward=None, action=None, enqueue=None):
+    # One item write and one transaction per event: the JSON mirror goes
+    # through a single ItemStore update (unless DB_MIRROR_JSON=0), then the
+    # state columns and, for requeue/queue decisions, the queue entry are
+    # written together. An item the database has not seen yet is inserted
+    # from the updated document.
+    path, obj = None, None
     try:
-        obj = mutator(obj)
-        with open(path, "w", encoding="utf-8") as fo:
-            json.dump(obj, fo, ensure_ascii=False, indent=2)
-        return True
+        store = default_store()
+        if _mirror_json():
+            obj = store.update(item_id, *mutators)
+            path = store.path_for(item_id) if obj is not None else None
+        else:
+            path, obj = store.get(item_id)
+            for m in (mutators if obj is not None else ()):
+                obj = m(obj)
     except Exception:
-        return False
+        pass
+    try:
+        db = default_db()
+        with db.tx() as c:
+            row = db.apply_state(c, item_id, reward, action, (path, obj) if obj is not None else None)
+            if row is not None and enqueue:
+                # requeue/queue decisions become work for the pipeline's
+                # requeue drain, ordered by priority and the latest reward.
+                default_queue().push_tx(c, item_id, enqueue, row[0], reward if reward is not None else row[1])
+        return row is not None or obj is not None
+    except Exception:
+        return obj is not None
 
-def requeue_item(item_id):
-    path, obj = _find_processed_by_id(item_id)
-    if not path or not obj:
-        return False
-    obj["requeue_requested"] = True
+def update_item_fields(item_id, fields):
     try:
-        with open(path, "w", encoding="utf-8") as fo:
-            json.dump(obj, fo, ensure_ascii=False, indent=2)
-        return True
+        return default_store().update_fields(item_id, fields) is not None
     except Exception:
         return False
 
-def set_reward(item_id, reward):
+def _reward(reward):
     def mutate(o):
         r = float(reward)
         o["reward_score"] = r
         o["rl_reward_score"] = r
         return o
-    return _modify_item(item_id, mutate)
+    return mutate
+
+def _requeue(o):
+    o["requeue_requested"] = True
+    return o
+
+def _skip(o):
+    o["skip"] = True
+    return o
+
+def _demote(o):
+    ps = float(o.get("priority_score", 0.0))
+    ps = max(0.0, ps - 0.1)
+    o["priority_score"] = ps
+    o["demote"] = True
+    return o
+
+ACTION_MUTATORS = {
+    "requeue": _requeue,
+    "queue": _requeue,
+    "skip": _skip,
+    "escalate": _demote
+}
+
+def apply_feedback(item_id, reward, action):
+    # The database row is the indexed source of feedback state; the item JSON
+    # keeps a mirror of the same fields for file readers unless
+    # DB_MIRROR_JSON=0.
+    muts = [_reward(reward)]
+    if action in ACTION_MUTATORS:
+        muts.append(ACTION_MUTATORS[action])
+    return _apply(item_id, muts, reward, action, action if action in ("requeue", "queue") else None)
+
+def requeue_item(item_id):
+    return _apply(item_id, [_requeue], action="requeue", enqueue="requeue")
+
+def set_reward(item_id, reward):
+    return _apply(item_id, [_reward(reward)], reward)
 
 def set_skip(item_id):
-    return _modify_item(item_id, lambda o: {**o, "skip": True})
+    return _apply(item_id, [_skip], action="skip")
 
 def set_demote(item_id):
-    def mutate(o):
-        ps = float(o.get("priority_score", 0.0))
-        ps = max(0.0, ps - 0.1)
-        o["priority_score"] = ps
-        o["demote"] = True
-        return o
-    return _modify_item(item_id, mutate)
\ No newline at end of file
+    return _apply(item_id, [_demote], action="escalate")
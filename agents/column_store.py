@@ -0,0 +1,333 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+import threading
+import datetime as dt
+import numpy as np
+from agents.trend import _ts, EPOCH
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DIR = "columns"
+META = "meta.json"
+NUMERIC = {
+    "priority_score": "<f8",
+    "trend_score": "<f8",
+    "confidence": "<f8",
+    "reward_score": "<f8",
+    "audio_duration": "<f8",
+    "timestamp": "<i8",
+    "id_hash": "<u8",
+    "doc_off": "<i8",
+    "doc_len": "<i4",
+}
+CODED = ("category", "language", "polarity", "tone")
+CODE_DTYPE = "<u2"
+
+def epoch_us(s):
+    try:
+        t = dt.datetime.fromisoformat(s)
+        if t.tzinfo is not None:
+            t = t.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    except Exception:
+        t = _ts(s)
+    return (t - EPOCH) // dt.timedelta(microseconds=1)
+
+def id_hash(item_id):
+    return int.from_bytes(hashlib.sha1(str(item_id).encode("utf-8")).digest()[:8], "little")
+
+def _float(x, default=np.nan):
+    try:
+        return float(x) if x is not None else default
+    except (TypeError, ValueError):
+        return default
+
+def _conf(o):
+    c = o.get("confidence_score")
+    if c is None:
+        c = o.get("confidence")
+    return _float(c, 0.5)
+
+def has_columns(day_dir):
+    return os.path.exists(os.path.join(day_dir, DIR, META))
+
+class ColumnStore:
+    # One day of processed items as fixed-width little-endian column files
+    # (<name>.bin) read through np.memmap, plus docs.bin holding each row's
+    # full JSON and keys.jsonl holding [id, file] per row. Low-cardinality
+    # strings are uint16 codes into dictionaries kept in meta.json. Rows are
+    # append-only: a re-appended id shadows its earlier rows, and meta.json
+    # (row count, byte sizes) is the commit point, so a crashed append is
+    # truncated away by the next one. Once shadowed rows pile up past
+    # COLUMN_STORE_COMPACT_RATIO the store is rewritten with the latest rows.
+    def __init__(self, day_dir):
+        self.day = day_dir
+        self.root = os.path.join(day_dir, DIR)
+        self.lock = threading.Lock()
+        self.meta = self._read_meta()
+        self.maps = {}
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.root, META), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {"rows": 0, "docs_bytes": 0, "keys_bytes": 0, "dicts": {c: [] for c in CODED}}
+
+    def _write_meta(self, meta):
+        p = os.path.join(self.root, META)
+        with open(p + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(p + ".tmp", p)
+
+    def _path(self, name):
+        return os.path.join(self.root, name + ".bin")
+
+    def _dtype(self, name):
+        return np.dtype(CODE_DTYPE if name in CODED else NUMERIC[name])
+
+    def __len__(self):
+        return int(self.meta["rows"])
+
+    def refresh(self):
+        self.meta = self._read_meta()
+        self.maps = {}
+        return self
+
+    def column(self, name):
+        # Zero-copy view of one column; only the pages touched are read.
+        n = len(self)
+        if name in self.maps and len(self.maps[name]) == n:
+            return self.maps[name]
+        dtype = self._dtype(name)
+        if n == 0:
+            arr = np.empty(0, dtype=dtype)
+        else:
+            arr = np.memmap(self._path(name), dtype=dtype, mode="r", shape=(n,))
+        self.maps[name] = arr
+        return arr
+
+    def columns(self, names, rows=None):
+        out = {}
+        for n in names:
+            a = self.column(n)
+            out[n] = a if rows is None else a[rows]
+        return out
+
+    def values(self, name, rows=None):
+        # Decoded strings of a coded column, as an object array.
+        codes = self.column(name)
+        if rows is not None:
+            codes = codes[rows]
+        vocab = np.asarray(self.meta["dicts"].get(name) or [""], dtype=object)
+        return vocab[codes]
+
+    def latest(self):
+        # Row numbers holding the newest version of every id, ascending.
+        h = np.asarray(self.column("id_hash"))
+        if not len(h):
+            return np.empty(0, dtype=np.int64)
+        _, first = np.unique(h[::-1], return_index=True)
+        return np.sort(len(h) - 1 - first)
+
+    def _docs(self):
+        if not self.meta["docs_bytes"]:
+            return b""
+        if "docs" not in self.maps or len(self.maps["docs"]) != self.meta["docs_bytes"]:
+            self.maps["docs"] = np.memmap(os.path.join(self.root, "docs.bin"), dtype=np.uint8, mode="r", shape=(self.meta["docs_bytes"],))
+        return self.maps["docs"]
+
+    def doc(self, row):
+        off = int(self.column("doc_off")[row])
+        ln = int(self.column("doc_len")[row])
+        file, obj = json.loads(bytes(self._docs()[off:off+ln]).decode("utf-8"))
+        return os.path.join(self.day, file), obj
+
+    def records(self, rows=None):
+        rows = self.latest() if rows is None else rows
+        for r in np.asarray(rows).tolist():
+            yield self.doc(r)
+
+    def keys(self):
+        # [(id, file)] for every row, read from keys.jsonl in one pass.
+        n = self.meta["keys_bytes"]
+        if not n:
+            return []
+        with open(os.path.join(self.root, "keys.jsonl"), "rb") as f:
+            data = f.read(n)
+        return [tuple(json.loads(line)) for line in data.splitlines() if line]
+
+    def find(self, item_id):
+        h = self.column("id_hash")
+        hits = np.flatnonzero(h == np.uint64(id_hash(item_id)))
+        for r in hits[::-1].tolist():
+            path, obj = self.doc(r)
+            if obj.get("id") == item_id:
+                return path, obj
+        return None, None
+
+    def _code(self, meta, name, value):
+        vocab = meta["dicts"].setdefault(name, [])
+        v = "" if value is None else str(value)
+        try:
+            return vocab.index(v)
+        except ValueError:
+            vocab.append(v)
+            return len(vocab) - 1
+
+    def _lock_file(self):
+        # The directory's .lock, flocked. compact() swaps the directory while
+        # holding it, so a waiter that wakes on the old inode retries.
+        while True:
+            os.makedirs(self.root, exist_ok=True)
+            lf = open(os.path.join(self.root, ".lock"), "a+b")
+            if not fcntl:
+                return lf
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(lf.fileno()), os.stat(os.path.join(self.root, ".lock"))):
+                    return lf
+            except OSError:
+                pass
+            fcntl.flock(lf, fcntl.LOCK_UN)
+            lf.close()
+
+    def _unlock(self, lf):
+        if fcntl:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+        lf.close()
+
+    def append(self, records):
+        # records: [(path, item)]; returns the number of rows added.
+        records = [(p, o) for p, o in records if o and o.get("id") is not None]
+        if not records:
+            return 0
+        with self.lock:
+            lf = self._lock_file()
+            try:
+                meta = self._read_meta()
+                n = int(meta["rows"])
+                docs_at = int(meta["docs_bytes"])
+                cols = {k: [] for k in list(NUMERIC) + list(CODED)}
+                docs = []
+                keys = []
+                off = docs_at
+                for path, o in records:
+                    name = os.path.basename(path) if path else ""
+                    blob = json.dumps([name, o], ensure_ascii=False).encode("utf-8")
+                    docs.append(blob)
+                    keys.append(json.dumps([o.get("id"), name], ensure_ascii=False).encode("utf-8") + b"\n")
+                    cols["priority_score"].append(_float(o.get("priority_score")))
+                    cols["trend_score"].append(_float(o.get("trend_score")))
+                    cols["confidence"].append(_conf(o))
+                    cols["reward_score"].append(_float(o.get("reward_score"), 0.0))
+                    cols["audio_duration"].append(_float(o.get("audio_duration")))
+                    cols["timestamp"].append(epoch_us(o.get("timestamp")))
+                    cols["id_hash"].append(id_hash(o.get("id")))
+                    cols["doc_off"].append(off)
+                    cols["doc_len"].append(len(blob))
+                    off += len(blob)
+                    for c in CODED:
+                        cols[c].append(self._code(meta, c, o.get(c)))
+                for k, vals in cols.items():
+                    dtype = self._dtype(k)
+                    p = self._path(k)
+                    with open(p, "ab") as f:
+                        f.truncate(n * dtype.itemsize)
+                        f.write(np.asarray(vals, dtype=dtype).tobytes())
+                with open(os.path.join(self.root, "docs.bin"), "ab") as f:
+                    f.truncate(docs_at)
+                    f.write(b"".join(docs))
+                with open(os.path.join(self.root, "keys.jsonl"), "ab") as f:
+                    f.truncate(int(meta["keys_bytes"]))
+                    f.write(b"".join(keys))
+                meta["rows"] = n + len(records)
+                meta["docs_bytes"] = off
+                meta["keys_bytes"] = int(meta["keys_bytes"]) + sum(len(k) for k in keys)
+                self._write_meta(meta)
+                self.meta = meta
+                self.maps = {}
+                return len(records)
+            finally:
+                self._unlock(lf)
+
+    def shadowed(self):
+        # Rows that are no longer the latest version of their id.
+        return len(self) - len(self.latest())
+
+    def compact(self):
+        # Rewrites the store with only the latest row per id, in row order,
+        # next to it, then swaps it in; returns the rows dropped.
+        with self.lock:
+            lf = self._lock_file()
+            try:
+                self.refresh()
+                records = list(self.records())
+                dropped = len(self) - len(records)
+                if not dropped:
+                    return 0
+                _swap_in(self.day, records)
+                self.refresh()
+                return dropped
+            finally:
+                self._unlock(lf)
+
+def _swap_in(day_dir, records):
+    # Builds a store for `records` in columns.tmp and replaces the day's store.
+    tmp = os.path.join(day_dir, DIR + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    st = ColumnStore(day_dir)
+    st.root = tmp
+    st.meta = st._read_meta()
+    os.makedirs(tmp, exist_ok=True)
+    st._write_meta(st.meta)
+    st.append(records)
+    final = os.path.join(day_dir, DIR)
+    old = os.path.join(day_dir, DIR + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(final):
+        os.replace(final, old)
+    os.replace(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+
+def compact_ratio():
+    return float(os.environ.get("COLUMN_STORE_COMPACT_RATIO", "2"))
+
+def append_items(day_dir, records):
+    # Keeps a day's column store in step with its JSON files: rows are added
+    # when the day already has a store or COLUMN_STORE=1.
+    if not (os.environ.get("COLUMN_STORE", "0") == "1" or has_columns(day_dir)):
+        return 0
+    try:
+        st = ColumnStore(day_dir)
+        n = st.append(records)
+        ratio = compact_ratio()
+        if ratio > 0 and len(st) > ratio * max(1, len(st.latest())):
+            st.compact()
+        return n
+    except Exception:
+        return 0
+
+def migrate(day_dir):
+    # Builds the store for a day from its item_*.json files in filename
+    # order, next to them, then swaps it in. Holds the store lock throughout,
+    # like append and compact, so no concurrent append is lost in the swap.
+    st = ColumnStore(day_dir)
+    with st.lock:
+        lf = st._lock_file()
+        try:
+            records = []
+            for f in sorted(glob.glob(os.path.join(day_dir, "item_*.json"))):
+                try:
+                    with open(f, "r", encoding="utf-8") as fd:
+                        records.append((f, json.load(fd)))
+                except Exception:
+                    continue
+            _swap_in(day_dir, records)
+            return len(records)
+        finally:
+            st._unlock(lf)
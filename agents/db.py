@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import datetime as dt
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS items (
+        id TEXT PRIMARY KEY,
+        category TEXT,
+        language TEXT,
+        priority_score REAL,
+        reward_score REAL DEFAULT 0,
+        timestamp TEXT,
+        path TEXT,
+        skip INTEGER DEFAULT 0,
+        demote INTEGER DEFAULT 0,
+        requeue_requested INTEGER DEFAULT 0,
+        doc TEXT,
+        updated_at REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS items_category_priority ON items(category, priority_score DESC)",
+    "CREATE INDEX IF NOT EXISTS items_priority ON items(priority_score DESC)",
+    "CREATE INDEX IF NOT EXISTS items_timestamp ON items(timestamp)",
+    """CREATE TABLE IF NOT EXISTS feedback (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id TEXT,
+        type TEXT,
+        reward REAL,
+        action TEXT,
+        event TEXT,
+        ts TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS feedback_item ON feedback(item_id, seq)",
+    "CREATE INDEX IF NOT EXISTS feedback_ts ON feedback(ts)",
+    """CREATE TABLE IF NOT EXISTS requeue (
+        item_id TEXT PRIMARY KEY,
+        action TEXT,
+        priority REAL,
+        reward REAL,
+        enqueued_at REAL,
+        visible_at REAL,
+        attempts INTEGER DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS requeue_order ON requeue(priority DESC, reward DESC, enqueued_at)",
+    "CREATE INDEX IF NOT EXISTS requeue_visible ON requeue(visible_at)",
+]
+
+# Statement texts are constants so each connection's statement cache keeps
+# them compiled; only parameters change between calls.
+UPSERT_ITEM = """INSERT INTO items (id, category, language, priority_score, reward_score, timestamp, path, skip, demote, requeue_requested, doc, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET category=excluded.category, language=excluded.language,
+        priority_score=excluded.priority_score, timestamp=excluded.timestamp,
+        path=COALESCE(excluded.path, items.path), skip=MAX(items.skip, excluded.skip),
+        demote=MAX(items.demote, excluded.demote), requeue_requested=MAX(items.requeue_requested, excluded.requeue_requested),
+        doc=excluded.doc, updated_at=excluded.updated_at"""
+GET_ITEM = "SELECT path, doc, priority_score, reward_score, skip, demote, requeue_requested FROM items WHERE id = ?"
+GET_STATE = "SELECT priority_score, reward_score, skip, demote, requeue_requested FROM items WHERE id = ?"
+SET_REWARD = "UPDATE items SET reward_score = ?, updated_at = ? WHERE id = ?"
+SET_REQUEUE = "UPDATE items SET requeue_requested = 1, updated_at = ? WHERE id = ?"
+CLEAR_REQUEUE = "UPDATE items SET requeue_requested = 0, updated_at = ? WHERE id = ?"
+SET_SKIP = "UPDATE items SET skip = 1, updated_at = ? WHERE id = ?"
+SET_DEMOTE = "UPDATE items SET demote = 1, priority_score = MAX(0.0, COALESCE(priority_score, 0.0) - 0.1), updated_at = ? WHERE id = ?"
+ADD_EVENT = "INSERT INTO feedback (item_id, type, reward, action, event, ts) VALUES (?, ?, ?, ?, ?, ?)"
+RECENT_REWARDS = "SELECT reward FROM feedback WHERE reward IS NOT NULL ORDER BY seq DESC LIMIT ?"
+TOP_ALL = "SELECT id, path, doc, priority_score, reward_score, skip, demote, requeue_requested FROM items WHERE skip = 0 AND priority_score >= ? ORDER BY priority_score DESC LIMIT ?"
+TOP_CATEGORY = "SELECT id, path, doc, priority_score, reward_score, skip, demote, requeue_requested FROM items WHERE category = ? AND skip = 0 AND priority_score >= ? ORDER BY priority_score DESC LIMIT ?"
+
+FLAG_UPDATES = {
+    "requeue": SET_REQUEUE,
+    "queue": SET_REQUEUE,
+    "skip": SET_SKIP,
+    "escalate": SET_DEMOTE
+}
+
+def _merge(doc, priority, reward, skip, demote, requeue):
+    # Item JSON with the state columns laid over it, so callers see the same
+    # fields the per-item files carry.
+    return _overlay(json.loads(doc) if doc else {}, priority, reward, skip, demote, requeue)
+
+def _rows(records, now):
+    rows = []
+    for r in records:
+        path, o = r if isinstance(r, tuple) else (None, r)
+        if not o or o.get("id") is None:
+            continue
+        pr = o.get("priority_score")
+        rows.append((str(o.get("id")), o.get("category"), o.get("language"), float(pr) if pr is not None else None,
+                     float(o.get("reward_score") or 0.0), o.get("timestamp"), path, int(bool(o.get("skip"))), int(bool(o.get("demote"))),
+                     int(bool(o.get("requeue_requested"))), json.dumps(o, ensure_ascii=False), now))
+    return rows
+
+def _overlay(obj, priority, reward, skip, demote, requeue):
+    if priority is not None:
+        obj["priority_score"] = priority
+    if reward is not None:
+        obj["reward_score"] = reward
+        obj["rl_reward_score"] = reward
+    if skip:
+        obj["skip"] = True
+    if demote:
+        obj["demote"] = True
+    if requeue:
+        obj["requeue_requested"] = True
+    return obj
+
+class Database:
+    # SQLite in WAL mode: readers never block the single writer and each
+    # thread gets its own connection, opened on first use.
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("DB_PATH", os.path.join("data", "news.db"))
+        self.timeout = float(os.environ.get("DB_BUSY_TIMEOUT_SECONDS", "5"))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.conns = []
+        with self.tx() as c:
+            for stmt in SCHEMA:
+                c.execute(stmt)
+
+    def conn(self):
+        c = getattr(self.local, "conn", None)
+        if c is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            c = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False, cached_statements=128)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            c.execute(f"PRAGMA busy_timeout={int(self.timeout*1000)}")
+            self.local.conn = c
+            with self.lock:
+                self.conns.append(c)
+        return c
+
+    def tx(self):
+        return _Tx(self.conn())
+
+    def upsert_items(self, records):
+        # records: [(path, item)] or plain items.
+        rows = _rows(records, time.time())
+        if rows:
+            with self.tx() as c:
+                c.executemany(UPSERT_ITEM, rows)
+        return len(rows)
+
+    def get_item(self, item_id):
+        row = self.conn().execute(GET_ITEM, (item_id,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], _merge(*row[1:])
+
+    def overlay_state(self, item_id, obj):
+        # Lays the item's state columns over `obj` (e.g. read from its file);
+        # False when the database has no row for it.
+        row = self.conn().execute(GET_STATE, (item_id,)).fetchone()
+        if row is None:
+            return False
+        _overlay(obj, *row)
+        return True
+
+    def top(self, category=None, limit=10, min_priority=0.0):
+        c = self.conn()
+        if category:
+            rows = c.execute(TOP_CATEGORY, (category, float(min_priority or 0.0), int(limit))).fetchall()
+        else:
+            rows = c.execute(TOP_ALL, (float(min_priority or 0.0), int(limit))).fetchall()
+        return [_merge(*r[2:]) for r in rows]
+
+    def apply_state(self, c, item_id, reward=None, action=None, record=None):
+        # Reward and/or the action's flag on `c`, inside the caller's
+        # transaction. `record` ((path, item), already carrying the new
+        # state) is inserted instead when the database has no row for the
+        # item. Returns the item's GET_STATE row afterwards, None when the
+        # item is unknown.
+        now = time.time()
+        row = c.execute(GET_STATE, (item_id,)).fetchone()
+        if row is None:
+            rows = _rows([record], now) if record else []
+            if not rows:
+                return None
+            c.executemany(UPSERT_ITEM, rows)
+        else:
+            if reward is not None:
+                c.execute(SET_REWARD, (float(reward), now, item_id))
+            if action in FLAG_UPDATES:
+                c.execute(FLAG_UPDATES[action], (now, item_id))
+        return c.execute(GET_STATE, (item_id,)).fetchone()
+
+    def apply_feedback(self, item_id, reward, action):
+        # Reward plus the action's flag in one transaction; False when the
+        # item is unknown.
+        with self.tx() as c:
+            return self.apply_state(c, item_id, reward, action) is not None
+
+    def set_flag(self, item_id, action):
+        with self.tx() as c:
+            return self.apply_state(c, item_id, action=action) is not None
+
+    def clear_requeue(self, item_id):
+        with self.tx() as c:
+            return bool(c.execute(CLEAR_REQUEUE, (time.time(), item_id)).rowcount)
+
+    def set_reward(self, item_id, reward):
+        with self.tx() as c:
+            return self.apply_state(c, item_id, reward) is not None
+
+    def add_events(self, events):
+        # One transaction for a batch of RL events (the event log's writer).
+        rows = []
+        for event in events:
+            e = dict(event or {})
+            e.setdefault("ts", dt.datetime.utcnow().isoformat())
+            r = e.get("reward")
+            try:
+                r = float(r) if r is not None else None
+            except (TypeError, ValueError):
+                r = None
+            rows.append((e.get("id"), e.get("type"), r, e.get("action"), json.dumps(e, ensure_ascii=False), e.get("ts")))
+        if rows:
+            with self.tx() as c:
+                c.executemany(ADD_EVENT, rows)
+        return len(rows)
+
+    def add_event(self, event):
+        return self.add_events([event]) == 1
+
+    def recent_rewards(self, n):
+        # Latest `n` rewards, oldest first; seeds the event log's window.
+        return [r for (r,) in self.conn().execute(RECENT_REWARDS, (int(n),)).fetchall()][::-1]
+
+    def close(self):
+        with self.lock:
+            for c in self.conns:
+                try:
+                    c.close()
+                except Exception:
+                    pass
+            self.conns = []
+        self.local = threading.local()
+
+class _Tx:
+    # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+    # wait on busy_timeout instead of failing at commit.
+    def __init__(self, conn):
+        self.c = conn
+
+    def __enter__(self):
+        self.c.execute("BEGIN IMMEDIATE")
+        return self.c
+
+    def __exit__(self, exc_type, exc, tb):
+        self.c.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
+
+_DB = None
+_DB_LOCK = threading.Lock()
+
+def default_db():
+    global _DB
+    with _DB_LOCK:
+        if _DB is None:
+            _DB = Database()
+        return _DB
+
+def reset_default_db():
+    global _DB
+    with _DB_LOCK:
+        if _DB is not None:
+            _DB.close()
+        _DB = None
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import zlib
+import threading
+import datetime as dt
+from agents.column_store import ColumnStore, has_columns, append_items
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_STRIPES = 64
+JOURNAL = "changes.jsonl"
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as fd:
+        return json.load(fd)
+
+def write_atomic(path, obj):
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".item_", suffix=".tmp", dir=d)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fo:
+            json.dump(obj, fo, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+        raise
+    return path
+
+class ChangeLog:
+    # Append-only changes.jsonl per day: one line per write batch listing the
+    # item files it wrote and its source (format_metadata, process, stream,
+    # audio, feedback, requeue). Each consumer keeps a byte offset in
+    # .cursor_<name> and reads only what was appended since, optionally
+    # ignoring some sources (e.g. audio ignores metadata-only writes).
+    def __init__(self, day):
+        self.day = day
+        self.path = os.path.join(day, JOURNAL)
+
+    def append(self, files, source):
+        if not files:
+            return False
+        line = json.dumps({"at": dt.datetime.utcnow().isoformat(), "source": source, "files": list(files)}, ensure_ascii=False)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return True
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _cursor_path(self, consumer):
+        return os.path.join(self.day, f".cursor_{consumer}")
+
+    def since(self, consumer, ignore=()):
+        # (changed file paths in first-seen order, offset to ack)
+        try:
+            with open(self._cursor_path(consumer), "r", encoding="utf-8") as f:
+                start = int(f.read().strip() or 0)
+        except Exception:
+            start = 0
+        files = {}
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    start += len(raw)
+                    try:
+                        rec = json.loads(raw.decode("utf-8"))
+                    except Exception:
+                        continue
+                    if rec.get("source") in ignore:
+                        continue
+                    for name in rec.get("files") or []:
+                        files[os.path.join(self.day, name)] = True
+        except FileNotFoundError:
+            pass
+        return list(files), start
+
+    def ack(self, consumer, offset):
+        p = self._cursor_path(consumer)
+        with open(p + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(int(offset)))
+        os.replace(p + ".tmp", p)
+
+def record_writes(day_dir, records, source):
+    # Every writer of item files calls this after writing [(path, item)], so
+    # the day's column store and change journal both see the new versions.
+    append_items(day_dir, records)
+    files = [os.path.basename(p) for p, _ in records if p]
+    try:
+        return ChangeLog(day_dir).append(files, source)
+    except Exception as e:
+        logging.getLogger("errors").error(f"ERROR change journal {day_dir} {e}")
+        return False
+
+class ItemStore:
+    # id -> path index over every data/processed/<date>/item_*.json. A date
+    # directory is only rescanned when its mtime moves, so lookups are O(1)
+    # after the first scan and new pipeline output is picked up on a miss.
+    def __init__(self, base=None, lock_dir=None):
+        self.base = base or os.path.join("data", "processed")
+        self.lock_dir = lock_dir or os.environ.get("ITEM_LOCK_DIR", os.path.join("data", "locks"))
+        self.index = {}
+        self.dirs = {}
+        self.lock = threading.RLock()
+        self.stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.lock_fd = None
+
+    def _scan_dir(self, d):
+        if has_columns(d):
+            # One read of the store's key list instead of opening every file.
+            for iid, name in ColumnStore(d).keys():
+                p = os.path.join(d, name)
+                cur = self.index.get(iid)
+                if iid is not None and name and (cur is None or os.path.dirname(cur) <= d):
+                    self.index[iid] = p
+            return
+        for name in os.listdir(d):
+            if not (name.startswith("item_") and name.endswith(".json")):
+                continue
+            p = os.path.join(d, name)
+            try:
+                iid = _read(p).get("id")
+            except Exception:
+                continue
+            cur = self.index.get(iid)
+            if iid is not None and (cur is None or os.path.dirname(cur) <= d):
+                self.index[iid] = p
+
+    def refresh(self, force=False):
+        with self.lock:
+            try:
+                entries = sorted(e.path for e in os.scandir(self.base) if e.is_dir())
+            except FileNotFoundError:
+                return 0
+            scanned = 0
+            for d in entries:
+                try:
+                    m = os.stat(d).st_mtime_ns
+                except OSError:
+                    continue
+                if not force and self.dirs.get(d) == m:
+                    continue
+                self._scan_dir(d)
+                # A write landing in the same mtime tick as the scan would be
+                # invisible, so recently modified dirs stay dirty.
+                self.dirs[d] = m if (time.time_ns() - m) > 2*10**9 else None
+                scanned += 1
+            return scanned
+
+    def register(self, item_id, path):
+        with self.lock:
+            self.index[item_id] = path
+
+    def path_for(self, item_id):
+        with self.lock:
+            p = self.index.get(item_id)
+            if p is None:
+                self.refresh()
+                p = self.index.get(item_id)
+            return p
+
+    def get(self, item_id):
+        if not item_id:
+            return None, None
+        for attempt in range(2):
+            p = self.path_for(item_id)
+            if not p:
+                return None, None
+            try:
+                obj = _read(p)
+                if obj.get("id") == item_id:
+                    return p, obj
+            except Exception:
+                pass
+            with self.lock:
+                if self.index.get(item_id) == p:
+                    del self.index[item_id]
+                self.dirs.pop(os.path.dirname(p), None)
+        return None, None
+
+    def _stripe(self, item_id):
+        return zlib.crc32(str(item_id).encode("utf-8")) % LOCK_STRIPES
+
+    def _lock_file(self):
+        with self.lock:
+            if self.lock_fd is None:
+                os.makedirs(self.lock_dir, exist_ok=True)
+                self.lock_fd = open(os.path.join(self.lock_dir, "items.lock"), "a+b")
+            return self.lock_fd
+
+    def update(self, item_id, *mutators, source="feedback"):
+        # Read-modify-write under a per-item lock: a striped thread lock plus,
+        # where fcntl exists, a byte-range lock on the same stripe so separate
+        # worker processes serialize too.
+        n = self._stripe(item_id)
+        with self.stripes[n]:
+            lf = self._lock_file() if fcntl else None
+            try:
+                if lf:
+                    fcntl.lockf(lf, fcntl.LOCK_EX, 1, n)
+                path, obj = self.get(item_id)
+                if not path or not obj:
+                    return None
+                for m in mutators:
+                    obj = m(obj)
+                write_atomic(path, obj)
+                record_writes(os.path.dirname(path), [(path, obj)], source)
+                return obj
+            finally:
+                if lf:
+                    fcntl.lockf(lf, fcntl.LOCK_UN, 1, n)
+
+    def update_fields(self, item_id, fields):
+        def mutate(o):
+            o.update(fields or {})
+            return o
+        return self.update(item_id, mutate)
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default_store():
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = ItemStore()
+        return _DEFAULT
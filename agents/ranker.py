@@ -0,0 +1,390 @@
+import os
+import json
+import heapq
+import datetime as dt
+import numpy as np
+from dateutil import parser as dparser
+from agents.trend import TrendEngine, EPOCH, _velocity, _density
+from agents.db import default_db
+
+def ensure_dir(p):
+    os.makedirs(p, exist_ok=True)
+
+def _ts(s):
+    try:
+        t = dparser.parse(s)
+        if t.tzinfo is not None:
+            t = t.astimezone(dt.timezone.utc).replace(tzinfo=None)
+        return t
+    except Exception:
+        return dt.datetime.utcnow()
+
+def recency_score(ts):
+    now = dt.datetime.utcnow()
+    dh = max(0.0, (now - _ts(ts)).total_seconds()/3600.0)
+    return max(0.0, min(1.0, max(0.0, 1.0 - dh/48.0)))
+
+def normalize_path(p):
+    if not p:
+        return p
+    return str(p).replace("\\", "/")
+
+def polarity_weight(p):
+    if p == "positive":
+        return 1.0
+    if p == "neutral":
+        return 0.6
+    return 0.4
+
+def priority(item, trend_scores):
+    c = item.get("category") or "general"
+    trend = float(trend_scores.get(c, 0.0))
+    polw = float(polarity_weight(item.get("polarity")))
+    cval = item.get("confidence_score")
+    if cval is None:
+        cval = item.get("confidence")
+    conf = float(cval) if cval is not None else 0.5
+    rec = float(recency_score(item.get("timestamp")))
+    score = 0.4*trend + 0.2*polw + 0.2*conf + 0.2*rec
+    return round(min(1.0, max(0.0, score)), 4)
+
+def _epoch_us(s):
+    try:
+        t = dt.datetime.fromisoformat(s)
+        if t.tzinfo is not None:
+            t = t.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    except Exception:
+        t = _ts(s)
+    return (t - EPOCH) // dt.timedelta(microseconds=1)
+
+def _conf(item):
+    cval = item.get("confidence_score")
+    if cval is None:
+        cval = item.get("confidence")
+    return float(cval) if cval is not None else 0.5
+
+def _trend_columns(cats, stamps):
+    m = int(os.environ.get("TREND_BIN_MINUTES", "120"))
+    w = int(os.environ.get("TREND_WINDOW", "6"))
+    groups = {}
+    for i, c in enumerate(cats):
+        groups.setdefault(c, []).append(i)
+    scores = {}
+    for c, idx in groups.items():
+        ts = stamps[np.asarray(idx)]
+        b = (ts.max() - ts) // (m*60*1000000)
+        bins = np.bincount(b[b < w], minlength=w).tolist()
+        scores[c] = max(0.0, min(1.0, 0.7*_velocity(bins) + 0.3*_density(bins)))
+    return scores, groups
+
+def feature_columns(items, trend_scores=None):
+    n = len(items)
+    cats = [x.get("category") or "general" for x in items]
+    stamps = np.fromiter((_epoch_us(x.get("timestamp")) for x in items), dtype=np.int64, count=n)
+    if trend_scores is None:
+        trend_scores, _ = _trend_columns(cats, stamps)
+    trend = np.fromiter((float(trend_scores.get(c, 0.0)) for c in cats), dtype=np.float64, count=n)
+    polw = np.fromiter((polarity_weight(x.get("polarity")) for x in items), dtype=np.float64, count=n)
+    conf = np.fromiter((_conf(x) for x in items), dtype=np.float64, count=n)
+    now = _epoch_us(dt.datetime.utcnow().isoformat())
+    dh = np.maximum(0.0, (now - stamps) / 1e6 / 3600.0)
+    rec = np.clip(1.0 - dh/48.0, 0.0, 1.0)
+    return cats, trend, polw, conf, rec
+
+def score_columns(trend, polw, conf, rec):
+    return np.clip(0.4*trend + 0.2*polw + 0.2*conf + 0.2*rec, 0.0, 1.0)
+
+def top_k_by_category(scores, cats, k):
+    groups = {}
+    for i, c in enumerate(cats):
+        groups.setdefault(c, []).append(i)
+    out = {}
+    for c, idx in groups.items():
+        idx = np.asarray(idx)
+        if len(idx) > k:
+            part = scores[idx]
+            thr = part[np.argpartition(-part, k-1)[k-1]]
+            above = idx[part > thr]
+            ties = idx[part == thr][:k - len(above)]
+            idx = np.concatenate([above, ties])
+        out[c] = idx[np.lexsort((idx, -scores[idx]))]
+    return out
+
+def _decorate(x, score, trend, copy=True):
+    y = dict(x) if copy else x
+    y["trend_score"] = round(trend, 4)
+    y["priority_score"] = score
+    if not y.get("script"):
+        y["script"] = y.get("summary_medium") or y.get("summary_short") or y.get("title")
+    if y.get("rl_reward_score") is None:
+        y["rl_reward_score"] = y.get("reward_score", 0.0)
+    if y.get("audio_path"):
+        y["audio_path"] = normalize_path(y.get("audio_path"))
+    return y
+
+def rank_columns(items, trend_scores=None):
+    cats, trend, polw, conf, rec = feature_columns(items, trend_scores)
+    raw = score_columns(trend, polw, conf, rec)
+    scores = np.array([round(v, 4) for v in raw.tolist()], dtype=np.float64)
+    return scores, trend, cats
+
+def iter_ranked(items, trend_scores=None, copy=True):
+    items = items if isinstance(items, list) else list(items)
+    scores, trend, _ = rank_columns(items, trend_scores)
+    order = np.argsort(-scores, kind="stable")
+    for i in order.tolist():
+        yield _decorate(items[i], float(scores[i]), float(trend[i]), copy)
+
+def rank(items, trend_scores=None, copy=True):
+    return list(iter_ranked(items, trend_scores, copy))
+
+def rank_top_k(items, k=10, trend_scores=None, copy=True):
+    items = list(items)
+    scores, trend, cats = rank_columns(items, trend_scores)
+    top = top_k_by_category(scores, cats, k)
+    return {c: [_decorate(items[i], float(scores[i]), float(trend[i]), copy) for i in idx.tolist()] for c, idx in top.items()}
+
+class CategoryTopK:
+    # One bounded min-heap per category; ties keep the earliest pushed item,
+    # matching a stable sort followed by arr[:k].
+    def __init__(self, k=10):
+        self.k = int(k)
+        self.heaps = {}
+        self.seq = 0
+
+    def push(self, item):
+        c = item.get("category") or "general"
+        h = self.heaps.setdefault(c, [])
+        entry = (float(item.get("priority_score") or 0.0), -self.seq, item)
+        self.seq += 1
+        if len(h) < self.k:
+            heapq.heappush(h, entry)
+        elif entry[:2] > h[0][:2]:
+            heapq.heapreplace(h, entry)
+
+    def items(self):
+        return {c: [e[2] for e in sorted(h, key=lambda e: e[:2], reverse=True)] for c, h in self.heaps.items()}
+
+    def counts(self):
+        return {c: len(h) for c, h in self.heaps.items()}
+
+CSV_HEADER = "id,title,category,language,polarity,tone,trend_score,priority_score,timestamp\n"
+
+def _csv_row(x):
+    row = [
+        str(x.get("id","")).replace(","," "),
+        str(x.get("title","")).replace(","," "),
+        str(x.get("category") or ""),
+        str(x.get("language") or ""),
+        str(x.get("polarity") or ""),
+        str(x.get("tone") or ""),
+        str(x.get("trend_score","")),
+        str(x.get("priority_score","")),
+        str(x.get("timestamp") or "")
+    ]
+    return ",".join(row)+"\n"
+
+class FeedExporter:
+    # Streams weekly_report.csv/json row by row into temp files and swaps them in
+    # on close, so readers never observe a half-written report.
+    def __init__(self, out_dir=None, compact=False):
+        self.out_dir = out_dir or os.path.join("exports")
+        ensure_dir(self.out_dir)
+        self.csv_path = os.path.join(self.out_dir, "weekly_report.csv")
+        self.json_path = os.path.join(self.out_dir, "weekly_report.json")
+        self.compact = compact
+        self.count = 0
+        self.fc = open(self.csv_path + ".tmp", "w", encoding="utf-8")
+        self.fj = open(self.json_path + ".tmp", "w", encoding="utf-8")
+        self.fc.write(CSV_HEADER)
+        head = json.dumps(dt.datetime.utcnow().isoformat())
+        if compact:
+            self.fj.write('{"generated_at":' + head + ',"items":[')
+        else:
+            self.fj.write('{\n  "generated_at": ' + head + ',\n  "items": [')
+
+    def add(self, x):
+        if x.get("audio_path"):
+            x["audio_path"] = normalize_path(x.get("audio_path"))
+        self.fc.write(_csv_row(x))
+        if self.compact:
+            self.fj.write(("," if self.count else "") + json.dumps(x, ensure_ascii=False, separators=(",", ":")))
+        else:
+            body = json.dumps(x, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            self.fj.write(("," if self.count else "") + "\n    " + body)
+        self.count += 1
+
+    def close(self):
+        if self.compact:
+            self.fj.write("]}")
+        else:
+            self.fj.write("\n  ]\n}" if self.count else "]\n}")
+        self.fc.close()
+        self.fj.close()
+        os.replace(self.csv_path + ".tmp", self.csv_path)
+        os.replace(self.json_path + ".tmp", self.json_path)
+        return self.csv_path, self.json_path
+
+    def abort(self):
+        for f, p in ((self.fc, self.csv_path), (self.fj, self.json_path)):
+            try:
+                f.close()
+                os.remove(p + ".tmp")
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+class DbSync:
+    # Upserts exported items into the item database in batches, so ranking
+    # and feedback queries there see the latest scores.
+    def __init__(self, batch=500):
+        self.batch = batch
+        self.rows = []
+        self.enabled = os.environ.get("DB_SYNC", "1") != "0"
+
+    def add(self, x):
+        if self.enabled:
+            self.rows.append(x)
+            if len(self.rows) >= self.batch:
+                self.flush()
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if not rows:
+            return
+        try:
+            default_db().upsert_items(rows)
+        except Exception:
+            self.enabled = False
+
+def _tee(*fns):
+    def call(x):
+        for f in fns:
+            f(x)
+    return call
+
+def export_weekly(feed, compact=False, on_item=None):
+    ex = FeedExporter(compact=compact)
+    try:
+        for x in feed:
+            ex.add(x)
+            if on_item:
+                on_item(x)
+        return ex.close()
+    except Exception:
+        ex.abort()
+        raise
+
+def rank_export(items, trend_state=None, compact=False):
+    tscores = TrendEngine.load(trend_state).scores() if trend_state else None
+    top = CategoryTopK(10)
+    sync = DbSync()
+    csv_path, json_path = export_weekly(iter_ranked(items, tscores, copy=False), compact=compact, on_item=_tee(top.push, sync.add))
+    sync.flush()
+    counts = top.counts()
+    return {"categories": list(counts.keys()), "top_counts": counts, "csv": csv_path, "json": json_path}
+
+class StreamRanker:
+    # Ranks an item stream keeping only a top-k heap per category. Trend is the
+    # same for every item of a category, so heaps are ordered on the rest of
+    # the score and trend comes from a TrendEngine fed as items pass; final
+    # scores are settled once the stream ends.
+    def __init__(self, k=10, trend_scores=None):
+        self.k = int(k)
+        self.fixed = trend_scores
+        self.engine = TrendEngine()
+        self.now = _epoch_us(dt.datetime.utcnow().isoformat())
+        self.heaps = {}
+        self.seen = 0
+
+    def push(self, item):
+        c = item.get("category") or "general"
+        ts = _epoch_us(item.get("timestamp"))
+        if self.fixed is None:
+            self.engine.add({"category": c, "timestamp": item.get("timestamp")})
+        dh = max(0.0, (self.now - ts) / 1e6 / 3600.0)
+        rec = max(0.0, min(1.0, 1.0 - dh/48.0))
+        base = 0.2*polarity_weight(item.get("polarity")) + 0.2*_conf(item) + 0.2*rec
+        h = self.heaps.setdefault(c, [])
+        entry = (base, -self.seen, item)
+        self.seen += 1
+        if len(h) < self.k:
+            heapq.heappush(h, entry)
+        elif entry[:2] > h[0][:2]:
+            heapq.heapreplace(h, entry)
+
+    def ranked(self, copy=True):
+        tscores = self.fixed if self.fixed is not None else self.engine.scores()
+        out = []
+        for c, h in self.heaps.items():
+            t = float(tscores.get(c, 0.0))
+            for base, seq, x in h:
+                out.append((round(min(1.0, max(0.0, 0.4*t + base)), 4), seq, t, x))
+        out.sort(key=lambda e: (-e[0], -e[1]))
+        for score, _, t, x in out:
+            yield _decorate(x, score, t, copy)
+
+    def counts(self):
+        return {c: len(h) for c, h in self.heaps.items()}
+
+def rank_stream_export(items, k=10, trend_state=None, compact=False):
+    tscores = TrendEngine.load(trend_state).scores() if trend_state else None
+    ranker = StreamRanker(k, tscores)
+    for x in items:
+        ranker.push(x)
+    sync = DbSync()
+    csv_path, json_path = export_weekly(ranker.ranked(copy=False), compact=compact, on_item=sync.add)
+    sync.flush()
+    counts = ranker.counts()
+    return {"categories": list(counts.keys()), "top_counts": counts, "seen": ranker.seen, "csv": csv_path, "json": json_path}
+
+def rank_store(store, trend_scores=None, copy=True):
+    # Ranks a day's ColumnStore reading only the category, polarity,
+    # confidence and timestamp columns; documents are decoded in output
+    # order as the export consumes them.
+    rows = store.latest()
+    if len(rows):
+        files = store.keys()
+        rows = rows[np.argsort([files[r][1] for r in rows.tolist()], kind="stable")]
+    cats = store.values("category", rows).tolist()
+    cats = [c or "general" for c in cats]
+    stamps = np.asarray(store.column("timestamp")[rows], dtype=np.int64)
+    if trend_scores is None:
+        trend_scores, _ = _trend_columns(cats, stamps)
+    trend = np.fromiter((float(trend_scores.get(c, 0.0)) for c in cats), dtype=np.float64, count=len(cats))
+    pol = store.values("polarity", rows)
+    polw = np.where(pol == "positive", 1.0, np.where(pol == "neutral", 0.6, 0.4)).astype(np.float64)
+    conf = np.asarray(store.column("confidence")[rows], dtype=np.float64)
+    now = _epoch_us(dt.datetime.utcnow().isoformat())
+    rec = np.clip(1.0 - np.maximum(0.0, (now - stamps) / 1e6 / 3600.0)/48.0, 0.0, 1.0)
+    raw = score_columns(trend, polw, conf, rec)
+    scores = np.array([round(v, 4) for v in raw.tolist()], dtype=np.float64)
+    for i in np.argsort(-scores, kind="stable").tolist():
+        _, x = store.doc(int(rows[i]))
+        yield _decorate(x, float(scores[i]), float(trend[i]), copy)
+
+def rank_store_export(store, trend_state=None, compact=False):
+    tscores = TrendEngine.load(trend_state).scores() if trend_state else None
+    top = CategoryTopK(10)
+    sync = DbSync()
+    csv_path, json_path = export_weekly(rank_store(store, tscores, copy=False), compact=compact, on_item=_tee(top.push, sync.add))
+    sync.flush()
+    counts = top.counts()
+    return {"categories": list(counts.keys()), "top_counts": counts, "csv": csv_path, "json": json_path}
+
+def iter_files(files):
+    for f in files:
+        try:
+            with open(f, "r", encoding="utf-8") as fd:
+                yield json.load(fd)
+        except Exception:
+            continue
@@ -1,6 +1,12 @@
 import os
 import json
+import time
+import queue
+import atexit
+import threading
 import datetime as dt
+from collections import deque
+from agents.db import default_db
 
 DEFAULT_WEIGHTS = {
     "editor_approve": 1.0,
@@ -34,13 +40,210 @@ def compute_reward(signals, weights=None):
             r += (w[k] * v)
     return round(max(-1.0, min(1.0, r)), 4)
 
+def _events_path():
+    return os.path.join("logs", "rl_events.log")
+
+class EventLog:
+    # Appends RL events from a background thread: callers only enqueue, the
+    # writer drains in batches, inserting each batch into the feedback table
+    # in one transaction (`db`, a callable returning the Database) and/or
+    # appending it to the file with one fsync, rotating by size. Rolling
+    # reward stats are updated on enqueue so readers never touch disk.
+    def __init__(self, path=None, max_queue=None, batch=None, flush_seconds=None, max_bytes=None, backups=None, window=None, ewma_alpha=None, db=None, to_file=True):
+        self.path = os.path.abspath(path or _events_path())
+        self.db = db
+        self.to_file = to_file
+        self.batch = int(batch or os.environ.get("RL_LOG_BATCH", "256"))
+        self.flush_seconds = float(flush_seconds or os.environ.get("RL_LOG_FLUSH_SECONDS", "1.0"))
+        self.max_bytes = int(max_bytes or os.environ.get("RL_LOG_MAX_BYTES", str(5*1024*1024)))
+        self.backups = int(backups if backups is not None else os.environ.get("RL_LOG_BACKUPS", "3"))
+        self.ewma_alpha = float(ewma_alpha or os.environ.get("RL_REWARD_EWMA_ALPHA", "0.1"))
+        self.q = queue.Queue(maxsize=int(max_queue or os.environ.get("RL_LOG_QUEUE", "10000")))
+        self.rewards = deque(maxlen=int(window or os.environ.get("RL_REWARD_WINDOW", "200")))
+        self.reward_sum = 0.0
+        self.ewma = None
+        self.written = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self._seed()
+
+    def _seed(self):
+        if self.db is not None:
+            try:
+                for r in self.db().recent_rewards(self.rewards.maxlen):
+                    self._observe(float(r))
+                return
+            except Exception:
+                pass
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 64*1024))
+                tail = f.read().decode("utf-8", errors="ignore").splitlines()
+        except Exception:
+            return
+        for line in tail[-self.rewards.maxlen:]:
+            try:
+                obj = json.loads(line)
+                if "reward" in obj:
+                    self._observe(float(obj.get("reward")))
+            except Exception:
+                continue
+
+    def _observe(self, r):
+        if len(self.rewards) == self.rewards.maxlen:
+            self.reward_sum -= self.rewards[0]
+        self.rewards.append(r)
+        self.reward_sum += r
+        self.ewma = r if self.ewma is None else (self.ewma_alpha*r + (1.0 - self.ewma_alpha)*self.ewma)
+
+    def stats(self):
+        with self.lock:
+            n = len(self.rewards)
+            return {
+                "count": n,
+                "mean": (self.reward_sum/float(n)) if n else None,
+                "ewma": self.ewma,
+                "queued": self.q.qsize(),
+                "written": self.written,
+                "dropped": self.dropped
+            }
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="rl-event-log", daemon=True)
+                self.thread.start()
+
+    def put(self, event):
+        rec = dict(event or {})
+        rec["ts"] = dt.datetime.utcnow().isoformat()
+        if "reward" in rec:
+            try:
+                r = float(rec.get("reward"))
+                with self.lock:
+                    self._observe(r)
+            except Exception:
+                pass
+        if self.closed:
+            return False
+        self._start()
+        try:
+            self.q.put(rec, timeout=float(os.environ.get("RL_LOG_PUT_TIMEOUT", "0.5")))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def _rotate(self, f):
+        if self.max_bytes <= 0 or f.tell() < self.max_bytes:
+            return f
+        f.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i+1}")
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+        return open(self.path, "a", encoding="utf-8")
+
+    def _write(self, f, recs):
+        if self.db is not None:
+            try:
+                self.db().add_events(recs)
+            except Exception:
+                pass
+        if f is not None:
+            for rec in recs:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            f = self._rotate(f)
+        with self.lock:
+            self.written += len(recs)
+        return f
+
+    def _run(self):
+        f = None
+        if self.to_file:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                try:
+                    first = self.q.get(timeout=self.flush_seconds)
+                except queue.Empty:
+                    if self.closed:
+                        return
+                    continue
+                recs = [] if first is None else [first]
+                stop = first is None
+                while len(recs) < self.batch and not stop:
+                    try:
+                        x = self.q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if x is None:
+                        stop = True
+                    else:
+                        recs.append(x)
+                try:
+                    if recs:
+                        f = self._write(f, recs)
+                except Exception:
+                    pass
+                for _ in range(len(recs) + (1 if stop else 0)):
+                    self.q.task_done()
+                if stop:
+                    return
+        finally:
+            if f is not None:
+                f.close()
+
+    def flush(self, timeout=5.0):
+        end = time.time() + timeout
+        while self.q.unfinished_tasks and time.time() < end:
+            time.sleep(0.01)
+        return not self.q.unfinished_tasks
+
+    def close(self, timeout=5.0):
+        if self.closed:
+            return
+        self.closed = True
+        t = self.thread
+        if t is not None and t.is_alive():
+            try:
+                self.q.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            t.join(timeout)
+
+_EVENT_LOG = None
+_EVENT_LOG_LOCK = threading.Lock()
+
+def _file_log():
+    return os.environ.get("RL_EVENTS_FILE", "1") != "0"
+
+def event_log():
+    # Events go to the feedback table; logs/rl_events.log keeps a copy unless
+    # RL_EVENTS_FILE=0.
+    global _EVENT_LOG
+    with _EVENT_LOG_LOCK:
+        if _EVENT_LOG is None:
+            _EVENT_LOG = EventLog(db=default_db, to_file=_file_log())
+            atexit.register(_EVENT_LOG.close)
+        return _EVENT_LOG
+
+def reward_stats():
+    return event_log().stats()
+
 def log_event(event):
-    path = os.path.join("logs", "rl_events.log")
     try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "a", encoding="utf-8") as f:
-            rec = dict(event or {})
-            rec["ts"] = dt.datetime.utcnow().isoformat()
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return event_log().put(event)
     except Exception:
-        pass
\ No newline at end of file
+        return False
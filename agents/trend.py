@@ -1,7 +1,10 @@
 import os
+import json
 import datetime as dt
 from dateutil import parser as dparser
 
+EPOCH = dt.datetime(1970, 1, 1)
+
 def _ts(s):
     try:
         t = dparser.parse(s)
@@ -18,10 +21,11 @@ def _bucket(ts, ref, minutes):
 def _bins(items, minutes=None, window=None):
     m = int(os.environ.get("TREND_BIN_MINUTES", "120")) if minutes is None else int(minutes)
     w = int(os.environ.get("TREND_WINDOW", "6")) if window is None else int(window)
-    ref = max((_ts(x.get("timestamp")) for x in items), default=dt.datetime.utcnow())
+    stamps = [_ts(x.get("timestamp")) for x in items]
+    ref = max(stamps, default=dt.datetime.utcnow())
     bins = [0]*w
-    for x in items:
-        b = _bucket(_ts(x.get("timestamp")), ref, m)
+    for t in stamps:
+        b = _bucket(t, ref, m)
         if b < w:
             bins[b] += 1
     return bins
@@ -66,4 +70,142 @@ def compute(items):
     scores = {}
     for c, its in cats.items():
         scores[c] = score_category(its)
-    return scores
\ No newline at end of file
+    return scores
+
+def state_path():
+    return os.environ.get("TREND_STATE_PATH", os.path.join("data", "trend", "state.json"))
+
+class TrendEngine:
+    # Per-category ring buffers of `window` bins; slot `pos` holds the newest bin
+    # and `decayed` tracks sum(bins[age] * alpha**age) so scores never rescan.
+    def __init__(self, minutes=None, window=None, alpha=None):
+        self.minutes = int(os.environ.get("TREND_BIN_MINUTES", "120")) if minutes is None else int(minutes)
+        self.window = max(2, int(os.environ.get("TREND_WINDOW", "6")) if window is None else int(window))
+        self.alpha = float(os.environ.get("TREND_SMOOTH_ALPHA", "0.6")) if alpha is None else float(alpha)
+        self.powers = [self.alpha ** i for i in range(self.window + 1)]
+        self.cats = {}
+        self.seen = {}
+
+    def _bin_id(self, ts):
+        t = _ts(ts)
+        return int((t - EPOCH).total_seconds() // (self.minutes*60))
+
+    def _slot(self, st, age):
+        return (st["pos"] + age) % self.window
+
+    def _advance(self, st, k):
+        w = self.window
+        if k >= w:
+            st["bins"] = [0]*w
+            st["pos"] = 0
+            st["decayed"] = 0.0
+        else:
+            bins = st["bins"]
+            for age in range(w - k, w):
+                s = self._slot(st, age)
+                st["decayed"] -= bins[s] * self.powers[age]
+                bins[s] = 0
+            st["decayed"] = max(0.0, st["decayed"] * (self.alpha ** k))
+            st["pos"] = (st["pos"] - k) % w
+        st["head"] += k
+
+    def add(self, item):
+        iid = item.get("id")
+        if iid is not None and iid in self.seen:
+            return False
+        b = self._bin_id(item.get("timestamp"))
+        c = item.get("category") or "general"
+        st = self.cats.get(c)
+        if st is None:
+            st = {"head": b, "pos": 0, "bins": [0]*self.window, "decayed": 0.0}
+            self.cats[c] = st
+        if b > st["head"]:
+            self._advance(st, b - st["head"])
+        age = st["head"] - b
+        if age >= self.window:
+            return False
+        st["bins"][self._slot(st, age)] += 1
+        st["decayed"] += self.powers[age]
+        if iid is not None:
+            self.seen[iid] = b
+        return True
+
+    def extend(self, items):
+        n = 0
+        for x in items:
+            if self.add(x):
+                n += 1
+        return n
+
+    def score(self, category):
+        st = self.cats.get(category or "general")
+        if st is None:
+            return 0.0
+        last = st["bins"][self._slot(st, 0)]
+        prev = st["bins"][self._slot(st, 1)]
+        denom = max(1.0, st["decayed"])
+        v = max(0.0, min(1.0, (last - prev) / denom * 3.0))
+        d = max(0.0, min(1.0, last / denom))
+        return max(0.0, min(1.0, 0.7*v + 0.3*d))
+
+    def scores(self):
+        return {c: self.score(c) for c in self.cats}
+
+    def bins(self, category):
+        st = self.cats.get(category or "general")
+        if st is None:
+            return [0]*self.window
+        return [st["bins"][self._slot(st, a)] for a in range(self.window)]
+
+    def _prune_seen(self):
+        if not self.cats:
+            self.seen = {}
+            return
+        floor = max(st["head"] for st in self.cats.values()) - self.window
+        self.seen = {k: b for k, b in self.seen.items() if b > floor}
+
+    def to_dict(self):
+        self._prune_seen()
+        return {
+            "minutes": self.minutes,
+            "window": self.window,
+            "alpha": self.alpha,
+            "cats": {c: {"head": st["head"], "bins": self.bins(c)} for c, st in self.cats.items()},
+            "seen": self.seen
+        }
+
+    @classmethod
+    def from_dict(cls, data, minutes=None, window=None, alpha=None):
+        eng = cls(minutes, window, alpha)
+        d = data or {}
+        if (d.get("minutes"), d.get("window"), d.get("alpha")) != (eng.minutes, eng.window, eng.alpha):
+            return eng
+        for c, st in (d.get("cats") or {}).items():
+            bins = [int(x) for x in (st.get("bins") or [])][:eng.window]
+            bins += [0]*(eng.window - len(bins))
+            decayed = sum(b * eng.powers[i] for i, b in enumerate(bins))
+            eng.cats[c] = {"head": int(st.get("head", 0)), "pos": 0, "bins": bins, "decayed": decayed}
+        eng.seen = {k: int(v) for k, v in (d.get("seen") or {}).items()}
+        return eng
+
+    def save(self, path=None):
+        p = path or state_path()
+        try:
+            os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+            tmp = p + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, p)
+            return p
+        except Exception:
+            return None
+
+    @classmethod
+    def load(cls, path=None, minutes=None, window=None, alpha=None):
+        p = path or state_path()
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = None
+        return cls.from_dict(data, minutes, window, alpha)
@@ -0,0 +1,102 @@
+import os
+import time
+import logging
+import threading
+from agents.db import default_db
+
+# One row per item: pushing an id that is already queued keeps the higher
+# priority and upgrades "queue" to "requeue", so duplicates never fan out
+# into duplicate work. A push while the entry is claimed bumps enqueued_at,
+# which makes the consumer's ack put it back instead of deleting it.
+PUSH = """INSERT INTO requeue (item_id, action, priority, reward, enqueued_at, visible_at, attempts)
+    VALUES (?, ?, ?, ?, ?, ?, 0)
+    ON CONFLICT(item_id) DO UPDATE SET
+        priority = MAX(requeue.priority, excluded.priority),
+        reward = excluded.reward,
+        action = CASE WHEN requeue.action = 'requeue' OR excluded.action = 'requeue' THEN 'requeue' ELSE excluded.action END,
+        enqueued_at = CASE WHEN requeue.visible_at > excluded.visible_at THEN excluded.enqueued_at ELSE requeue.enqueued_at END"""
+READY = """SELECT item_id, action, priority, reward, attempts, enqueued_at FROM requeue
+    WHERE visible_at <= ? ORDER BY priority DESC, reward DESC, enqueued_at LIMIT ?"""
+CLAIM = "UPDATE requeue SET visible_at = ?, attempts = attempts + 1 WHERE item_id = ?"
+ACK = "DELETE FROM requeue WHERE item_id = ? AND enqueued_at = ?"
+REPUSHED = "UPDATE requeue SET visible_at = ?, attempts = 0 WHERE item_id = ?"
+RELEASE = "UPDATE requeue SET visible_at = ? WHERE item_id = ?"
+DEAD = "DELETE FROM requeue WHERE attempts >= ? AND visible_at <= ?"
+DEPTH = "SELECT COUNT(*), COALESCE(SUM(visible_at <= ?), 0) FROM requeue"
+SIGNATURE = "SELECT COUNT(*), COALESCE(SUM(visible_at <= ?), 0), COALESCE(SUM(attempts), 0) FROM requeue"
+
+class RequeueQueue:
+    # Persistent priority queue over the requeue table, ordered by
+    # (priority_score, reward) through the requeue_order index. claim() hides
+    # entries for `visibility` seconds; an entry that is not acked in time
+    # becomes claimable again, and one claimed REQUEUE_MAX_ATTEMPTS times
+    # without an ack is dropped.
+    def __init__(self, db=None, visibility=None, max_attempts=None):
+        self.db = db or default_db()
+        self.visibility = float(visibility or os.environ.get("REQUEUE_VISIBILITY_SECONDS", "300"))
+        self.max_attempts = int(max_attempts or os.environ.get("REQUEUE_MAX_ATTEMPTS", "5"))
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def push(self, item_id, action="requeue", priority=0.0, reward=0.0, now=None):
+        if not item_id:
+            return False
+        with self.db.tx() as c:
+            return self.push_tx(c, item_id, action, priority, reward, now)
+
+    def push_tx(self, c, item_id, action="requeue", priority=0.0, reward=0.0, now=None):
+        # push() on `c`, inside a transaction the caller already holds.
+        if not item_id:
+            return False
+        now = time.time() if now is None else now
+        c.execute(PUSH, (str(item_id), action, float(priority or 0.0), float(reward or 0.0), now, now))
+        return True
+
+    def claim(self, n=10, now=None):
+        now = time.time() if now is None else now
+        with self.db.tx() as c:
+            dead = c.execute(DEAD, (self.max_attempts, now)).rowcount
+            rows = c.execute(READY, (now, int(n))).fetchall()
+            for r in rows:
+                c.execute(CLAIM, (now + self.visibility, r[0]))
+        if dead:
+            with self.lock:
+                self.dropped += dead
+            logging.getLogger("errors").error(f"REQUEUE dropped {dead} entries after {self.max_attempts} attempts")
+        return [{"id": r[0], "action": r[1], "priority": r[2], "reward": r[3], "attempts": r[4] + 1, "token": r[5]} for r in rows]
+
+    def ack(self, entry, now=None):
+        # `entry` is what claim() returned; False when the item was pushed
+        # again meanwhile and is back in the queue.
+        now = time.time() if now is None else now
+        with self.db.tx() as c:
+            if c.execute(ACK, (entry["id"], entry["token"])).rowcount:
+                return True
+            c.execute(REPUSHED, (now, entry["id"]))
+            return False
+
+    def release(self, item_id, delay=0.0, now=None):
+        now = time.time() if now is None else now
+        with self.db.tx() as c:
+            return bool(c.execute(RELEASE, (now + float(delay), item_id)).rowcount)
+
+    def depth(self, now=None):
+        now = time.time() if now is None else now
+        total, ready = self.db.conn().execute(DEPTH, (now,)).fetchone()
+        return {"depth": int(total), "ready": int(ready), "in_flight": int(total) - int(ready), "dropped": self.dropped}
+
+    def signature(self, now=None):
+        # Changes whenever entries are pushed, claimed or become ready again.
+        now = time.time() if now is None else now
+        total, ready, attempts = self.db.conn().execute(SIGNATURE, (now,)).fetchone()
+        return f"{int(total)}:{int(ready)}:{int(attempts)}" if ready else "empty"
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+def default_queue():
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = RequeueQueue()
+        return _QUEUE
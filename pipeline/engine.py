@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import logging
+from pipeline import stages
+from pipeline import stream
+from pipeline.incremental import process_changes
+from agents.ranker import rank_export
+
+def _size(x):
+    if isinstance(x, tuple):
+        x = x[0]
+    return len(x) if isinstance(x, list) else None
+
+class Pipeline:
+    # Runs stages in one interpreter, handing each stage's output straight to
+    # the next. Every stage is timed; `checkpoint` decides whether the
+    # intermediate raw/processed files are written at all.
+    def __init__(self, checkpoint=True):
+        self.checkpoint = checkpoint
+        self.timings = []
+
+    def stage(self, name, fn, *args, **kw):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            out = fn(*args, **kw)
+            ok = True
+            return out
+        finally:
+            rec = {"stage": name, "seconds": round(time.perf_counter() - t0, 4), "ok": ok}
+            if ok and _size(out) is not None:
+                rec["items"] = _size(out)
+            self.timings.append(rec)
+            logging.getLogger().info("STAGE %s", json.dumps(rec))
+
+    def process(self, raw, max_items):
+        # Checkpointed runs process only new or changed items, as the
+        # scheduler's ingest stage does; the rest of the day is picked up
+        # again for ranking.
+        if not self.checkpoint:
+            return stages.process(raw, checkpoint=False, max_items=max_items)
+        out = stages.day_dir(os.path.join("data", "processed"))
+        return process_changes(raw, out, max_items=max_items, source="process")["records"]
+
+    def run(self, avatars=("asha", "kiran", "dev"), voice="default", audio_limit=10, max_items=10, trend_state=None, compact=False):
+        raw = self.stage("ingest", stages.ingest, checkpoint=self.checkpoint)
+        records = self.stage("process", self.process, raw, max_items)
+        audio = None
+        if avatars:
+            records, audio = self.stage("audio", stages.synthesize, records, list(avatars), voice=voice, limit=audio_limit, checkpoint=self.checkpoint)
+        requeue = None
+        if self.checkpoint and avatars and os.environ.get("REQUEUE_DRAIN", "1") != "0":
+            from pipeline.requeue import drain
+            requeue = self.stage("requeue", drain, avatars=list(avatars), voice=voice)
+        if self.checkpoint:
+            records = stages.with_day_items(records, stages.day_dir(os.path.join("data", "processed")))
+        feed = self.stage("rank", rank_export, [obj for _, obj in records], trend_state=trend_state, compact=compact)
+        return {"status": "ok", "stages": self.timings, "audio": audio, "requeue": requeue, "feed": feed}
+
+    def timed(self, name, items):
+        # Stream stages overlap, so each records wall time until its input ran
+        # out and how many items it yielded.
+        t0 = time.perf_counter()
+        n = 0
+        ok = False
+        try:
+            for x in items:
+                n += 1
+                yield x
+            ok = True
+        finally:
+            rec = {"stage": name, "seconds": round(time.perf_counter() - t0, 4), "ok": ok, "items": n}
+            self.timings.append(rec)
+            logging.getLogger().info("STAGE %s", json.dumps(rec))
+
+    def run_stream(self, avatars=("asha", "kiran", "dev"), voice="default", audio_limit=10, max_items=None, trend_state=None, compact=False, k=10, queue_size=None):
+        # ingest -> clean -> summarize -> sentiment -> audio -> rank as
+        # generators, each on its own thread behind a bounded queue. Only the
+        # ranker holds items (k per category), so memory does not grow with
+        # the day's volume. The export carries the top k of each category.
+        def hop(name, items):
+            return stream.bounded(self.timed(name, items), queue_size)
+        items = hop("ingest", stream.ingest(checkpoint=self.checkpoint))
+        items = hop("clean", stream.clean(items))
+        items = hop("summarize", stream.summarize(items))
+        items = hop("sentiment", stream.keep(stream.sentiment(items), checkpoint=self.checkpoint, max_items=max_items))
+        pool = None
+        if avatars:
+            from tts.pool import SynthesisPool
+            pool = SynthesisPool()
+            items = hop("audio", stream.audio(items, pool, list(avatars), voice=voice, limit=audio_limit, checkpoint=self.checkpoint))
+        try:
+            feed = self.stage("rank", stream.rank, items, k=k, trend_state=trend_state, compact=compact)
+            audio = {"hits": pool.hits, "misses": pool.misses} if pool else None
+        finally:
+            if pool:
+                pool.close()
+        return {"status": "ok", "stages": self.timings, "audio": audio, "feed": feed}
+
+def run_pipeline(checkpoint=None, streaming=False, **kw):
+    if checkpoint is None:
+        checkpoint = os.environ.get("PIPELINE_CHECKPOINT", "1") != "0"
+    p = Pipeline(checkpoint=checkpoint)
+    return p.run_stream(**kw) if streaming else p.run(**kw)
@@ -0,0 +1,86 @@
+import os
+import json
+from pipeline import stages
+from agents.trend import TrendEngine
+from agents.item_store import write_atomic, ChangeLog, record_writes
+
+MANIFEST = "manifest.json"
+
+class Manifest:
+    # id -> {"hash": raw content hash, "file": item file} for one processed
+    # day directory; an item is reprocessed only when its raw hash moves or
+    # its file is gone.
+    def __init__(self, day):
+        self.day = day
+        self.path = os.path.join(day, MANIFEST)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("items") or {}
+        except Exception:
+            self.entries = {}
+
+    def fresh(self, key, h):
+        e = self.entries.get(key)
+        return bool(e) and e.get("hash") == h and os.path.exists(os.path.join(self.day, e.get("file") or ""))
+
+    def record(self, key, h, name):
+        self.entries[key] = {"hash": h, "file": name}
+
+    def save(self):
+        return write_atomic(self.path, {"items": self.entries})
+
+def process_changes(raw_items, out_dir, max_items=10, source="format_metadata"):
+    # Processes only raw items that are new or whose content changed since
+    # the manifest last saw them, writes them to their stable files and logs
+    # the written files for downstream consumers.
+    manifest = Manifest(out_dir)
+    engine = TrendEngine.load()
+    added, changed, records = [], [], []
+    unchanged = invalid = 0
+    seen = set()
+    for it in raw_items:
+        key = stages.raw_key(it)
+        if key in seen:
+            continue
+        seen.add(key)
+        h = stages.raw_hash(it)
+        if manifest.fresh(key, h):
+            unchanged += 1
+            continue
+        if max_items and len(records) >= max_items:
+            continue
+        obj = stages.process_item(it)
+        if not stages.validate(obj):
+            invalid += 1
+            continue
+        name = stages.item_filename(key)
+        path = os.path.join(out_dir, name)
+        stages.keep_earned(obj, stages.existing_item(path))
+        try:
+            write_atomic(path, obj)
+        except Exception:
+            continue
+        (changed if key in manifest.entries else added).append(name)
+        manifest.record(key, h, name)
+        engine.add(obj)
+        records.append((path, obj))
+    manifest.save()
+    engine.save()
+    record_writes(out_dir, records, source)
+    return {"added": added, "changed": changed, "unchanged": unchanged, "invalid": invalid, "records": records}
+
+def changed_records(day, consumer, ignore=()):
+    # Records for the files changed since `consumer` last acked, plus the
+    # offset to ack once they are handled. None when the day has no journal.
+    log = ChangeLog(day)
+    if not log.exists():
+        return None, 0
+    files, offset = log.since(consumer, ignore)
+    records = []
+    for f in files:
+        try:
+            with open(f, "r", encoding="utf-8") as fd:
+                records.append((f, json.load(fd)))
+        except Exception:
+            continue
+    return records, offset
@@ -0,0 +1,83 @@
+import os
+import logging
+from pipeline import stages
+from agents.item_store import default_store
+from agents.db import default_db
+from agents.work_queue import default_queue
+
+def _raw_item(path, item_id, cache):
+    # The raw feed item behind a processed file, from the same day's raw dir;
+    # each day's raw files are read once per drain.
+    day = os.path.basename(os.path.dirname(path))
+    if day not in cache:
+        cache[day] = {stages.raw_key(it): it for it in stages.load_raw(os.path.join("data", "raw", day))}
+    return cache[day].get(item_id)
+
+def resummarize(path, obj, cache):
+    it = _raw_item(path, obj.get("id"), cache)
+    if it is None:
+        return obj
+    new = stages.process_item(it)
+    if not stages.validate(new):
+        return obj
+    return stages.keep_earned(new, obj)
+
+def _merge_into(obj, text):
+    # Mutator for ItemStore.update: the drained item's audio fields, and its
+    # re-summarized text when `text`, laid over the item as it is on disk now,
+    # so feedback written meanwhile is kept.
+    def mutate(cur):
+        for k, v in obj.items():
+            if k in stages.AUDIO_FIELDS or (text and k not in stages.EARNED):
+                cur[k] = v
+        cur.pop("requeue_requested", None)
+        return cur
+    return mutate
+
+def drain(limit=None, avatars=None, voice="default", queue=None, pool=None):
+    # Claims up to `limit` entries in priority order. "requeue" entries are
+    # re-summarized from their raw item and re-synthesized, "queue" entries
+    # only re-synthesized (unchanged text is a TTS cache hit). Entries are
+    # acked once their item is written; on failure they are released and
+    # retried after REQUEUE_RETRY_SECONDS.
+    q = queue or default_queue()
+    entries = q.claim(int(limit or os.environ.get("REQUEUE_DRAIN_BATCH", "20")))
+    retry = float(os.environ.get("REQUEUE_RETRY_SECONDS", "60"))
+    cache = {}
+    work = []
+    missing = 0
+    for e in entries:
+        try:
+            path, obj = default_store().get(e["id"])
+            if not path:
+                q.ack(e)
+                missing += 1
+                continue
+            if e["action"] == "requeue":
+                obj = resummarize(path, obj, cache)
+            obj.pop("requeue_requested", None)
+            work.append((path, obj, e))
+        except Exception as ex:
+            logging.getLogger("errors").error(f"ERROR requeue {e['id']} {ex}")
+            q.release(e["id"], retry)
+    done = 0
+    if work:
+        avs = list(avatars or sorted({a for _, o, _ in work for a in (o.get("audio_paths") or {})}) or ["default"])
+        try:
+            stages.synthesize([(p, o) for p, o, _ in work], avs, voice=voice, limit=len(work), pool=pool, checkpoint=False)
+            store = default_store()
+            written = []
+            for p, o, e in work:
+                cur = store.update(e["id"], _merge_into(o, e["action"] == "requeue"), source="requeue")
+                written.append((p, cur if cur is not None else o, e))
+            db = default_db()
+            db.upsert_items([(p, o) for p, o, _ in written])
+            for p, o, e in written:
+                if q.ack(e):
+                    db.clear_requeue(e["id"])
+                done += 1
+        except Exception as ex:
+            logging.getLogger("errors").error(f"ERROR requeue drain {ex}")
+            for _, _, e in work:
+                q.release(e["id"], retry)
+    return {"claimed": len(entries), "done": done, "missing": missing, "queue": q.depth()}
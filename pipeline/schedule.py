@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import logging
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+ALIASES = {"hourly": 3600, "4h": 4*3600, "daily": 24*3600}
+BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+def parse_every(spec, fallback=ALIASES["hourly"]):
+    # "10m", "2h", "90s", "hourly"... -> seconds; "demand"/"0"/"" -> None,
+    # meaning the stage runs whenever its input changes or it is triggered.
+    # Anything else is logged and replaced by `fallback` (hourly), as the
+    # scheduler did before stages had their own intervals.
+    s = str(spec or "").strip().lower()
+    if s in ("", "0", "demand", "on_demand", "on-demand"):
+        return None
+    if s in ALIASES:
+        return ALIASES[s]
+    try:
+        v = float(s[:-1]) * UNITS[s[-1]] if s[-1] in UNITS else float(s)
+        if v > 0:
+            return v
+    except ValueError:
+        pass
+    logging.getLogger("errors").warning(f"WARN schedule interval {spec!r} not understood, using {fallback}s")
+    return fallback
+
+def next_due(now, every, anchor=0.0):
+    # First slot strictly after `now` on the grid anchor + n*every, so runs
+    # stay on wall-clock boundaries however long each one takes.
+    return anchor + (int((now - anchor) // every) + 1) * every
+
+def dir_signature(pattern):
+    h = hashlib.sha1()
+    for f in sorted(glob.glob(pattern)):
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        h.update(f"{f}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def default_lock_path():
+    return os.environ.get("SCHED_LOCK_PATH", os.path.join("data", "scheduler", "run.lock"))
+
+class RunLock:
+    # Exclusive, non-blocking lock on a file shared by every scheduler
+    # process; flock is dropped by the OS if the holder dies. Without fcntl
+    # the file itself is the lock.
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if fcntl is None:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return True
+            except FileExistsError:
+                return False
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is None:
+            return
+        if fcntl is None:
+            os.close(self.fd)
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+class Histogram:
+    # Non-cumulative bucket counts of stage durations in seconds; the last
+    # bucket catches everything above BUCKETS[-1].
+    def __init__(self, data=None):
+        d = data or {}
+        self.counts = list(d.get("counts") or [0]*(len(BUCKETS) + 1))
+        self.n = int(d.get("n", 0))
+        self.total = float(d.get("sum", 0.0))
+        self.max = float(d.get("max", 0.0))
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        le = {str(b): c for b, c in zip(BUCKETS, self.counts)}
+        le["inf"] = self.counts[-1]
+        return {"counts": self.counts, "le": le, "n": self.n, "sum": round(self.total, 4), "max": round(self.max, 4)}
+
+class Stage:
+    # `fn()` does the work; `inputs()` returns a signature of what it reads,
+    # or None when there is nothing cheap to compare (always run).
+    def __init__(self, name, fn, every=None, inputs=None):
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.inputs = inputs
+
+class Scheduler:
+    # Runs each stage on its own wall-clock grid (or on demand), one stage at
+    # a time under a cross-process RunLock. Per-stage next run, last input
+    # signature, run/skip/missed counts and duration histograms persist in
+    # `state_path`, so downtime shows up as missed slots after a restart.
+    def __init__(self, stages, state_path=None, lock_path=None, anchor=None, clock=time.time):
+        self.stages = list(stages)
+        self.state_path = state_path or os.environ.get("SCHED_STATE_PATH", os.path.join("data", "scheduler", "state.json"))
+        self.lock = RunLock(lock_path or default_lock_path())
+        self.anchor = float(os.environ.get("SCHED_ANCHOR_SECONDS", "0") if anchor is None else anchor)
+        self.trigger_dir = os.path.join(os.path.dirname(self.state_path), "triggers")
+        self.clock = clock
+        self.state = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        for s in self.stages:
+            st = dict(data.get(s.name) or {})
+            st.setdefault("runs", 0)
+            st.setdefault("skips", 0)
+            st.setdefault("missed", 0)
+            st.setdefault("overlaps", 0)
+            st.setdefault("failures", 0)
+            st["hist"] = Histogram(st.get("hist"))
+            self.state[s.name] = st
+
+    def save(self):
+        out = {n: dict(st, hist=st["hist"].to_dict()) for n, st in self.state.items()}
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(out, f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            logging.getLogger("errors").error(f"ERROR scheduler state {e}")
+
+    def trigger(self, name):
+        os.makedirs(self.trigger_dir, exist_ok=True)
+        open(os.path.join(self.trigger_dir, name), "a").close()
+
+    def _triggered(self, name):
+        return os.path.exists(os.path.join(self.trigger_dir, name))
+
+    def _clear_trigger(self, name):
+        try:
+            os.remove(os.path.join(self.trigger_dir, name))
+        except OSError:
+            pass
+
+    def due(self, now):
+        # Stages to consider now, recording slots that passed unrun. A
+        # trigger file stays until its stage has actually run.
+        out = []
+        for s in self.stages:
+            st = self.state[s.name]
+            if s.every is None:
+                out.append((s, self._triggered(s.name)))
+                continue
+            nxt = st.get("next")
+            if nxt is None:
+                out.append((s, True))
+                continue
+            if now < nxt:
+                continue
+            missed = int((now - nxt) // s.every)
+            if missed:
+                st["missed"] += missed
+                logging.getLogger().info(f"MISSED {s.name} slots={missed}")
+            out.append((s, False))
+        return out
+
+    def run_stage(self, s, now, forced=False):
+        st = self.state[s.name]
+        if s.every is not None:
+            st["next"] = next_due(now, s.every, self.anchor)
+        sig = s.inputs() if s.inputs else None
+        if not forced and sig is not None and sig == st.get("input"):
+            if s.every is None:
+                return None
+            st["skips"] += 1
+            logging.getLogger().info(f"SKIP {s.name} input unchanged")
+            return None
+        if s.every is None and not forced and sig is None:
+            return None
+        if not self.lock.acquire():
+            st["overlaps"] += 1
+            logging.getLogger().info(f"OVERLAP {s.name} another run holds the lock")
+            return None
+        if forced and s.every is None:
+            self._clear_trigger(s.name)
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            ok = bool(s.fn())
+        except Exception as e:
+            logging.getLogger("errors").error(f"ERROR stage {s.name} {e}")
+        finally:
+            self.lock.release()
+        secs = time.perf_counter() - t0
+        st["hist"].observe(secs)
+        st["runs"] += 1
+        st["last_run"] = now
+        st["last_seconds"] = round(secs, 4)
+        if ok:
+            # Signature after the run, so a stage's own writes don't retrigger it.
+            st["input"] = s.inputs() if s.inputs else None
+        else:
+            st["failures"] += 1
+        log = logging.getLogger()
+        log.info(f"STAGE {s.name} ok={ok} seconds={secs:.4f}")
+        log.info(f"HIST {s.name} {json.dumps(st['hist'].to_dict())}")
+        return ok
+
+    def tick(self, now=None):
+        now = self.clock() if now is None else now
+        ran = {}
+        for s, forced in self.due(now):
+            r = self.run_stage(s, now, forced)
+            if r is not None:
+                ran[s.name] = r
+        self.save()
+        return ran
+
+    def sleep_for(self, now, poll):
+        nxt = [self.state[s.name].get("next") for s in self.stages if s.every is not None]
+        nxt = [n for n in nxt if n is not None]
+        wait = min(nxt) - now if nxt else poll
+        if any(s.every is None for s in self.stages):
+            wait = min(wait, poll)
+        return max(0.0, wait)
+
+    def loop(self, poll=None):
+        poll = float(poll or os.environ.get("SCHED_POLL_SECONDS", "15"))
+        while True:
+            self.tick()
+            time.sleep(self.sleep_for(self.clock(), poll))
+
+    def stats(self):
+        return {n: {k: (v.to_dict() if k == "hist" else v) for k, v in st.items() if k != "input"} for n, st in self.state.items()}
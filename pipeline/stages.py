@@ -0,0 +1,328 @@
+import os
+import json
+import glob
+import wave
+import hashlib
+import datetime as dt
+from dateutil import parser as dparser
+from ingest.rss_reader import fetch_rss
+from ingest.cleaner import clean_text, detect_language
+from agents.summarizer import summarize_short, summarize_medium
+from agents.sentiment import analyze
+from agents.trend import TrendEngine
+from agents.item_store import write_atomic, record_writes
+from agents.column_store import ColumnStore, has_columns
+
+SOURCES = [
+    "http://feeds.bbci.co.uk/news/world/rss.xml",
+    "https://feeds.npr.org/1004/rss.xml",
+    "https://www.aljazeera.com/xml/rss/all.xml",
+    "https://feeds.reuters.com/reuters/worldNews",
+    "https://www.theverge.com/rss/index.xml"
+]
+
+def ensure_dir(p):
+    os.makedirs(p, exist_ok=True)
+
+def day_dir(base, sub=None, date_override=None):
+    d = date_override or dt.datetime.utcnow().strftime("%Y%m%d")
+    p = os.path.join(base, d)
+    if sub:
+        p = os.path.join(p, sub)
+    ensure_dir(p)
+    return p
+
+def write_json(path, obj):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+def normalize_path(p):
+    if not p:
+        return p
+    return str(p).replace("\\", "/")
+
+def audio_duration(path):
+    try:
+        with wave.open(path, 'rb') as w:
+            frames = w.getnframes()
+            rate = w.getframerate()
+            return round(frames / float(rate), 2)
+    except Exception:
+        return None
+
+# ingest
+
+def ingest(sources=None, limit=20, out_dir=None, checkpoint=True):
+    # Raw items from every feed, in source order. With checkpoint the
+    # per-source rss_<n>.json files are written as before.
+    outp = (out_dir or day_dir(os.path.join("data", "raw"))) if checkpoint else None
+    items = []
+    for i, url in enumerate(sources or SOURCES):
+        got = fetch_rss(url, limit=limit)
+        if outp:
+            write_json(os.path.join(outp, f"rss_{i+1}.json"), {"source_url": url, "count": len(got), "items": got})
+        items.extend(got)
+    return items
+
+def load_raw(raw_dir):
+    items = []
+    for f in sorted(glob.glob(os.path.join(raw_dir, "*.json"))):
+        try:
+            with open(f, "r", encoding="utf-8") as fd:
+                data = json.load(fd)
+        except Exception:
+            continue
+        items.extend(data.get("items", []) or [])
+    return items
+
+def raw_hash(it):
+    return hashlib.sha1(json.dumps(it, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def raw_key(it):
+    # The processed item's id: feed id, then link, then the raw content hash.
+    return str(it.get("id") or it.get("link") or raw_hash(it))
+
+def item_filename(key):
+    # Stable per id, so reprocessing a day never renumbers its files.
+    return "item_" + hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:16] + ".json"
+
+# clean / summarize / sentiment
+
+def pick_category(title):
+    t = (title or "").lower()
+    if any(x in t for x in ["ai","tech","technology","software","gadgets"]):
+        return "technology"
+    if any(x in t for x in ["market","stock","economy","business","finance"]):
+        return "business"
+    if any(x in t for x in ["match","league","tournament","goal","sports"]):
+        return "sports"
+    if any(x in t for x in ["election","government","policy","politics"]):
+        return "politics"
+    return "general"
+
+def parse_time(s):
+    try:
+        return dparser.parse(s).isoformat()
+    except Exception:
+        return dt.datetime.utcnow().isoformat()
+
+def clean_item(it):
+    title = clean_text(it.get("title"))
+    summary_src = clean_text(it.get("summary"))
+    text = (title or "") + ". " + (summary_src or "")
+    return {"raw": it, "title": title, "text": text, "language": detect_language(text)}
+
+def summarize_item(rec):
+    rec["summary_short"] = summarize_short(rec["text"])
+    rec["summary_medium"] = summarize_medium(rec["text"])
+    return rec
+
+def sentiment_item(rec):
+    it = rec["raw"]
+    pol, conf, tone = analyze(rec["text"])
+    out = {
+        "id": raw_key(it),
+        "title": rec["title"],
+        "summary_short": rec["summary_short"],
+        "summary_medium": rec["summary_medium"],
+        "script": rec["summary_medium"],
+        "category": pick_category(rec["title"]),
+        "language": rec["language"],
+        "polarity": pol,
+        "confidence": conf,
+        "confidence_score": conf,
+        "reward_score": 0.0,
+        "rl_reward_score": 0.0,
+        "tone": tone,
+        "timestamp": parse_time(it.get("published"))
+    }
+    return out
+
+def process_item(it):
+    return sentiment_item(summarize_item(clean_item(it)))
+
+# Fields earned after processing (feedback, ranking, audio) survive a
+# reprocess or re-summarize; everything derived from the article text is redone.
+AUDIO_FIELDS = ("audio_path", "audio_paths", "audio_hashes", "audio_duration", "voice_used", "synthesis_status", "avatar")
+EARNED = ("reward_score", "rl_reward_score", "priority_score", "trend_score", "skip", "demote", "requeue_requested") + AUDIO_FIELDS
+
+def keep_earned(new, old):
+    for k in EARNED:
+        if old and k in old:
+            new[k] = old[k]
+    return new
+
+def existing_item(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def validate(obj):
+    cats = {"general","technology","business","sports","politics"}
+    pols = {"positive","neutral","negative"}
+    tones = {"calm","urgent","joyful"}
+    def ok_str(x, n=1):
+        return isinstance(x, str) and len(x.strip()) >= n
+    if not ok_str(obj.get("id"), 1):
+        return False
+    if not ok_str(obj.get("title"), 3):
+        return False
+    if not ok_str(obj.get("summary_short"), 5):
+        return False
+    if not ok_str(obj.get("summary_medium"), 5):
+        return False
+    if obj.get("category") not in cats:
+        return False
+    if not ok_str(obj.get("language"), 2):
+        return False
+    if obj.get("polarity") not in pols:
+        return False
+    try:
+        c = float(obj.get("confidence" if obj.get("confidence") is not None else obj.get("confidence_score", 0.5)))
+        if not (0.0 <= c <= 1.0):
+            return False
+    except Exception:
+        return False
+    if obj.get("tone") not in tones:
+        return False
+    try:
+        _ = dparser.parse(obj.get("timestamp"))
+    except Exception:
+        return False
+    return True
+
+def process(raw_items, out_dir=None, checkpoint=True, max_items=10):
+    # Returns [(path, item)] for valid items; path is None without checkpoint,
+    # and then nothing (items or trend state) is written. Every item is
+    # reprocessed; see pipeline.incremental for change-driven runs.
+    outp = (out_dir or day_dir(os.path.join("data", "processed"))) if checkpoint else None
+    engine = TrendEngine.load()
+    records = []
+    for it in raw_items:
+        obj = process_item(it)
+        if validate(obj):
+            path = None
+            if outp:
+                path = os.path.join(outp, item_filename(raw_key(it)))
+                keep_earned(obj, existing_item(path))
+                try:
+                    write_atomic(path, obj)
+                except Exception:
+                    continue
+            records.append((path, obj))
+            engine.add(obj)
+        if max_items and len(records) >= max_items:
+            break
+    if outp:
+        engine.save()
+        record_writes(outp, records, "process")
+    return records
+
+def load_processed(proc_dir):
+    # One mmap'd column store when the day has one, else every item file.
+    if has_columns(proc_dir):
+        return sorted(ColumnStore(proc_dir).records(), key=lambda r: r[0])
+    records = []
+    for f in sorted(glob.glob(os.path.join(proc_dir, "item_*.json"))):
+        try:
+            with open(f, "r", encoding="utf-8") as fd:
+                records.append((f, json.load(fd)))
+        except Exception:
+            continue
+    return records
+
+# audio
+
+def parse_avatars(spec, default="default"):
+    out = []
+    for n in (spec or "").split(","):
+        n = n.strip()
+        if n and n not in out:
+            out.append(n)
+    return out or [default]
+
+def apply_results(obj, voice, results):
+    # results: [(avatar, out_path, ok, status, audio_hash, duration)] in
+    # avatar order. The flat fields describe the last avatar, matching what
+    # separate per-avatar runs used to leave behind; audio_paths keeps every
+    # avatar.
+    paths = dict(obj.get("audio_paths") or {})
+    hashes = dict(obj.get("audio_hashes") or {})
+    for avatar, out_path, ok, status, key, dur in results:
+        paths[avatar] = normalize_path(out_path) if ok else None
+        hashes[avatar] = key if ok else None
+        if ok and dur is None:
+            dur = audio_duration(out_path)
+        obj["audio_path"] = paths[avatar]
+        obj["audio_duration"] = dur if ok else None
+        obj["voice_used"] = voice
+        obj["synthesis_status"] = status
+        obj["avatar"] = avatar
+    obj["audio_paths"] = paths
+    obj["audio_hashes"] = hashes
+    return obj
+
+def _audio_base(path, obj):
+    if path:
+        return os.path.splitext(os.path.basename(path))[0]
+    return "item_" + hashlib.sha1(str(obj.get("id") or "").encode("utf-8")).hexdigest()[:12]
+
+def submit_audio(pool, path, obj, avatars, audio_dirs, voice="default"):
+    text = obj.get("summary_medium") or obj.get("summary_short") or obj.get("title")
+    tone = obj.get("tone") or "calm"
+    lang = obj.get("language") or "en"
+    base = _audio_base(path, obj)
+    futs = []
+    for a in avatars:
+        out_path = os.path.join(audio_dirs[a], f"{base}_{a}.wav")
+        futs.append((a, out_path, pool.submit(text, voice, tone, lang, out_path)))
+    return futs
+
+def finish_audio(path, obj, futs, voice="default", checkpoint=True):
+    results = []
+    for a, out_path, fut in futs:
+        ok, status, key, dur = fut.result()
+        results.append((a, out_path, ok, status, key, dur))
+    apply_results(obj, voice, results)
+    if checkpoint and path:
+        write_atomic(path, obj)
+        record_writes(os.path.dirname(path), [(path, obj)], "audio")
+    return path, obj
+
+def audio_dirs_for(avatars, date=None):
+    return {a: day_dir(os.path.join("data", "audio"), a, date_override=date) for a in avatars}
+
+def synthesize(records, avatars, voice="default", limit=10, date=None, workers=None, checkpoint=True, pool=None):
+    # Synthesizes the first `limit` records for every avatar through one
+    # SynthesisPool and writes each item's metadata once. Returns all records
+    # (the rest pass through untouched) and a summary. tts.pool pulls in pyttsx3, so it is only
+    # imported when audio is actually requested.
+    from tts.pool import SynthesisPool
+    audio_dirs = audio_dirs_for(avatars, date)
+    own = pool is None
+    pool = pool or SynthesisPool(remote_workers=workers)
+    records = list(records)
+    jobs = []
+    try:
+        for path, obj in records[:max(0, limit)]:
+            jobs.append((path, obj, submit_audio(pool, path, obj, avatars, audio_dirs, voice)))
+        out = [finish_audio(path, obj, futs, voice, checkpoint) for path, obj, futs in jobs]
+        out.extend(records[len(jobs):])
+        cache = {"hits": pool.hits, "misses": pool.misses}
+    finally:
+        if own:
+            pool.close()
+    return out, {"audio_generated": len(jobs), "cache": cache, "avatars": avatars, "audio_dir": audio_dirs[avatars[-1]], "audio_dirs": audio_dirs}
+
+# rank / export
+
+def with_day_items(records, proc_dir):
+    # This run's records as they are in memory, plus items processed earlier
+    # today that this run did not touch, in filename order as before.
+    mem = {p: o for p, o in records if p}
+    out = [(p, o) for p, o in records if not p]
+    for f, o in load_processed(proc_dir):
+        out.append((f, mem.get(f, o)))
+    return out
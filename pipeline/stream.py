@@ -0,0 +1,163 @@
+import os
+import json
+import queue
+import threading
+import collections
+from pipeline import stages
+from agents.trend import TrendEngine
+from agents.ranker import rank_stream_export
+
+_END = object()
+
+class _Failed:
+    def __init__(self, exc):
+        self.exc = exc
+
+def bounded(items, maxsize=None):
+    # Runs the upstream generator on its own thread, at most `maxsize` items
+    # ahead of the consumer. A full queue blocks the producer (backpressure);
+    # an upstream error is re-raised downstream; closing the consumer stops
+    # the producer at its next put.
+    q = queue.Queue(maxsize=max(1, int(maxsize or os.environ.get("PIPELINE_QUEUE_SIZE", "16"))))
+    stop = threading.Event()
+    def put(x):
+        while not stop.is_set():
+            try:
+                q.put(x, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    def run():
+        try:
+            for x in items:
+                if not put(x):
+                    return
+        except BaseException as e:
+            put(_Failed(e))
+            return
+        put(_END)
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            x = q.get()
+            if x is _END:
+                return
+            if isinstance(x, _Failed):
+                raise x.exc
+            yield x
+    finally:
+        stop.set()
+
+# stages: each consumes an iterator and yields as soon as an item is ready
+
+def ingest(sources=None, limit=20, out_dir=None, checkpoint=True):
+    outp = (out_dir or stages.day_dir(os.path.join("data", "raw"))) if checkpoint else None
+    for i, url in enumerate(sources or stages.SOURCES):
+        got = stages.fetch_rss(url, limit=limit)
+        if outp:
+            stages.write_json(os.path.join(outp, f"rss_{i+1}.json"), {"source_url": url, "count": len(got), "items": got})
+        yield from got
+
+def clean(raw_items):
+    for it in raw_items:
+        yield stages.raw_key(it), stages.clean_item(it)
+
+def summarize(recs):
+    for key, rec in recs:
+        yield key, stages.summarize_item(rec)
+
+def sentiment(recs):
+    for key, rec in recs:
+        yield key, stages.sentiment_item(rec)
+
+def keep(objs, out_dir=None, checkpoint=True, max_items=None):
+    # Drops invalid items and, with checkpoint, writes each item to its
+    # stable file (as stages.process does) and updates the trend state.
+    outp = (out_dir or stages.day_dir(os.path.join("data", "processed"))) if checkpoint else None
+    engine = TrendEngine.load() if checkpoint else None
+    n = 0
+    try:
+        for key, obj in objs:
+            if not stages.validate(obj):
+                continue
+            path = None
+            if outp:
+                path = os.path.join(outp, stages.item_filename(key))
+                stages.keep_earned(obj, stages.existing_item(path))
+                try:
+                    stages.write_json(path, obj)
+                except Exception:
+                    continue
+            if engine is not None:
+                engine.add(obj)
+            if path:
+                stages.record_writes(outp, [(path, obj)], "stream")
+            n += 1
+            yield path, obj
+            if max_items and n >= max_items:
+                return
+    finally:
+        if engine is not None:
+            engine.save()
+
+def audio(records, pool, avatars, voice="default", limit=10, date=None, checkpoint=True, window=None):
+    # Submits the first `limit` records to the pool and yields records in
+    # input order, with at most `window` of them held while synthesis runs.
+    dirs = stages.audio_dirs_for(avatars, date)
+    window = max(1, int(window or os.environ.get("PIPELINE_AUDIO_WINDOW", "16")))
+    held = collections.deque()
+    n = 0
+    for path, obj in records:
+        futs = None
+        if n < limit:
+            futs = stages.submit_audio(pool, path, obj, avatars, dirs, voice)
+            n += 1
+        held.append((path, obj, futs))
+        while len(held) > window:
+            yield _done(held.popleft(), voice, checkpoint)
+    while held:
+        yield _done(held.popleft(), voice, checkpoint)
+
+def _done(job, voice, checkpoint):
+    path, obj, futs = job
+    if futs is None:
+        return path, obj
+    return stages.finish_audio(path, obj, futs, voice, checkpoint)
+
+def rank(records, k=10, trend_state=None, compact=False):
+    return rank_stream_export((obj for _, obj in records), k, trend_state, compact)
+
+def stream_json(path):
+    # Yields items out of a weekly_report.json without loading it whole; the
+    # exporter writes one item per top-level array slot.
+    dec = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(65536)
+        i = buf.find('"items"')
+        while i < 0:
+            more = f.read(65536)
+            if not more:
+                return
+            buf += more
+            i = buf.find('"items"')
+        buf = buf[buf.index("[", i) + 1:]
+        while True:
+            buf = buf.lstrip().lstrip(",").lstrip()
+            if not buf:
+                buf = f.read(65536)
+                if not buf:
+                    return
+                continue
+            if buf.startswith("]"):
+                return
+            try:
+                obj, end = dec.raw_decode(buf)
+            except ValueError:
+                more = f.read(65536)
+                if not more:
+                    return
+                buf += more
+                continue
+            yield obj
+            buf = buf[end:]
@@ -1,7 +1,18 @@
 import os
 import json
+import time
+import queue
+import logging
+import atexit
+import threading
 import datetime as dt
 import hashlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+GENESIS = "0"*64
 
 DEFAULT_WEIGHTS = {
     "editor_approve": 1.0,
@@ -45,45 +56,349 @@ def _provenance_path():
     return os.path.join("data","provenance","log.jsonl")
 
 def _last_hash(path):
+    # Head of the chain: GENESIS for a missing or empty log. A log with
+    # content but no readable head raises instead, so an append can never
+    # silently fork the chain from GENESIS.
     try:
-        if not os.path.exists(path):
-            return "0"*64
-        with open(path, "rb") as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            pos = max(0, size-4096)
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return GENESIS
+    with f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return GENESIS
+        window = 4096
+        while True:
+            pos = max(0, size - window)
             f.seek(pos)
-            tail = f.read().decode("utf-8", errors="ignore").splitlines()
+            lines = f.read().splitlines()
+            if pos:
+                lines = lines[1:]
+            for line in reversed(lines):
+                try:
+                    h = json.loads(line).get("hash")
+                except Exception:
+                    continue
+                if h:
+                    return h
+            if pos == 0:
+                raise ValueError(f"no chain head in {path}")
+            window *= 4
+
+def _chain(prev, content_hash):
+    return hashlib.sha256((prev + content_hash).encode("utf-8")).hexdigest()
+
+def _content_hash(data):
+    payload = json.dumps(data or {}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ProvenanceLedger:
+    # Single in-process writer for the hash chain. The head hash and sequence
+    # are cached, appends are batched by a background thread, and every
+    # `checkpoint_every` records a checkpoint line is written and its byte
+    # offset indexed in <log>.idx so verify() can start mid-file. An index
+    # entry is only used if the log still holds that checkpoint at that
+    # offset, so a rewritten log never trusts a stale index.
+    def __init__(self, path=None, batch=None, flush_seconds=None, checkpoint_every=None):
+        self.path = os.path.abspath(path or _provenance_path())
+        self.idx_path = self.path + ".idx"
+        self.batch = int(batch or os.environ.get("PROVENANCE_BATCH", "128"))
+        self.flush_seconds = float(flush_seconds or os.environ.get("PROVENANCE_FLUSH_SECONDS", "0.5"))
+        self.checkpoint_every = int(checkpoint_every or os.environ.get("PROVENANCE_CHECKPOINT_EVERY", "256"))
+        self.q = queue.Queue(maxsize=int(os.environ.get("PROVENANCE_QUEUE", "10000")))
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.head = None
+        self.seq = 0
+        self.size = -1
+        self.lost = 0
+
+    def _load_head(self):
+        # Only needed at start-up or when another process appended since our
+        # last write; otherwise the cached head is authoritative.
+        self.head = _last_hash(self.path)
+        self.seq = 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                self.size = f.tell()
+                f.seek(max(0, self.size - 4096))
+                tail = f.read().decode("utf-8", errors="ignore").splitlines()
             for line in reversed(tail):
                 try:
                     obj = json.loads(line)
-                    h = obj.get("hash")
-                    if h:
-                        return h
                 except Exception:
                     continue
-    except Exception:
-        return "0"*64
-    return "0"*64
+                if obj.get("seq") is not None:
+                    self.seq = int(obj.get("seq"))
+                    break
+            else:
+                with open(self.path, "rb") as f:
+                    self.seq = sum(1 for line in f if b'"hash"' in line)
+        except FileNotFoundError:
+            self.size = 0
 
-def append_provenance(stage, item_id, data):
-    path = _provenance_path()
-    try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        prev = _last_hash(path)
-        payload = json.dumps(data or {}, ensure_ascii=False, sort_keys=True)
-        content_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
-        curr = hashlib.sha256((prev + content_hash).encode("utf-8")).hexdigest()
+    def append(self, stage, item_id, data, wait=None):
+        # With `wait` (seconds), True only once the record is fsynced;
+        # without, True means queued and flush() reports whether it landed.
         rec = {
             "ts": dt.datetime.utcnow().isoformat(),
             "stage": stage,
             "id": item_id,
-            "prev_hash": prev,
-            "content_hash": content_hash,
-            "hash": curr
+            "content_hash": _content_hash(data),
+            "_done": threading.Event()
         }
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-        return True
+        if self.closed:
+            return False
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="provenance-ledger", daemon=True)
+                self.thread.start()
+        try:
+            self.q.put(rec, timeout=float(os.environ.get("PROVENANCE_PUT_TIMEOUT", "0.5")))
+        except queue.Full:
+            return False
+        if not wait:
+            return True
+        return rec["_done"].wait(wait) and rec.get("_ok", False)
+
+    def _write_batch(self, recs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                if self.head is None or f.tell() != self.size:
+                    self._load_head()
+                    f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                lines = []
+                checkpoints = []
+                for r in recs:
+                    self.seq += 1
+                    r["seq"] = self.seq
+                    r["prev_hash"] = self.head
+                    r["hash"] = _chain(self.head, r["content_hash"])
+                    self.head = r["hash"]
+                    line = (json.dumps({k: v for k, v in r.items() if not k.startswith("_")}, ensure_ascii=False) + "\n").encode("utf-8")
+                    lines.append(line)
+                    offset += len(line)
+                    if self.seq % self.checkpoint_every == 0:
+                        cp = {"type": "checkpoint", "seq": self.seq, "head": self.head, "ts": r["ts"]}
+                        checkpoints.append({"seq": self.seq, "offset": offset, "head": self.head})
+                        line = (json.dumps(cp) + "\n").encode("utf-8")
+                        lines.append(line)
+                        offset += len(line)
+                try:
+                    f.write(b"".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                except Exception:
+                    f.truncate(offset - sum(len(x) for x in lines))
+                    raise
+                self.size = offset
+                if checkpoints:
+                    # The records are durable at this point; a missing index
+                    # entry only makes verify() start from an earlier one.
+                    try:
+                        with open(self.idx_path, "a", encoding="utf-8") as fi:
+                            for c in checkpoints:
+                                fi.write(json.dumps(c) + "\n")
+                    except Exception as e:
+                        logging.error(f"PROVENANCE checkpoint index write failed: {e}")
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _run(self):
+        while True:
+            try:
+                first = self.q.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                if self.closed:
+                    return
+                continue
+            recs = [] if first is None else [first]
+            stop = first is None
+            while len(recs) < self.batch and not stop:
+                try:
+                    x = self.q.get_nowait()
+                except queue.Empty:
+                    break
+                if x is None:
+                    stop = True
+                else:
+                    recs.append(x)
+            taken = len(recs) + (1 if stop else 0)
+            try:
+                if recs:
+                    self._write_batch(recs)
+                for r in recs:
+                    r["_ok"] = True
+                    r["_done"].set()
+            except Exception as e:
+                # Nothing of the batch is trusted as written: the head and seq
+                # are reloaded from the file and the records go back on the
+                # queue to be chained again, up to PROVENANCE_MAX_RETRIES.
+                self.head = None
+                if self._requeue(recs, e) and stop:
+                    # Retry what was requeued before honouring close().
+                    try:
+                        self.q.put_nowait(None)
+                        stop = False
+                    except queue.Full:
+                        pass
+            for _ in range(taken):
+                self.q.task_done()
+            if stop:
+                return
+
+    def _requeue(self, recs, exc):
+        retries = int(os.environ.get("PROVENANCE_MAX_RETRIES", "3"))
+        dropped = 0
+        for r in recs:
+            for k in ("seq", "prev_hash", "hash"):
+                r.pop(k, None)
+            r["_retries"] = r.get("_retries", 0) + 1
+            try:
+                if r["_retries"] > retries:
+                    raise queue.Full
+                self.q.put_nowait(r)
+            except queue.Full:
+                dropped += 1
+                r["_done"].set()
+        with self.lock:
+            self.lost += dropped
+        logging.error(f"PROVENANCE batch of {len(recs)} failed ({exc}); requeued {len(recs) - dropped}, dropped {dropped}")
+        time.sleep(self.flush_seconds)
+        return len(recs) - dropped
+
+    def flush(self, timeout=5.0):
+        # True when everything queued so far is written and no record was
+        # dropped since the previous flush.
+        end = time.time() + timeout
+        while self.q.unfinished_tasks and time.time() < end:
+            time.sleep(0.01)
+        with self.lock:
+            lost, self.lost = self.lost, 0
+        return not self.q.unfinished_tasks and not lost
+
+    def close(self, timeout=5.0):
+        if self.closed:
+            return
+        self.closed = True
+        t = self.thread
+        if t is not None and t.is_alive():
+            try:
+                self.q.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            t.join(timeout)
+
+    def _checkpoint_for(self, seq):
+        # Latest indexed checkpoint strictly before `seq` (its offset is just
+        # past record `seq`, so only an earlier one lets verify read it) that
+        # the log still holds.
+        found = []
+        try:
+            with open(self.idx_path, "r", encoding="utf-8") as fi:
+                for line in fi:
+                    try:
+                        c = json.loads(line)
+                    except Exception:
+                        continue
+                    if c.get("seq", 0) < seq:
+                        found.append(c)
+                    else:
+                        break
+        except FileNotFoundError:
+            pass
+        for c in reversed(found):
+            if self._checkpoint_at(c):
+                return c
+        return None
+
+    def _checkpoint_at(self, c):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(int(c.get("offset", 0)))
+                obj = json.loads(f.readline())
+        except Exception:
+            return False
+        return obj.get("type") == "checkpoint" and obj.get("seq") == c.get("seq") and obj.get("head") == c.get("head")
+
+    def verify(self, start=None, end=None):
+        # Checks prev_hash linkage and hash == sha256(prev_hash + content_hash)
+        # for records with start <= seq <= end. Starts from the nearest
+        # checkpoint before `start` instead of the top of the file.
+        self.flush()
+        cp = self._checkpoint_for(start) if start else None
+        running = cp.get("head") if cp else None
+        offset = cp.get("offset", 0) if cp else 0
+        checked = 0
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return {"ok": True, "checked": 0, "bad_seq": None}
+        with f:
+            f.seek(offset)
+            n = cp.get("seq", 0) if cp else 0
+            for raw in f:
+                try:
+                    obj = json.loads(raw)
+                except Exception:
+                    continue
+                if obj.get("type") == "checkpoint":
+                    if running is not None and obj.get("head") != running:
+                        return {"ok": False, "checked": checked, "bad_seq": obj.get("seq")}
+                    continue
+                if not obj.get("hash"):
+                    continue
+                n = int(obj.get("seq") or (n + 1))
+                if end is not None and n > end:
+                    break
+                prev = obj.get("prev_hash")
+                ok = obj.get("hash") == _chain(prev or "", obj.get("content_hash") or "")
+                if running is not None and prev != running:
+                    ok = False
+                if running is None and n == 1 and prev != GENESIS:
+                    ok = False
+                running = obj.get("hash")
+                if start is not None and n < start:
+                    continue
+                if not ok:
+                    return {"ok": False, "checked": checked, "bad_seq": n}
+                checked += 1
+        return {"ok": True, "checked": checked, "bad_seq": None}
+
+_LEDGER = None
+_LEDGER_LOCK = threading.Lock()
+
+def ledger():
+    global _LEDGER
+    with _LEDGER_LOCK:
+        if _LEDGER is None:
+            _LEDGER = ProvenanceLedger()
+            atexit.register(_LEDGER.close)
+        return _LEDGER
+
+def append_provenance(stage, item_id, data, wait=True):
+    # Durable by default: True once the record is fsynced. Batch writers pass
+    # wait=False and check flush_provenance() at the end.
+    try:
+        timeout = float(os.environ.get("PROVENANCE_WAIT_SECONDS", "5")) if wait else None
+        return ledger().append(stage, item_id, data, wait=timeout)
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+def flush_provenance(timeout=5.0):
+    try:
+        return ledger().flush(timeout)
+    except Exception:
+        return False
+
+def verify_provenance(start=None, end=None):
+    return ledger().verify(start, end)
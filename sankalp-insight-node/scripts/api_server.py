@@ -11,16 +11,17 @@ import hashlib
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.rl_feedback import compute_reward, log_event, append_provenance
 from agents.automator import decide, requeue_item, queue_item, demote_item, update_item_fields
+from server.ratelimit import RateLimiter
 
-class ApiHandler(BaseHTTPRequestHandler):
-    RATE_LIMITS = {}
-    RATE_WINDOW_SECONDS = int(os.environ.get('RATE_WINDOW_SECONDS','60'))
-    RATE_LIMIT_PER_WINDOW = int(os.environ.get('RATE_LIMIT_PER_WINDOW','60'))
+LIMITER = RateLimiter.from_env(("/feedback", "/requeue"))
 
-    def _send(self, code, obj):
+class ApiHandler(BaseHTTPRequestHandler):
+    def _send(self, code, obj, headers=()):
         data = json.dumps(obj).encode("utf-8")
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
+        for k, v in headers:
+            self.send_header(k, v)
         self.send_header("Content-Length", str(len(data)))
         self.end_headers()
         self.wfile.write(data)
@@ -31,15 +32,11 @@ class ApiHandler(BaseHTTPRequestHandler):
         except Exception:
             return "unknown"
 
-    def _allow(self, key):
-        now = int(time.time())
-        win = now // self.RATE_WINDOW_SECONDS
-        k = f"{key}:{win}"
-        c = self.RATE_LIMITS.get(k, 0)
-        if c >= self.RATE_LIMIT_PER_WINDOW:
-            return False
-        self.RATE_LIMITS[k] = c + 1
-        return True
+    def _allow(self):
+        ok, wait = LIMITER.allow(self.path.split("?", 1)[0], self._client_ip())
+        if not ok:
+            self._send(429, {"error": "rate_limited"}, [("Retry-After", str(int(wait) + 1))])
+        return ok
 
     def _verify_signature(self, body_bytes):
         secret = os.environ.get('API_SECRET')
@@ -66,9 +63,8 @@ class ApiHandler(BaseHTTPRequestHandler):
         except Exception:
             return self._send(400, {"error": "invalid_json"})
 
-        ip = self._client_ip()
-        if not self._allow(f"{ip}:{self.path}"):
-            return self._send(429, {"error": "rate_limited"})
+        if not self._allow():
+            return
         if not self._verify_signature(body):
             return self._send(401, {"error": "invalid_signature"})
 
@@ -109,6 +105,10 @@ class ApiHandler(BaseHTTPRequestHandler):
         return self._send(404, {"error": "not_found"})
 
     def do_GET(self):
+        if not self._allow():
+            return
+        if self.path == "/metrics":
+            return self._send(200, {"rate_limit": LIMITER.stats()})
         if self.path == "/processed/sample":
             sample = None
             try:
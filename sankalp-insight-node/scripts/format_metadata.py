@@ -8,7 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ingest.cleaner import clean_text, detect_language
 from agents.summarizer import summarize_short, summarize_medium
 from agents.sentiment import analyze
-from agents.rl_feedback import append_provenance
+from agents.rl_feedback import append_provenance, flush_provenance
 
 def ensure_dir(p):
     os.makedirs(p, exist_ok=True)
@@ -61,7 +61,7 @@ def process_item(it):
         "timestamp": ts
     }
     try:
-        append_provenance("format", out.get("id"), out)
+        append_provenance("format", out.get("id"), out, wait=False)
     except Exception:
         pass
     return out
@@ -120,7 +120,7 @@ def main():
                 continue
         if count >= 10:
             break
-    print(json.dumps({"processed": count, "output_dir": out_dir}))
+    print(json.dumps({"processed": count, "output_dir": out_dir, "provenance_ok": flush_provenance()}))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,7 +7,7 @@ import wave
 import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from tts.vaani_client import synthesize as vaani_synth
-from tts.fallback import simplify_text, synthesize_local
+from tts.fallback import simplify_text, synthesize_hosted
 
 def ensure_dir(p):
     os.makedirs(p, exist_ok=True)
@@ -43,7 +43,7 @@ def synthesize_text(text, voice, tone, lang, out_path):
         status = "success"
     else:
         simp = simplify_text(text)
-        res2 = synthesize_local(simp, voice=voice, tone=tone, lang=lang, out_path=out_path)
+        res2 = synthesize_hosted(simp, voice=voice, tone=tone, lang=lang, out_path=out_path)
         if isinstance(res2, str) and os.path.exists(res2):
             ok = True
             status = "fallback"
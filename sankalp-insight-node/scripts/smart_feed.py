@@ -2,13 +2,12 @@ import os
 import sys
 import glob
 import json
-import math
 import datetime as dt
 import argparse
 from dateutil import parser as dparser
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.trend import compute as compute_trend
-from agents.rl_feedback import append_provenance
+from agents.rl_feedback import append_provenance, flush_provenance
 
 def ensure_dir(p):
     os.makedirs(p, exist_ok=True)
@@ -65,7 +64,7 @@ def rank(items):
         if y.get("audio_path"):
             y["audio_path"] = normalize_path(y.get("audio_path"))
         try:
-            append_provenance("rank", y.get("id"), y)
+            append_provenance("rank", y.get("id"), y, wait=False)
         except Exception:
             pass
         ranked.append(y)
@@ -129,7 +128,7 @@ def main():
     for c, arr in cats.items():
         cats[c] = arr[:10]
     csv_path, json_path = export_weekly(feed)
-    print(json.dumps({"categories": list(cats.keys()), "top_counts": {k: len(v) for k,v in cats.items()}, "csv": csv_path, "json": json_path}))
+    print(json.dumps({"categories": list(cats.keys()), "top_counts": {k: len(v) for k,v in cats.items()}, "csv": csv_path, "json": json_path, "provenance_ok": flush_provenance()}))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -11,11 +11,16 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
 sys.path.append(os.path.dirname(BASE_DIR))
 try:
-    from tts.fallback import simplify_text, synthesize_local
+    from tts.fallback import simplify_text, synthesize_hosted
 except Exception:
     simplify_text = lambda x: x
-    def synthesize_local(text, voice='default', tone='calm', lang='en', out_path=None):
+    def synthesize_hosted(text, voice='default', tone='calm', lang='en', out_path=None):
         return None
+try:
+    from tts.cache import AudioCache, cache_key
+    AUDIO_CACHE = AudioCache(os.environ.get('TTS_CACHE_DIR') or os.path.join(BASE_DIR, 'data', 'audio_cache'))
+except Exception:
+    AUDIO_CACHE = None
 
 def load_weekly_report():
     path = os.path.join(BASE_DIR, 'exports', 'weekly_report.json')
@@ -58,11 +63,29 @@ def get_or_synthesize_audio(item, avatar='streamlit'):
     if not text:
         return None
     simp = simplify_text(text)
+    tone = item.get('tone') or 'calm'
+    lang = item.get('language') or 'en'
+    if AUDIO_CACHE is not None:
+        # Keyed like the pipeline's local fallback, so a shared TTS_CACHE_DIR
+        # reuses its clips; nothing is copied per item.
+        key = cache_key(simp, 'default', tone, lang, 'pyttsx3')
+        hit = AUDIO_CACHE.get(key)
+        if not hit:
+            tmp = os.path.join(AUDIO_CACHE.root, 'tmp', f"{key}_{avatar}.wav")
+            os.makedirs(os.path.dirname(tmp), exist_ok=True)
+            res = synthesize_hosted(simp, voice='default', tone=tone, lang=lang, out_path=tmp)
+            if isinstance(res, str) and os.path.exists(res):
+                hit = AUDIO_CACHE.put(key, res)
+                os.remove(res)
+        if hit:
+            item['audio_path'] = os.path.relpath(hit, BASE_DIR).replace('\\','/')
+            return read_audio_bytes(item['audio_path'])
+        return None
     slug = str(item.get('id') or item.get('title') or 'sample').replace('/', '_').replace('\\','_')[:40]
     out_dir = os.path.join(BASE_DIR, 'data', 'audio', 'streamlit')
     os.makedirs(out_dir, exist_ok=True)
     out_path = os.path.join(out_dir, f"{slug}_{avatar}.wav")
-    res = synthesize_local(simp, voice='default', tone=item.get('tone') or 'calm', lang=item.get('language') or 'en', out_path=out_path)
+    res = synthesize_hosted(simp, voice='default', tone=tone, lang=lang, out_path=out_path)
     if isinstance(res, str) and os.path.exists(res):
         item['audio_path'] = os.path.relpath(res, BASE_DIR).replace('\\','/')
         return read_audio_bytes(item['audio_path'])
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.rl_feedback import ProvenanceLedger
+
+def test_ledger_chain_checkpoints_and_verify(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    led = ProvenanceLedger(path=path, batch=16, flush_seconds=0.05, checkpoint_every=10)
+    for i in range(35):
+        assert led.append("rank", f"id{i}", {"n": i})
+    assert led.flush()
+    res = led.verify()
+    assert res["ok"] and res["checked"] == 35
+    mid = led.verify(start=25, end=30)
+    assert mid["ok"] and mid["checked"] == 6
+    led.close()
+    again = ProvenanceLedger(path=path, flush_seconds=0.05, checkpoint_every=10)
+    again.append("feedback", "id35", {"n": 35})
+    again.flush()
+    assert again.verify()["checked"] == 36
+    again.close()
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    recs = [json.loads(x) for x in lines]
+    assert sum(1 for r in recs if r.get("type") == "checkpoint") == 3
+    bad = [r for r in recs if r.get("seq") == 28 and r.get("hash")][0]
+    bad["content_hash"] = "f"*64
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in recs))
+    res = ProvenanceLedger(path=path, checkpoint_every=10).verify(start=21)
+    assert not res["ok"] and res["bad_seq"] == 28
+
+def test_verify_range_starting_on_checkpoint(tmp_path):
+    led = ProvenanceLedger(path=str(tmp_path / "log.jsonl"), batch=16, flush_seconds=0.05, checkpoint_every=10)
+    for i in range(25):
+        led.append("rank", f"id{i}", {"n": i})
+    assert led.flush()
+    assert led.verify(20, 20) == {"ok": True, "checked": 1, "bad_seq": None}
+    assert led.verify(10, 12)["checked"] == 3
+    assert led.verify(start=10)["checked"] == 16
+    led.close()
+
+def test_failed_batch_is_requeued(tmp_path, monkeypatch):
+    led = ProvenanceLedger(path=str(tmp_path / "log.jsonl"), batch=16, flush_seconds=0.01, checkpoint_every=10)
+    real = led._write_batch
+    fails = [1]
+    def flaky(recs):
+        if fails:
+            fails.pop()
+            raise OSError("disk full")
+        return real(recs)
+    monkeypatch.setattr(led, "_write_batch", flaky)
+    for i in range(5):
+        led.append("rank", f"id{i}", {"n": i})
+    assert led.flush()
+    led.close()
+    res = ProvenanceLedger(path=str(tmp_path / "log.jsonl")).verify()
+    assert res["ok"] and res["checked"] == 5
+    with open(tmp_path / "log.jsonl", "r", encoding="utf-8") as f:
+        recs = [json.loads(x) for x in f]
+    assert [r["id"] for r in recs] == [f"id{i}" for i in range(5)] and "_retries" not in recs[0]
+
+def test_append_waits_for_durability_and_refuses_unreadable_head(tmp_path):
+    path = tmp_path / "log.jsonl"
+    led = ProvenanceLedger(path=str(path), flush_seconds=0.01)
+    assert led.append("rank", "a", {"n": 1}, wait=5)
+    assert json.loads(path.read_text())["id"] == "a"
+    led.close()
+    path.write_text("not json\n")
+    bad = ProvenanceLedger(path=str(path), flush_seconds=0.01)
+    assert not bad.append("rank", "b", {"n": 2}, wait=5)
+    assert not bad.flush()
+    bad.close()
+    assert path.read_text() == "not json\n"
+
+def test_stale_checkpoint_index_is_ignored(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    led = ProvenanceLedger(path=path, batch=16, flush_seconds=0.01, checkpoint_every=10)
+    for i in range(25):
+        led.append("rank", f"id{i}", {"n": i})
+    assert led.flush()
+    led.close()
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(x for x in lines if '"checkpoint"' not in x))
+    again = ProvenanceLedger(path=path, checkpoint_every=10)
+    assert again._checkpoint_for(22) is None
+    assert again.verify(start=22) == {"ok": True, "checked": 4, "bad_seq": None}
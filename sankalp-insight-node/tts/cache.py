@@ -0,0 +1,115 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+def cache_key(text, voice, tone, lang, engine):
+    raw = json.dumps([text or "", voice or "", tone or "", lang or "", engine or ""], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _link_or_copy(src, dst):
+    # Hard link into place through a temp name so readers never see a partial
+    # file; copy where links are not possible (other device, FAT, Windows ACLs).
+    d = os.path.dirname(dst) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".audio_", suffix=".tmp", dir=d)
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+        raise
+    return dst
+
+class AudioCache:
+    # Content-addressed WAV store: <dir>/<key[:2]>/<key>.wav. Recency is kept in
+    # an in-memory LRU seeded from file mtimes and written back with utime, so
+    # eviction by total bytes survives restarts.
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or os.environ.get("TTS_CACHE_DIR", os.path.join("data", "audio_cache"))
+        self.max_bytes = int(max_bytes or os.environ.get("TTS_CACHE_MAX_BYTES", str(512*1024*1024)))
+        self.entries = None
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + ".wav")
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.root):
+            for sub in os.scandir(self.root):
+                if not sub.is_dir():
+                    continue
+                for e in os.scandir(sub.path):
+                    if e.name.endswith(".wav"):
+                        st = e.stat()
+                        found.append((st.st_mtime, e.name[:-4], st.st_size))
+        found.sort()
+        self.entries = OrderedDict((k, size) for _, k, size in found)
+        self.bytes = sum(self.entries.values())
+
+    def get(self, key):
+        p = self.path(key)
+        with self.lock:
+            self._load()
+            if key not in self.entries:
+                return None
+            if not os.path.exists(p):
+                self.bytes -= self.entries.pop(key)
+                return None
+            self.entries.move_to_end(key)
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return p
+
+    def put(self, key, src):
+        p = _link_or_copy(src, self.path(key))
+        size = os.path.getsize(p)
+        with self.lock:
+            self._load()
+            self.bytes += size - self.entries.get(key, 0)
+            self.entries[key] = size
+            self.entries.move_to_end(key)
+            self._evict()
+        return p
+
+    def materialize(self, key, dest):
+        p = self.get(key)
+        if not p:
+            return None
+        try:
+            if os.path.samefile(p, dest):
+                return dest
+        except OSError:
+            pass
+        return _link_or_copy(p, dest)
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.bytes -= size
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            self._load()
+            return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
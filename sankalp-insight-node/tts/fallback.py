@@ -1,4 +1,6 @@
 import os
+import threading
+import multiprocessing
 import pyttsx3
 
 def simplify_text(text):
@@ -7,32 +9,143 @@ def simplify_text(text):
         return t[:600]
     return t
 
+class _Engine:
+    # One pyttsx3 engine with its voice list read once. Voice lookups keep the
+    # original substring semantics but are memoized per (voice, lang).
+    def __init__(self):
+        self.eng = pyttsx3.init()
+        self.base_rate = self.eng.getProperty('rate')
+        self.voices = [(v.id or '', (v.id or '').lower(), (v.name or '').lower()) for v in self.eng.getProperty('voices')]
+        self.chosen = {}
+
+    def pick(self, voice, lang):
+        k = (voice, lang)
+        if k in self.chosen:
+            return self.chosen[k]
+        chosen = None
+        if voice and voice != "default":
+            q = voice.lower()
+            for vid, lid, name in self.voices:
+                if q in lid or q in name:
+                    chosen = vid
+                    break
+        if not chosen:
+            for vid, lid, name in self.voices:
+                if lang.startswith('en') and 'english' in name:
+                    chosen = vid
+                    break
+        self.chosen[k] = chosen
+        return chosen
+
+    def run(self, text, voice="default", tone="calm", lang="en", out_path=None):
+        rate = self.base_rate
+        if tone == "urgent":
+            rate = int(rate * 1.2)
+        elif tone == "calm":
+            rate = int(rate * 0.9)
+        self.eng.setProperty('rate', rate)
+        chosen = self.pick(voice, lang or "en")
+        if chosen:
+            self.eng.setProperty('voice', chosen)
+        if out_path:
+            self.eng.save_to_file(text, out_path)
+            self.eng.runAndWait()
+            return out_path
+        self.eng.say(text)
+        self.eng.runAndWait()
+        return None
+
 def synthesize_local(text, voice="default", tone="calm", lang="en", out_path=None):
-    eng = pyttsx3.init()
-    rate = eng.getProperty('rate')
-    if tone == "urgent":
-        eng.setProperty('rate', int(rate * 1.2))
-    elif tone == "calm":
-        eng.setProperty('rate', int(rate * 0.9))
-    voices = eng.getProperty('voices')
-    chosen = None
-    if voice and voice != "default":
-        for v in voices:
-            if voice.lower() in (v.id or '').lower() or voice.lower() in (v.name or '').lower():
-                chosen = v
-                break
-    if not chosen:
-        for v in voices:
-            n = (v.name or '').lower()
-            if lang.startswith('en') and 'english' in n:
-                chosen = v
-                break
-    if chosen:
-        eng.setProperty('voice', chosen.id)
-    if out_path:
-        eng.save_to_file(text, out_path)
-        eng.runAndWait()
-        return out_path
-    eng.say(text)
-    eng.runAndWait()
-    return None
\ No newline at end of file
+    return _Engine().run(text, voice=voice, tone=tone, lang=lang, out_path=out_path)
+
+def _host_main(conn):
+    eng = None
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        try:
+            if eng is None:
+                eng = _Engine()
+            conn.send(("ok", eng.run(*job)))
+        except Exception as e:
+            eng = None
+            conn.send(("error", str(e)))
+
+class LocalTTSHost:
+    # A long-lived child process owning one pyttsx3 engine, fed jobs over a
+    # pipe. Engine start-up and voice enumeration happen once per host; a job
+    # that overruns TTS_LOCAL_TIMEOUT_SECONDS gets the process killed and
+    # restarted on the next call.
+    def __init__(self, timeout=None):
+        self.timeout = float(timeout or os.environ.get("TTS_LOCAL_TIMEOUT_SECONDS", "60"))
+        self.proc = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.restarts = 0
+
+    def _start(self):
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_host_main, args=(child,), daemon=True)
+        self.proc.start()
+        child.close()
+        self.conn = parent
+
+    def _kill(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.join(5)
+        if self.conn is not None:
+            self.conn.close()
+        self.proc = None
+        self.conn = None
+        self.restarts += 1
+
+    def synthesize(self, text, voice="default", tone="calm", lang="en", out_path=None):
+        with self.lock:
+            if self.proc is None or not self.proc.is_alive():
+                if self.proc is not None:
+                    self._kill()
+                self._start()
+            try:
+                self.conn.send((text, voice, tone, lang, out_path))
+                if not self.conn.poll(self.timeout):
+                    self._kill()
+                    return None
+                status, res = self.conn.recv()
+            except (EOFError, OSError):
+                self._kill()
+                return None
+            return res if status == "ok" else None
+
+    def close(self):
+        with self.lock:
+            if self.proc is None:
+                return
+            try:
+                self.conn.send(None)
+                self.proc.join(2)
+            except Exception:
+                pass
+            if self.proc.is_alive():
+                self.proc.kill()
+            self.conn.close()
+            self.proc = None
+            self.conn = None
+
+_HOST = None
+_HOST_LOCK = threading.Lock()
+
+def local_host():
+    global _HOST
+    with _HOST_LOCK:
+        if _HOST is None:
+            _HOST = LocalTTSHost()
+        return _HOST
+
+def synthesize_hosted(text, voice="default", tone="calm", lang="en", out_path=None):
+    return local_host().synthesize(text, voice=voice, tone=tone, lang=lang, out_path=out_path)
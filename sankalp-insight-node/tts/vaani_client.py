@@ -1,48 +1,157 @@
 import os
+import io
+import json
 import base64
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 
-def synthesize(text, voice="default", tone="calm", lang="en", out_path=None):
+CHUNK = 64 * 1024
+B64_KEY = b'"audio_base64"'
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def session():
+    # One pooled session per process so concurrent synthesis reuses
+    # connections instead of a TCP/TLS handshake per request.
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            size = int(os.environ.get("TTS_REMOTE_WORKERS", "8"))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _SESSION = s
+        return _SESSION
+
+def _writer(sink):
+    return sink.write if hasattr(sink, "write") else sink
+
+class Base64Stream:
+    # Decodes a base64 JSON string value fed in arbitrary pieces, holding back
+    # at most one partial quantum (and a split escape) between feeds.
+    def __init__(self, write):
+        self.write = write
+        self.rest = b""
+
+    def feed(self, data):
+        data = self.rest + data
+        hold = b""
+        if data.endswith(b"\\"):
+            data, hold = data[:-1], b"\\"
+        data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+        n = len(data) // 4 * 4
+        if n:
+            self.write(base64.b64decode(data[:n]))
+        self.rest = data[n:] + hold
+
+    def close(self):
+        if self.rest.strip(b"="):
+            self.write(base64.b64decode(self.rest + b"=" * (-len(self.rest) % 4)))
+        self.rest = b""
+
+def _json_audio(r, write, to):
+    # Streams "audio_base64" out of the JSON body as it arrives; any other
+    # response is small and is buffered and parsed as a whole.
+    buf = b""
+    dec = None
+    for chunk in r.iter_content(CHUNK):
+        if dec is None:
+            buf += chunk
+            i = buf.find(B64_KEY)
+            if i < 0:
+                continue
+            j = buf.find(b'"', i + len(B64_KEY))
+            if j < 0:
+                continue
+            if buf[i + len(B64_KEY):j].strip(b" \t\r\n:") != b"":
+                continue
+            dec = Base64Stream(write)
+            chunk = buf[j + 1:]
+            buf = b""
+        k = chunk.find(b'"')
+        if k >= 0:
+            dec.feed(chunk[:k])
+            dec.close()
+            return True
+        dec.feed(chunk)
+    if dec is not None:
+        return False
+    data = json.loads(buf.decode("utf-8"))
+    if not isinstance(data, dict):
+        return False
+    if data.get("audio_base64"):
+        write(base64.b64decode(data.get("audio_base64")))
+        return True
+    if data.get("audio_url"):
+        with session().get(data.get("audio_url"), timeout=to, stream=True) as ar:
+            if ar.status_code >= 400:
+                return False
+            for c in ar.iter_content(CHUNK):
+                write(c)
+        return True
+    return False
+
+def _urls(base):
+    if base.rstrip("/").endswith("/api/v1"):
+        return [base.rstrip("/") + "/tts", base]
+    return [base]
+
+def synthesize_stream(text, sink, voice="default", tone="calm", lang="en"):
+    # Writes audio bytes to `sink` (a callable or file-like) as they arrive.
+    # A later URL is only tried while nothing has been written yet.
     base = os.environ.get("VAANI_TTS_URL")
     key = os.environ.get("VAANI_API_KEY")
     if not base:
-        return None
+        return False
     headers = {"Authorization": f"Bearer {key}"} if key else {}
     payload = {"text": text, "voice": voice, "tone": tone, "lang": lang}
-    urls = [base]
-    if base.rstrip("/").endswith("/api/v1"):
-        urls = [base.rstrip("/") + "/tts", base]
     to = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "20"))
-    for url in urls:
+    out = _writer(sink)
+    written = [0]
+    def write(b):
+        if b:
+            written[0] += len(b)
+            out(b)
+    for url in _urls(base):
         try:
-            r = requests.post(url, json=payload, headers=headers, timeout=to)
-            if r.status_code >= 400:
-                continue
-            ct = r.headers.get("Content-Type", "")
-            if "audio" in ct:
-                if not out_path:
-                    return r.content
-                with open(out_path, "wb") as f:
-                    f.write(r.content)
-                return out_path
-            data = r.json()
-            if isinstance(data, dict):
-                if data.get("audio_base64"):
-                    b = base64.b64decode(data.get("audio_base64"))
-                    if out_path:
-                        with open(out_path, "wb") as f:
-                            f.write(b)
-                        return out_path
-                    return b
-                if data.get("audio_url"):
-                    ar = requests.get(data.get("audio_url"), timeout=to)
-                    if ar.status_code >= 400:
-                        continue
-                    if out_path:
-                        with open(out_path, "wb") as f:
-                            f.write(ar.content)
-                        return out_path
-                    return ar.content
+            with session().post(url, json=payload, headers=headers, timeout=to, stream=True) as r:
+                if r.status_code >= 400:
+                    continue
+                if "audio" in r.headers.get("Content-Type", ""):
+                    for c in r.iter_content(CHUNK):
+                        write(c)
+                    return True
+                if _json_audio(r, write, to):
+                    return True
         except Exception:
-            continue
-    return None
\ No newline at end of file
+            pass
+        if written[0]:
+            return False
+    return False
+
+def synthesize(text, voice="default", tone="calm", lang="en", out_path=None):
+    # Same contract as before: the written path, raw bytes when out_path is
+    # None, or None on failure. Files are streamed to <out_path>.part and
+    # renamed into place, so readers can follow the .part while it grows.
+    if not os.environ.get("VAANI_TTS_URL"):
+        return None
+    if not out_path:
+        buf = io.BytesIO()
+        return buf.getvalue() if synthesize_stream(text, buf, voice, tone, lang) else None
+    part = out_path + ".part"
+    try:
+        with open(part, "wb") as f:
+            ok = synthesize_stream(text, f, voice, tone, lang)
+        if ok:
+            os.replace(part, out_path)
+            return out_path
+    except Exception:
+        pass
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    return None
@@ -1,170 +1,336 @@
 import os
 import sys
 import json
-import urllib.parse
 import logging
-import time
-import hmac
-import hashlib
-import base64
 import jwt
 from logging.handlers import RotatingFileHandler
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.rl_feedback import compute_reward, log_event
-from agents.automator import decide, requeue_item, set_reward, set_skip, set_demote
+from agents.automator import decide, requeue_item, apply_feedback, _find_processed_by_id
+from agents.db import default_db
+from agents.work_queue import default_queue
+from server.aio import AsyncHTTPServer, Request, Response, FileResponse, StreamResponse, serve_workers
+from server.audio import AudioIndex, parse_range, file_etag, follow
+from server.replay import ReplayGuard
+from server.ratelimit import RateLimiter
+from server.feed_cache import FeedCache, etag_matches, accepts_gzip, _epoch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORS_HEADERS = "Content-Type, Authorization, X-Client-Nonce, X-Signature, X-Timestamp"
+
+def _cors():
+    return os.environ.get("API_CORS_ORIGIN", "*")
+
+def send_json(code, obj):
+    data = json.dumps(obj).encode("utf-8")
+    return Response(code, data, "application/json", [
+        ("Access-Control-Allow-Origin", _cors()),
+        ("Access-Control-Allow-Headers", CORS_HEADERS),
+        ("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+    ])
+
+def send_raw(code, data, ctype):
+    return Response(code, data, ctype, [("Access-Control-Allow-Origin", _cors())])
+
+def handle_options(req):
+    return send_json(200, {"ok": True})
+
+def handle_health(req):
+    return send_json(200, {"status": "ok"})
+
+def handle_version(req):
+    v = os.environ.get("API_VERSION", "v0.2")
+    return send_json(200, {"version": v})
+
+FEED = FeedCache(os.path.join(ROOT, "exports", "weekly_report.json"))
+
+def send_cached(req, body):
+    gz = accepts_gzip(req.header("Accept-Encoding"))
+    etag = body.etag_gz if gz else body.etag
+    headers = [
+        ("Access-Control-Allow-Origin", _cors()),
+        ("Access-Control-Allow-Headers", CORS_HEADERS),
+        ("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+        ("ETag", etag),
+        ("Cache-Control", "no-cache"),
+        ("Vary", "Accept-Encoding")
+    ]
+    if etag_matches(req.header("If-None-Match"), etag):
+        return Response(304, b"", None, headers)
+    if gz:
+        return Response(200, body.gz, "application/json", headers + [("Content-Encoding", "gzip")])
+    return Response(200, body.raw, "application/json", headers)
+
+FEED_QUERY_KEYS = ("category", "language", "min_priority", "since", "limit", "cursor")
+
+def _feed_query(req, snap):
+    try:
+        limit = int(req.arg("limit") or os.environ.get("FEED_PAGE_DEFAULT", "50"))
+        limit = max(1, min(limit, int(os.environ.get("FEED_PAGE_MAX", "500"))))
+        cursor = max(0, int(req.arg("cursor") or "0"))
+        mp = req.arg("min_priority")
+        min_priority = float(mp) if mp not in (None, "") else None
+        since = _epoch(req.arg("since"))
+    except (TypeError, ValueError):
+        return send_json(400, {"error": "bad_query"})
+    items, nxt = snap.query(req.arg("category"), req.arg("language"), min_priority, since, limit, cursor)
+    return send_json(200, {"generated_at": snap.data.get("generated_at"), "items": items, "count": len(items), "next_cursor": nxt})
+
+def handle_feed(req):
+    try:
+        snap = FEED.get()
+    except Exception as e:
+        logging.getLogger("errors").error("/feed failure: %s", str(e))
+        return send_json(404, {"error": "not_found"})
+    if any(k in req.query for k in FEED_QUERY_KEYS):
+        return _feed_query(req, snap)
+    return send_cached(req, snap.feed)
+
+def handle_sample(req):
+    try:
+        snap = FEED.get()
+        if snap.sample is None:
+            return send_json(404, {"error": "no_items"})
+        return send_cached(req, snap.sample)
+    except Exception as e:
+        logging.getLogger("errors").error("/processed/sample failure: %s", str(e))
+        return send_json(404, {"error": "not_found"})
+
+def _item_audio_path(item_id):
+    fp, obj = _find_processed_by_id(item_id)
+    return obj.get("audio_path") if obj else None
+
+def _feed_audio_path(item_id):
+    return FEED.get().audio.get(item_id)
+
+AUDIO = AudioIndex(ROOT, [_feed_audio_path, _item_audio_path])
+
+def _growing_audio(full):
+    # Synthesis in progress: follow <path>.part until it is renamed into place.
+    if os.path.exists(full):
+        return None
+    part = full + ".part"
+    try:
+        f = open(part, "rb")
+    except OSError:
+        return None
+    return StreamResponse(200, follow(f, part), "audio/wav", [
+        ("Access-Control-Allow-Origin", _cors()),
+        ("Cache-Control", "no-store")
+    ])
+
+def handle_audio(req):
+    try:
+        item_id = req.arg("id")
+        if not item_id:
+            return send_json(400, {"error": "missing_id"})
+        full = AUDIO.lookup(item_id)
+        if not full:
+            return send_json(404, {"error": "not_found"})
+        res = _growing_audio(full)
+        if res is not None:
+            return res
+        st = os.stat(full)
+        etag = file_etag(st)
+        headers = [
+            ("Access-Control-Allow-Origin", _cors()),
+            ("Accept-Ranges", "bytes"),
+            ("ETag", etag),
+            ("Cache-Control", "public, max-age=" + os.environ.get("AUDIO_MAX_AGE", "3600"))
+        ]
+        if etag_matches(req.header("If-None-Match"), etag):
+            return Response(304, b"", None, headers)
+        rng = req.header("Range")
+        if_range = req.header("If-Range")
+        if if_range and if_range.strip() != etag:
+            rng = None
+        r = parse_range(rng, st.st_size)
+        if r == "invalid":
+            return Response(416, b"", None, headers + [("Content-Range", f"bytes */{st.st_size}")])
+        if r is None:
+            return FileResponse(200, full, 0, st.st_size, "audio/wav", headers)
+        start, end = r
+        return FileResponse(206, full, start, end - start + 1, "audio/wav", headers + [("Content-Range", f"bytes {start}-{end}/{st.st_size}")])
+    except Exception as e:
+        logging.getLogger("errors").error("/audio failure: %s", str(e))
+        return send_json(404, {"error": "not_found"})
+
+def handle_index(req):
+    try:
+        fp = os.path.join(ROOT, "web", "index.html")
+        with open(fp, "rb") as f:
+            data = f.read()
+        return send_raw(200, data, "text/html; charset=utf-8")
+    except Exception:
+        return send_json(404, {"error": "not_found"})
+
+GUARD = ReplayGuard()
+
+def _jwt_decode(token, secret):
+    return jwt.decode(token, secret, algorithms=["HS256"])
+
+def _validate_auth(req, raw):
+    if os.environ.get("API_SECURITY_ENFORCE", "0") != "1":
+        return True
+    auth = req.header("Authorization") or ""
+    nonce = req.header("X-Client-Nonce") or ""
+    sig = req.header("X-Signature") or ""
+    ts = req.header("X-Timestamp")
+    if not auth.startswith("Bearer "):
+        return False
+    token = auth.split(" ", 1)[1]
+    sec = os.environ.get("API_JWT_SECRET", "")
+    ssec = os.environ.get("API_SIGNATURE_SECRET", "")
+    if not GUARD.verify_token(token, sec, _jwt_decode):
+        return False
+    return GUARD.check(ssec, nonce, sig, raw, ts)
+
+def _payload(req):
+    body = req.body if req.body else b"{}"
+    return body, json.loads(body.decode("utf-8"))
+
+def handle_feedback(req):
+    try:
+        body, payload = _payload(req)
+    except Exception:
+        return send_json(400, {"error": "invalid_json"})
+    if not _validate_auth(req, body):
+        return send_json(401, {"error": "unauthorized"})
+    item = payload.get("item", {})
+    item_id = payload.get("id") or item.get("id")
+    signals = payload.get("signals", {})
+    reward = compute_reward(signals)
+    action = decide(item, reward)
+    log_event({"type": "feedback", "id": item_id, "signals": signals, "reward": reward, "action": action})
+    updated = bool(item_id) and apply_feedback(item_id, reward, action)
+    requeued = updated and action in ("requeue", "queue")
+    return send_json(200, {"id": item_id, "reward": reward, "action": action, "requeued": requeued})
+
+def handle_requeue(req):
+    try:
+        body, payload = _payload(req)
+    except Exception:
+        return send_json(400, {"error": "invalid_json"})
+    if not _validate_auth(req, body):
+        return send_json(401, {"error": "unauthorized"})
+    item_id = payload.get("id")
+    ok = bool(item_id) and requeue_item(item_id)
+    log_event({"type": "requeue", "id": item_id, "ok": ok})
+    return send_json(200, {"id": item_id, "requeued": ok})
+
+LIMITER = RateLimiter.from_env(("/feedback", "/requeue"))
+
+def handle_top(req):
+    # Indexed ranking query against the item database.
+    try:
+        limit = max(1, min(int(req.arg("limit") or "10"), int(os.environ.get("FEED_PAGE_MAX", "500"))))
+        mp = req.arg("min_priority")
+        items = default_db().top(req.arg("category"), limit, float(mp) if mp not in (None, "") else 0.0)
+    except (TypeError, ValueError):
+        return send_json(400, {"error": "bad_query"})
+    except Exception as e:
+        logging.getLogger("errors").error("/top failure: %s", str(e))
+        return send_json(503, {"error": "unavailable"})
+    return send_json(200, {"items": items, "count": len(items)})
+
+def handle_metrics(req):
+    try:
+        depth = default_queue().depth()
+    except Exception:
+        depth = None
+    return send_json(200, {"rate_limit": LIMITER.stats(), "feed_loads": FEED.loads, "requeue": depth})
+
+def _client_ip(req):
+    c = req.client
+    return c[0] if isinstance(c, (tuple, list)) and c else str(c or "unknown")
+
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("GET", "/version"): handle_version,
+    ("GET", "/metrics"): handle_metrics,
+    ("GET", "/feed"): handle_feed,
+    ("GET", "/top"): handle_top,
+    ("GET", "/processed/sample"): handle_sample,
+    ("GET", "/audio"): handle_audio,
+    ("GET", "/"): handle_index,
+    ("GET", "/index.html"): handle_index,
+    ("POST", "/feedback"): handle_feedback,
+    ("POST", "/requeue"): handle_requeue
+}
+
+def dispatch(req):
+    if req.method == "OPTIONS":
+        return handle_options(req)
+    method = "GET" if req.method == "HEAD" else req.method
+    fn = ROUTES.get((method, req.path))
+    if fn is None:
+        if req.method == "POST":
+            try:
+                _payload(req)
+            except Exception:
+                return send_json(400, {"error": "invalid_json"})
+        return send_json(404, {"error": "not_found"})
+    ok, wait = LIMITER.allow(req.path, _client_ip(req))
+    if not ok:
+        res = send_json(429, {"error": "rate_limited"})
+        res.headers.append(("Retry-After", str(int(wait) + 1)))
+        return res
+    return fn(req)
 
 class ApiHandler(BaseHTTPRequestHandler):
-    def _send(self, code, obj):
-        data = json.dumps(obj).encode("utf-8")
-        self.send_response(code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(data)))
-        cors = os.environ.get("API_CORS_ORIGIN", "*")
-        self.send_header("Access-Control-Allow-Origin", cors)
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-Client-Nonce, X-Signature")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.end_headers()
-        self.wfile.write(data)
-    def _send_raw(self, code, data, ctype):
-        self.send_response(code)
-        self.send_header("Content-Type", ctype)
-        self.send_header("Content-Length", str(len(data)))
-        cors = os.environ.get("API_CORS_ORIGIN", "*")
-        self.send_header("Access-Control-Allow-Origin", cors)
+    # Thread-per-connection adapter over the same route table; kept for
+    # --threaded mode and as the baseline for scripts/load_test.py.
+    def _serve(self, method):
+        length = int(self.headers.get('Content-Length', '0') or '0')
+        body = self.rfile.read(length) if length > 0 else b""
+        req = Request(method, self.path, self.headers.items(), body, self.client_address)
+        res = dispatch(req)
+        is_file = isinstance(res, FileResponse)
+        self.send_response(res.code)
+        for k, v in res.header_lines():
+            self.send_header(k, v)
+        if isinstance(res, StreamResponse):
+            # HTTP/1.0 handler: no length, the body ends when the socket closes.
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for b in res.chunks:
+                    self.wfile.write(b)
+            finally:
+                res.chunks.close()
+            return
+        if res.code not in (204, 304):
+            self.send_header("Content-Length", str(res.length if is_file else len(res.body)))
         self.end_headers()
-        self.wfile.write(data)
+        if not is_file:
+            self.wfile.write(res.body)
+            return
+        self.wfile.flush()
+        with open(res.path, "rb") as f:
+            offset, left = res.offset, res.length
+            while left > 0:
+                try:
+                    n = os.sendfile(self.connection.fileno(), f.fileno(), offset, left)
+                except (AttributeError, OSError):
+                    f.seek(offset)
+                    n = self.wfile.write(f.read(min(left, 65536))) or 0
+                if n <= 0:
+                    break
+                offset += n
+                left -= n
 
     def do_OPTIONS(self):
-        self._send(200, {"ok": True})
+        self._serve("OPTIONS")
 
     def do_GET(self):
-        if self.path == "/health":
-            return self._send(200, {"status": "ok"})
-        if self.path == "/version":
-            v = os.environ.get("API_VERSION", "v0.2")
-            return self._send(200, {"version": v})
-        if self.path == "/feed":
-            try:
-                p = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exports", "weekly_report.json")
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return self._send(200, data)
-            except Exception as e:
-                logging.getLogger("errors").error("/feed failure: %s", str(e))
-                return self._send(404, {"error": "not_found"})
-        if self.path == "/processed/sample":
-            try:
-                p = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exports", "weekly_report.json")
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                items = data.get("items", [])
-                if not items:
-                    return self._send(404, {"error": "no_items"})
-                it = dict(items[0])
-                it["script"] = it.get("script") or it.get("summary_medium") or it.get("summary_short") or it.get("title")
-                if it.get("rl_reward_score") is None:
-                    it["rl_reward_score"] = it.get("reward_score", 0.0)
-                return self._send(200, it)
-            except Exception as e:
-                logging.getLogger("errors").error("/processed/sample failure: %s", str(e))
-                return self._send(404, {"error": "not_found"})
-        if self.path.startswith("/audio"):
-            try:
-                q = urllib.parse.urlparse(self.path).query
-                qs = urllib.parse.parse_qs(q)
-                item_id = (qs.get("id") or [None])[0]
-                if not item_id:
-                    return self._send(400, {"error": "missing_id"})
-                from agents.automator import _find_processed_by_id
-                fp, obj = _find_processed_by_id(item_id)
-                ap = obj.get("audio_path") if obj else None
-                base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                full = os.path.join(base, ap) if ap else None
-                if not full or not os.path.exists(full):
-                    return self._send(404, {"error": "not_found"})
-                with open(full, "rb") as fd:
-                    data = fd.read()
-                return self._send_raw(200, data, "audio/wav")
-            except Exception as e:
-                logging.getLogger("errors").error("/audio failure: %s", str(e))
-                return self._send(404, {"error": "not_found"})
-        if self.path == "/" or self.path == "/index.html":
-            try:
-                fp = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web", "index.html")
-                with open(fp, "rb") as f:
-                    data = f.read()
-                return self._send_raw(200, data, "text/html; charset=utf-8")
-            except Exception:
-                return self._send(404, {"error": "not_found"})
-        return self._send(404, {"error": "not_found"})
+        self._serve("GET")
 
     def do_POST(self):
-        try:
-            length = int(self.headers.get('Content-Length', '0'))
-            body = self.rfile.read(length) if length > 0 else b"{}"
-            payload = json.loads(body.decode("utf-8"))
-        except Exception:
-            return self._send(400, {"error": "invalid_json"})
-
-        def _validate_auth(raw):
-            if os.environ.get("API_SECURITY_ENFORCE", "0") != "1":
-                return True
-            auth = self.headers.get("Authorization") or ""
-            nonce = self.headers.get("X-Client-Nonce") or ""
-            sig = self.headers.get("X-Signature") or ""
-            if not auth.startswith("Bearer "):
-                return False
-            token = auth.split(" ", 1)[1]
-            sec = os.environ.get("API_JWT_SECRET", "")
-            ssec = os.environ.get("API_SIGNATURE_SECRET", "")
-            try:
-                jwt.decode(token, sec, algorithms=["HS256"])
-            except Exception:
-                return False
-            if not nonce or not ssec:
-                return False
-            h = hmac.new(ssec.encode("utf-8"), (nonce.encode("utf-8") + raw), hashlib.sha256).hexdigest()
-            ok = (h.lower() == sig.strip().lower())
-            if ok:
-                k = f"_nonce_{nonce}"
-                if getattr(ApiHandler, k, None):
-                    return False
-                setattr(ApiHandler, k, time.time())
-            return ok
-
-        if self.path == "/feedback":
-            if not _validate_auth(body):
-                return self._send(401, {"error": "unauthorized"})
-            item = payload.get("item", {})
-            item_id = payload.get("id") or item.get("id")
-            signals = payload.get("signals", {})
-            reward = compute_reward(signals)
-            action = decide(item, reward)
-            log_event({"type": "feedback", "id": item_id, "signals": signals, "reward": reward, "action": action})
-            if item_id:
-                set_reward(item_id, reward)
-            if action == "requeue" and item_id:
-                requeued = requeue_item(item_id)
-            elif action == "queue" and item_id:
-                requeued = requeue_item(item_id)
-            else:
-                requeued = False
-            if action == "skip" and item_id:
-                set_skip(item_id)
-            if action == "escalate" and item_id:
-                set_demote(item_id)
-            return self._send(200, {"id": item_id, "reward": reward, "action": action, "requeued": requeued})
-
-        if self.path == "/requeue":
-            if not _validate_auth(body):
-                return self._send(401, {"error": "unauthorized"})
-            item_id = payload.get("id")
-            ok = bool(item_id) and requeue_item(item_id)
-            log_event({"type": "requeue", "id": item_id, "ok": ok})
-            return self._send(200, {"id": item_id, "requeued": ok})
-
-        return self._send(404, {"error": "not_found"})
+        self._serve("POST")
+
+def make_server(host, port, reuse_port=False):
+    return AsyncHTTPServer(dispatch, host, port, reuse_port=reuse_port)
 
 def main():
     # logging setup
@@ -178,6 +344,8 @@ def main():
 
     host = os.environ.get("API_HOST", "127.0.0.1")
     env_port = int(os.environ.get("API_PORT", "8000"))
+    workers = int(os.environ.get("API_WORKERS", "1"))
+    threaded = os.environ.get("API_THREADED", "0") == "1"
     # CLI override
     port = env_port
     for i, a in enumerate(sys.argv):
@@ -186,12 +354,22 @@ def main():
                 port = int(sys.argv[i+1])
             except Exception:
                 pass
-    server = ThreadingHTTPServer((host, port), ApiHandler)
+        if a == "--workers" and i+1 < len(sys.argv):
+            try:
+                workers = int(sys.argv[i+1])
+            except Exception:
+                pass
+        if a == "--threaded":
+            threaded = True
     print(f"API server running at http://{host}:{port}/")
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        pass
+    if threaded:
+        server = ThreadingHTTPServer((host, port), ApiHandler)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+    serve_workers(lambda reuse: make_server(host, port, reuse), workers)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,130 +1,27 @@
 import os
 import sys
 import json
-import glob
-import datetime as dt
-from dateutil import parser as dparser
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from ingest.cleaner import clean_text, detect_language
-from agents.summarizer import summarize_short, summarize_medium
-from agents.sentiment import analyze
-
-def ensure_dir(p):
-    os.makedirs(p, exist_ok=True)
+import argparse
+from pipeline.stages import day_dir, load_raw, process
+from pipeline.incremental import process_changes
 
 def today_dir(base):
-    d = dt.datetime.utcnow().strftime("%Y%m%d")
-    p = os.path.join(base, d)
-    ensure_dir(p)
-    return p
-
-def pick_category(title):
-    t = (title or "").lower()
-    if any(x in t for x in ["ai","tech","technology","software","gadgets"]):
-        return "technology"
-    if any(x in t for x in ["market","stock","economy","business","finance"]):
-        return "business"
-    if any(x in t for x in ["match","league","tournament","goal","sports"]):
-        return "sports"
-    if any(x in t for x in ["election","government","policy","politics"]):
-        return "politics"
-    return "general"
-
-def parse_time(s):
-    try:
-        return dparser.parse(s).isoformat()
-    except Exception:
-        return dt.datetime.utcnow().isoformat()
-
-def process_item(it):
-    title = clean_text(it.get("title"))
-    summary_src = clean_text(it.get("summary"))
-    text = (title or "") + ". " + (summary_src or "")
-    lang = detect_language(text)
-    s_short = summarize_short(text)
-    s_med = summarize_medium(text)
-    pol, conf, tone = analyze(text)
-    cat = pick_category(title)
-    ts = parse_time(it.get("published"))
-    out = {
-        "id": it.get("id") or it.get("link") or os.urandom(8).hex(),
-        "title": title,
-        "summary_short": s_short,
-        "summary_medium": s_med,
-        "script": s_med,
-        "category": cat,
-        "language": lang,
-        "polarity": pol,
-        "confidence": conf,
-        "confidence_score": conf,
-        "reward_score": 0.0,
-        "rl_reward_score": 0.0,
-        "tone": tone,
-        "timestamp": ts
-    }
-    return out
-
-def validate(obj):
-    cats = {"general","technology","business","sports","politics"}
-    pols = {"positive","neutral","negative"}
-    tones = {"calm","urgent","joyful"}
-    def ok_str(x, n=1):
-        return isinstance(x, str) and len(x.strip()) >= n
-    if not ok_str(obj.get("id"), 1):
-        return False
-    if not ok_str(obj.get("title"), 3):
-        return False
-    if not ok_str(obj.get("summary_short"), 5):
-        return False
-    if not ok_str(obj.get("summary_medium"), 5):
-        return False
-    if obj.get("category") not in cats:
-        return False
-    if not ok_str(obj.get("language"), 2):
-        return False
-    if obj.get("polarity") not in pols:
-        return False
-    try:
-        c = float(obj.get("confidence" if obj.get("confidence") is not None else obj.get("confidence_score", 0.5)))
-        if not (0.0 <= c <= 1.0):
-            return False
-    except Exception:
-        return False
-    if obj.get("tone") not in tones:
-        return False
-    try:
-        _ = dparser.parse(obj.get("timestamp"))
-    except Exception:
-        return False
-    return True
+    return day_dir(base)
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="reprocess every raw item instead of only new or changed ones")
+    ap.add_argument("--max-items", type=int, default=10, help="items processed per run, 0 for no cap")
+    args = ap.parse_args()
     raw_dir = today_dir(os.path.join("data","raw"))
     out_dir = today_dir(os.path.join("data","processed"))
-    files = sorted(glob.glob(os.path.join(raw_dir, "*.json")))
-    items = []
-    for f in files:
-        try:
-            with open(f, "r", encoding="utf-8") as fd:
-                data = json.load(fd)
-        except Exception:
-            continue
-        for x in (data.get("items", []) or []):
-            items.append(x)
-    count = 0
-    for i, it in enumerate(items):
-        obj = process_item(it)
-        if validate(obj):
-            path = os.path.join(out_dir, f"item_{i+1}.json")
-            try:
-                with open(path, "w", encoding="utf-8") as fo:
-                    json.dump(obj, fo, ensure_ascii=False, indent=2)
-                count += 1
-            except Exception:
-                continue
-        if count >= 10:
-            break
-    print(json.dumps({"processed": count, "output_dir": out_dir}))
+    if args.full:
+        records = process(load_raw(raw_dir), out_dir=out_dir, max_items=args.max_items)
+        print(json.dumps({"processed": len(records), "output_dir": out_dir}))
+        return
+    res = process_changes(load_raw(raw_dir), out_dir, max_items=args.max_items)
+    print(json.dumps({"processed": len(res["records"]), "added": len(res["added"]), "changed": len(res["changed"]), "unchanged": res["unchanged"], "output_dir": out_dir}))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,88 +1,39 @@
 import os
 import sys
-import glob
 import json
-import datetime as dt
-import wave
 import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tts.vaani_client import synthesize as vaani_synth
-from tts.fallback import simplify_text, synthesize_local
-
-def ensure_dir(p):
-    os.makedirs(p, exist_ok=True)
+from pipeline.incremental import ChangeLog, changed_records
+from pipeline.stages import day_dir, load_processed, synthesize, parse_avatars
 
 def today_dir(base, sub=None, date_override=None):
-    d = date_override or dt.datetime.utcnow().strftime("%Y%m%d")
-    p = os.path.join(base, d)
-    if sub:
-        p = os.path.join(p, sub)
-    ensure_dir(p)
-    return p
-
-def audio_duration(path):
-    try:
-        with wave.open(path, 'rb') as w:
-            frames = w.getnframes()
-            rate = w.getframerate()
-            return round(frames / float(rate), 2)
-    except Exception:
-        return None
-
-def normalize_path(p):
-    if not p:
-        return p
-    return str(p).replace("\\", "/")
-
-def synthesize_text(text, voice, tone, lang, out_path):
-    ok = False
-    status = "failed"
-    res = vaani_synth(text, voice=voice, tone=tone, lang=lang, out_path=out_path)
-    if isinstance(res, str) and os.path.exists(res):
-        ok = True
-        status = "success"
-    else:
-        simp = simplify_text(text)
-        res2 = synthesize_local(simp, voice=voice, tone=tone, lang=lang, out_path=out_path)
-        if isinstance(res2, str) and os.path.exists(res2):
-            ok = True
-            status = "fallback"
-    return ok, status
+    return day_dir(base, sub, date_override)
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--voice", default="default")
     ap.add_argument("--avatar", default="default")
+    ap.add_argument("--avatars", default=None, help="comma-separated avatars synthesized in one run")
     ap.add_argument("--limit", type=int, default=10)
     ap.add_argument("--date", default=None, help="YYYYMMDD processed/audio date override")
+    ap.add_argument("--workers", type=int, default=None, help="concurrent remote synthesis requests")
+    ap.add_argument("--all", action="store_true", help="synthesize the first --limit items instead of only those changed since the last run")
     args = ap.parse_args()
 
+    avatars = parse_avatars(args.avatars or args.avatar)
     proc_dir = today_dir(os.path.join("data","processed"), date_override=args.date)
-    audio_dir = today_dir(os.path.join("data","audio"), args.avatar, date_override=args.date)
-    files = sorted(glob.glob(os.path.join(proc_dir, "item_*.json")))
-    count = 0
-    for f in files:
-        with open(f, "r", encoding="utf-8") as fd:
-            obj = json.load(fd)
-        text = obj.get("summary_medium") or obj.get("summary_short") or obj.get("title")
-        voice = args.voice
-        tone = obj.get("tone") or "calm"
-        lang = obj.get("language") or "en"
-        base = os.path.splitext(os.path.basename(f))[0]
-        out_path = os.path.join(audio_dir, f"{base}_{args.avatar}.wav")
-        ok, status = synthesize_text(text, voice, tone, lang, out_path)
-        dur = audio_duration(out_path) if ok else None
-        obj["audio_path"] = normalize_path(out_path) if ok else None
-        obj["audio_duration"] = dur
-        obj["voice_used"] = voice
-        obj["synthesis_status"] = status
-        obj["avatar"] = args.avatar
-        with open(f, "w", encoding="utf-8") as fo:
-            json.dump(obj, fo, ensure_ascii=False, indent=2)
-        count += 1
-        if count >= args.limit:
-            break
-    print(json.dumps({"audio_generated": count, "audio_dir": audio_dir}))
+    records, offset = (None, 0) if args.all else changed_records(proc_dir, "audio", ignore=("audio", "feedback", "requeue"))
+    if records is None:
+        _, summary = synthesize(load_processed(proc_dir), avatars, voice=args.voice, limit=args.limit, date=args.date, workers=args.workers)
+        print(json.dumps(summary))
+        return
+    # Deltas are already capped by format_metadata --max-items; all of them
+    # are synthesized so the cursor can move past them.
+    out, summary = synthesize(records, avatars, voice=args.voice, limit=len(records), date=args.date, workers=args.workers) if records else ([], {"audio_generated": 0, "avatars": avatars})
+    # synthesize() journals its own writes as "audio"; only the cursor moves here.
+    ChangeLog(proc_dir).ack("audio", offset)
+    summary["changed"] = len(records)
+    print(json.dumps(summary))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import argparse
+import threading
+import http.client
+import urllib.parse
+
+def worker(host, port, path, keepalive, deadline, out):
+    conn = None
+    lat = []
+    errors = 0
+    while time.time() < deadline:
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(host, port, timeout=10)
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers={} if keepalive else {"Connection": "close"})
+            r = conn.getresponse()
+            r.read()
+            lat.append(time.perf_counter() - t0)
+            if r.status >= 500:
+                errors += 1
+            if not keepalive or r.getheader("Connection", "").lower() == "close" or r.version == 10:
+                conn.close()
+                conn = None
+        except Exception:
+            errors += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            conn = None
+    if conn is not None:
+        conn.close()
+    out.append((lat, errors))
+
+def pct(vals, p):
+    if not vals:
+        return None
+    vals = sorted(vals)
+    return round(vals[min(len(vals)-1, int(len(vals)*p))]*1000.0, 2)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=f"http://{os.environ.get('API_HOST', '127.0.0.1')}:{os.environ.get('API_PORT', '8000')}/health")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--no-keepalive", action="store_true")
+    args = ap.parse_args()
+    u = urllib.parse.urlsplit(args.url)
+    path = (u.path or "/") + (("?" + u.query) if u.query else "")
+    out = []
+    deadline = time.time() + args.seconds
+    threads = [threading.Thread(target=worker, args=(u.hostname, u.port or 80, path, not args.no_keepalive, deadline, out)) for _ in range(args.concurrency)]
+    t0 = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - t0
+    lat = [x for l, _ in out for x in l]
+    errors = sum(e for _, e in out)
+    print(json.dumps({
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "keepalive": not args.no_keepalive,
+        "requests": len(lat),
+        "errors": errors,
+        "rps": round(len(lat)/elapsed, 1),
+        "p50_ms": pct(lat, 0.5),
+        "p99_ms": pct(lat, 0.99)
+    }))
+
+if __name__ == "__main__":
+    main()
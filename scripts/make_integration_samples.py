@@ -1,16 +1,17 @@
 import os
 import sys
 import json
+import itertools
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from pipeline.stream import stream_json
+
 def main():
     path = os.path.join("exports","weekly_report.json")
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        items = list(itertools.islice(stream_json(path), 9))
     except Exception:
-        data = {"items": []}
-    items = data.get("items", [])[:9]
+        items = []
     out = []
     def normalize_path(p):
         if not p:
@@ -0,0 +1,24 @@
+import os
+import sys
+import glob
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.column_store import migrate
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--date", default=None, help="YYYYMMDD day to convert; every day when omitted")
+    ap.add_argument("--base", default=os.path.join("data", "processed"))
+    args = ap.parse_args()
+    days = [os.path.join(args.base, args.date)] if args.date else sorted(d for d in glob.glob(os.path.join(args.base, "*")) if os.path.isdir(d))
+    out = {}
+    for d in days:
+        try:
+            out[os.path.basename(d)] = migrate(d)
+        except Exception as e:
+            out[os.path.basename(d)] = f"error: {e}"
+    print(json.dumps({"migrated": out}))
+
+if __name__ == "__main__":
+    main()
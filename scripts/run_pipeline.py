@@ -1,20 +1,27 @@
 import os
 import sys
-import subprocess
 import json
-
-def run(cmd, cwd=None):
-    p = subprocess.Popen(cmd, cwd=cwd or os.getcwd(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
-    out, _ = p.communicate()
-    return p.returncode, out.decode('utf-8', errors='ignore')
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.engine import run_pipeline
+from pipeline.schedule import RunLock, default_lock_path
 
 def main():
-    rc, out = run("python scripts/run_ingest.py")
-    rc, out = run("python scripts/format_metadata.py")
-    for avatar in ["asha", "kiran", "dev"]:
-        rc, out = run(f"python scripts/generate_audio.py --avatar {avatar} --voice default --limit 10")
-    rc, out = run("python scripts/smart_feed.py")
-    print(json.dumps({"status": "ok"}))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--avatars", default="asha,kiran,dev")
+    ap.add_argument("--no-checkpoint", action="store_true", help="keep intermediate items in memory only")
+    ap.add_argument("--stream", action="store_true", default=os.environ.get("PIPELINE_STREAM", "0") == "1", help="run stages as bounded generators; the export keeps the top-k per category")
+    ap.add_argument("--top-k", type=int, default=10)
+    args = ap.parse_args()
+    avatars = [a.strip() for a in args.avatars.split(",") if a.strip()]
+    kw = {"streaming": True, "k": args.top_k} if args.stream else {}
+    # Same lock as the scheduler, so a cron run never overlaps loop stages.
+    with RunLock(default_lock_path()) as locked:
+        if not locked:
+            print(json.dumps({"status": "locked", "stages": {}}))
+            sys.exit(1)
+        report = run_pipeline(checkpoint=False if args.no_checkpoint else None, avatars=avatars, **kw)
+    print(json.dumps({"status": report["status"], "stages": report["stages"]}))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
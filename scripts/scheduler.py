@@ -1,14 +1,16 @@
 import os
 import sys
 import json
-import time
-import subprocess
-import datetime as dt
 import logging
 from logging.handlers import RotatingFileHandler
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PY = sys.executable
+sys.path.append(ROOT)
+from pipeline.engine import Pipeline
+from pipeline import stages
+from pipeline.incremental import process_changes
+from agents.ranker import rank_export
+from pipeline.schedule import Scheduler, Stage, RunLock, parse_every, dir_signature, default_lock_path
 
 def _init_logging():
     app_path = os.path.join(ROOT, "logs", "scheduler.log")
@@ -24,55 +26,91 @@ def _init_logging():
 def log(msg):
     logging.getLogger().info(msg)
 
-def run(cmd):
-    try:
-        log(f"RUN {cmd}")
-        r = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
-        msg = f"EXIT {r.returncode} STDOUT={r.stdout.strip()} STDERR={r.stderr.strip()}"
-        if r.returncode != 0:
-            logging.getLogger("errors").error(msg)
-        else:
-            log(msg)
-        return r.returncode == 0
-    except Exception as e:
-        logging.getLogger("errors").error(f"ERROR {cmd} {e}")
-        return False
-
 def pipeline(avatars):
-    ok = True
-    ok &= run([PY, os.path.join(ROOT, "scripts", "run_ingest.py")])
-    ok &= run([PY, os.path.join(ROOT, "scripts", "format_metadata.py")])
-    for a in avatars:
-        ok &= run([PY, os.path.join(ROOT, "scripts", "generate_audio.py"), "--avatar", a, "--voice", "default", "--limit", "10"])
-    ok &= run([PY, os.path.join(ROOT, "scripts", "smart_feed.py")])
-    return ok
+    # In-process run; stage timings are logged by Pipeline.stage. Holds the
+    # scheduler's run lock so a cron/once run never overlaps loop stages.
+    with RunLock(default_lock_path()) as locked:
+        if not locked:
+            log("OVERLAP pipeline another run holds the lock")
+            return False
+        p = Pipeline()
+        try:
+            p.run(avatars=avatars)
+            return True
+        except Exception as e:
+            logging.getLogger("errors").error(f"ERROR pipeline {e} stages={json.dumps(p.timings)}")
+            return False
+
+def _processed_pattern():
+    return os.path.join(stages.day_dir(os.path.join("data", "processed")), "item_*.json")
+
+def ingest_stage():
+    raw = stages.ingest()
+    res = process_changes(raw, stages.day_dir(os.path.join("data", "processed")), max_items=int(os.environ.get("SCHED_MAX_ITEMS", "10")))
+    log(f"INGEST raw={len(raw)} added={len(res['added'])} changed={len(res['changed'])} unchanged={res['unchanged']}")
+    return True
+
+def audio_stage(avatars, limit):
+    # Only items still missing audio for some avatar are synthesized.
+    records = stages.load_processed(stages.day_dir(os.path.join("data", "processed")))
+    todo = [(p, o) for p, o in records if any(not (o.get("audio_paths") or {}).get(a) for a in avatars)]
+    if not todo:
+        return True
+    _, summary = stages.synthesize(todo, avatars, limit=limit)
+    log(f"AUDIO {json.dumps(summary)}")
+    return True
+
+def rank_stage():
+    records = stages.load_processed(stages.day_dir(os.path.join("data", "processed")))
+    feed = rank_export([o for _, o in records])
+    log(f"RANK {json.dumps(feed)}")
+    return True
+
+def requeue_stage(avatars):
+    from pipeline.requeue import drain
+    res = drain(avatars=avatars or None)
+    log(f"REQUEUE {json.dumps(res)}")
+    return True
 
-def interval_seconds(name):
-    if name == "hourly":
-        return 3600
-    if name == "4h":
-        return 4*3600
-    if name == "daily":
-        return 24*3600
-    return 3600
+def _queue_signature():
+    from agents.work_queue import default_queue
+    return default_queue().signature()
+
+def _ingest_every():
+    return os.environ.get("SCHED_INGEST_EVERY") or os.environ.get("SCHED_INTERVAL") or "hourly"
+
+def build_scheduler(avatars):
+    return Scheduler([
+        Stage("ingest", ingest_stage, parse_every(_ingest_every())),
+        Stage("audio", lambda: audio_stage(avatars, int(os.environ.get("SCHED_AUDIO_LIMIT", "10"))), parse_every(os.environ.get("SCHED_AUDIO_EVERY", "demand")), inputs=lambda: dir_signature(_processed_pattern())),
+        Stage("requeue", lambda: requeue_stage(avatars), parse_every(os.environ.get("SCHED_REQUEUE_EVERY", "demand")), inputs=_queue_signature),
+        Stage("rank", rank_stage, parse_every(os.environ.get("SCHED_RANK_EVERY", "30m")), inputs=lambda: dir_signature(_processed_pattern())),
+    ])
 
 def main():
     _init_logging()
+    os.chdir(ROOT)
     mode = os.environ.get("SCHED_MODE", "once")
-    interval = os.environ.get("SCHED_INTERVAL", "hourly")
+    interval = _ingest_every()
     avatars = (os.environ.get("SCHED_AVATARS", "vaani").split(","))
     avatars = [x.strip() for x in avatars if x.strip()]
     log(f"START mode={mode} interval={interval} avatars={avatars}")
     if mode == "once":
-        pipeline(avatars)
-        log("DONE once")
-        print(json.dumps({"ok": True, "mode": mode, "interval": interval}))
-        return
-    sec = interval_seconds(interval)
-    while True:
         ok = pipeline(avatars)
-        log(f"DONE cycle ok={ok}")
-        time.sleep(sec)
+        log(f"DONE once ok={ok}")
+        print(json.dumps({"ok": ok, "mode": mode, "interval": interval}))
+        return
+    if mode == "trigger":
+        # Asks a running loop to run the named stages (default: audio) on its next poll.
+        sched = build_scheduler(avatars)
+        names = [x for x in sys.argv[1:] if x] or ["audio"]
+        for n in names:
+            sched.trigger(n)
+        print(json.dumps({"ok": True, "mode": mode, "triggered": names}))
+        return
+    sched = build_scheduler(avatars)
+    log(f"SCHEDULE {json.dumps({s.name: s.every for s in sched.stages})}")
+    sched.loop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
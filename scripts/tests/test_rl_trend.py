@@ -3,8 +3,8 @@ import sys
 import json
 import datetime as dt
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from agents.rl_feedback import compute_reward
-from agents.trend import compute as trend_compute
+from agents.rl_feedback import compute_reward, EventLog
+from agents.trend import compute as trend_compute, TrendEngine
 
 def make_items(n=5):
     now = dt.datetime.utcnow()
@@ -35,6 +35,43 @@ def test_trend_basic():
     s = scores["general"]
     assert 0.0 <= s <= 1.0
 
+def test_trend_engine_incremental(tmp_path):
+    ref = dt.datetime(2025, 11, 21, 12, 0, 0)
+    items = []
+    for k, n in enumerate([3, 1, 2]):
+        for j in range(n):
+            items.append({"id": f"e{k}_{j}", "category": "general", "timestamp": (ref - dt.timedelta(minutes=120*k)).isoformat()})
+    eng = TrendEngine(minutes=120, window=6, alpha=0.6)
+    assert eng.extend(reversed(items)) == len(items)
+    assert eng.add(items[0]) is False
+    assert eng.bins("general")[:3] == [3, 1, 2]
+    assert abs(eng.score("general") - trend_compute(items)["general"]) < 1e-9
+    path = str(tmp_path / "state.json")
+    eng.save(path)
+    again = TrendEngine.load(path, minutes=120, window=6, alpha=0.6)
+    assert abs(again.score("general") - eng.score("general")) < 1e-9
+    assert again.add(items[1]) is False
+
+def test_event_log_batches_rotates_and_tracks_rewards(tmp_path):
+    path = str(tmp_path / "rl_events.log")
+    log = EventLog(path=path, batch=8, flush_seconds=0.05, max_bytes=400, backups=2, window=4)
+    for i in range(10):
+        assert log.put({"type": "feedback", "id": f"t{i}", "reward": i/10.0})
+    assert log.flush()
+    st = log.stats()
+    assert st["count"] == 4 and abs(st["mean"] - 0.75) < 1e-9
+    assert st["written"] == 10 and st["dropped"] == 0
+    log.close()
+    lines = []
+    for p in [path + ".2", path + ".1", path]:
+        if os.path.exists(p):
+            with open(p, "r", encoding="utf-8") as f:
+                lines += [json.loads(x) for x in f if x.strip()]
+    assert os.path.exists(path + ".1")
+    assert [x["id"] for x in lines][-3:] == ["t7", "t8", "t9"]
+    again = EventLog(path=path, window=4)
+    assert again.stats()["count"] >= 1
+
 if __name__ == "__main__":
     test_rl_numeric()
     test_trend_basic()
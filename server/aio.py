@@ -0,0 +1,321 @@
+import os
+import time
+import signal
+import socket
+import asyncio
+import logging
+import urllib.parse
+from http import HTTPStatus
+from email.utils import formatdate
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_HEADER_LINES = 100
+
+class Request:
+    def __init__(self, method, target, headers, body=b"", client=None):
+        u = urllib.parse.urlsplit(target)
+        self.method = method
+        self.target = target
+        self.path = u.path or "/"
+        self.query = urllib.parse.parse_qs(u.query)
+        self.headers = {k.lower(): v for k, v in headers}
+        self.body = body
+        self.client = client
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def arg(self, name, default=None):
+        v = self.query.get(name)
+        return v[0] if v else default
+
+class Response:
+    def __init__(self, code, body=b"", ctype="application/json", headers=None):
+        self.code = code
+        self.body = body
+        self.ctype = ctype
+        self.headers = list(headers or [])
+
+    def header_lines(self):
+        out = []
+        if self.ctype:
+            out.append(("Content-Type", self.ctype))
+        out.extend(self.headers)
+        return out
+
+class FileResponse(Response):
+    # Body is `length` bytes of `path` from `offset`, sent with sendfile.
+    def __init__(self, code, path, offset, length, ctype, headers=None):
+        Response.__init__(self, code, b"", ctype, headers)
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+class StreamResponse(Response):
+    # Body of unknown length pulled from a blocking iterator of byte chunks
+    # on the stream pool; sent chunked to HTTP/1.1 clients and delimited by
+    # closing the connection for HTTP/1.0 ones.
+    def __init__(self, code, chunks, ctype, headers=None):
+        Response.__init__(self, code, b"", ctype, headers)
+        self.chunks = chunks
+
+def _close(it):
+    try:
+        it.close()
+    except Exception:
+        pass
+
+def _reason(code):
+    try:
+        return HTTPStatus(code).phrase
+    except ValueError:
+        return ""
+
+class AsyncHTTPServer:
+    # Minimal HTTP/1.1 front end: persistent connections, a semaphore capping
+    # in-flight requests, blocking handlers run on a bounded thread pool,
+    # streamed bodies on a separate pool of API_MAX_STREAMS threads so slow
+    # readers never hold handler threads, and drain-then-close shutdown on
+    # SIGINT/SIGTERM.
+    def __init__(self, handler, host="127.0.0.1", port=8000, max_concurrency=None, keepalive_seconds=None, max_body=None, reuse_port=False, grace_seconds=None):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.max_concurrency = int(max_concurrency or os.environ.get("API_MAX_CONCURRENCY", "64"))
+        self.max_streams = int(os.environ.get("API_MAX_STREAMS", "16"))
+        self.keepalive_seconds = float(keepalive_seconds or os.environ.get("API_KEEPALIVE_SECONDS", "15"))
+        self.max_body = int(max_body or os.environ.get("API_MAX_BODY", str(1024*1024)))
+        self.grace_seconds = float(grace_seconds or os.environ.get("API_GRACE_SECONDS", "10"))
+        self.reuse_port = reuse_port
+        self.server = None
+        self.sem = None
+        self.pool = None
+        self.stream_pool = None
+        self.conns = set()
+        self.active = 0
+        self.stopping = None
+        self.ready = None
+        self.done = None
+
+    async def _read_head(self, reader):
+        line = await asyncio.wait_for(reader.readline(), self.keepalive_seconds)
+        if not line:
+            return None
+        while line in (b"\r\n", b"\n"):
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_seconds)
+            if not line:
+                return None
+        parts = line.decode("latin-1").rstrip("\r\n").split()
+        if len(parts) != 3:
+            raise ValueError("bad request line")
+        headers = []
+        for _ in range(MAX_HEADER_LINES):
+            h = await asyncio.wait_for(reader.readline(), self.keepalive_seconds)
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers.append((k.strip(), v.strip()))
+        else:
+            raise ValueError("too many headers")
+        return parts[0].upper(), parts[1], parts[2].upper(), headers
+
+    def _keep_alive(self, version, headers):
+        conn = ""
+        for k, v in headers:
+            if k.lower() == "connection":
+                conn = v.lower()
+        if version == "HTTP/1.1":
+            return "close" not in conn
+        return "keep-alive" in conn
+
+    async def _write(self, writer, res, keep, head_only=False, chunked=True):
+        # `chunked` False (HTTP/1.0) sends a stream raw; the caller must not
+        # keep the connection, since closing it ends the body.
+        body = res.body or b""
+        is_file = isinstance(res, FileResponse)
+        is_stream = isinstance(res, StreamResponse)
+        lines = [f"HTTP/1.1 {res.code} {_reason(res.code)}"]
+        for k, v in res.header_lines():
+            lines.append(f"{k}: {v}")
+        if is_stream:
+            if chunked:
+                lines.append("Transfer-Encoding: chunked")
+        elif res.code not in (204, 304):
+            lines.append(f"Content-Length: {res.length if is_file else len(body)}")
+        lines.append(f"Date: {formatdate(usegmt=True)}")
+        lines.append("Connection: keep-alive" if keep else "Connection: close")
+        if keep:
+            lines.append(f"Keep-Alive: timeout={int(self.keepalive_seconds)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if body and not head_only:
+            writer.write(body)
+        await writer.drain()
+        if is_file and res.length and not head_only:
+            with open(res.path, "rb") as f:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, res.offset, res.length)
+        if is_stream:
+            try:
+                if not head_only:
+                    await self._write_chunks(writer, res.chunks, chunked)
+            finally:
+                _close(res.chunks)
+
+    async def _write_chunks(self, writer, chunks, chunked=True):
+        loop = asyncio.get_running_loop()
+        it = iter(chunks)
+        while True:
+            b = await loop.run_in_executor(self.stream_pool, next, it, None)
+            if b is None:
+                break
+            if b:
+                writer.write(b"%x\r\n" % len(b) + b + b"\r\n" if chunked else b)
+                await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def _handle(self, req):
+        loop = asyncio.get_running_loop()
+        async with self.sem:
+            if asyncio.iscoroutinefunction(self.handler):
+                return await self.handler(req)
+            return await loop.run_in_executor(self.pool, self.handler, req)
+
+    async def _client(self, reader, writer):
+        task = asyncio.current_task()
+        self.conns.add(task)
+        peer = writer.get_extra_info("peername")
+        try:
+            while not self.stopping.is_set():
+                try:
+                    head = await self._read_head(reader)
+                except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except ValueError:
+                    await self._write(writer, Response(400, b'{"error": "bad_request"}'), False)
+                    break
+                if head is None:
+                    break
+                method, target, version, headers = head
+                keep = self._keep_alive(version, headers) and not self.stopping.is_set()
+                hmap = {k.lower(): v for k, v in headers}
+                if "chunked" in hmap.get("transfer-encoding", "").lower():
+                    await self._write(writer, Response(411, b'{"error": "length_required"}'), False)
+                    break
+                try:
+                    length = int(hmap.get("content-length", "0") or "0")
+                except ValueError:
+                    length = -1
+                if length < 0 or length > self.max_body:
+                    await self._write(writer, Response(413, b'{"error": "payload_too_large"}'), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                req = Request(method, target, headers, body, peer)
+                self.active += 1
+                try:
+                    try:
+                        res = await self._handle(req)
+                    except Exception as e:
+                        logging.getLogger("errors").error("handler failure %s %s: %s", method, target, str(e))
+                        res = Response(500, b'{"error": "internal"}')
+                    chunked = version == "HTTP/1.1"
+                    if isinstance(res, StreamResponse) and not chunked:
+                        keep = False
+                    await self._write(writer, res, keep, method == "HEAD", chunked)
+                finally:
+                    self.active -= 1
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.conns.discard(task)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def start(self):
+        self.stopping = asyncio.Event()
+        self.sem = asyncio.Semaphore(self.max_concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="api")
+        self.stream_pool = ThreadPoolExecutor(max_workers=self.max_streams, thread_name_prefix="api-stream")
+        kw = {"reuse_address": True, "backlog": int(os.environ.get("API_BACKLOG", "512"))}
+        if self.reuse_port:
+            kw["reuse_port"] = True
+        self.server = await asyncio.start_server(self._client, self.host, self.port, **kw)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def shutdown(self):
+        # Stop accepting, let in-flight requests finish within the grace
+        # period, then drop idle keep-alive connections.
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        self.server.close()
+        end = time.monotonic() + self.grace_seconds
+        while self.active and time.monotonic() < end:
+            await asyncio.sleep(0.05)
+        for t in list(self.conns):
+            t.cancel()
+        await asyncio.gather(*list(self.conns), return_exceptions=True)
+        await self.server.wait_closed()
+        self.pool.shutdown(wait=False)
+        self.stream_pool.shutdown(wait=False)
+
+    async def serve(self, install_signals=True):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        if install_signals:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, done.set)
+                except (NotImplementedError, RuntimeError, ValueError):
+                    pass
+        self.done = done
+        if self.ready:
+            self.ready.set()
+        try:
+            await done.wait()
+        finally:
+            await self.shutdown()
+
+    def stop(self, loop):
+        loop.call_soon_threadsafe(self.done.set)
+
+def serve_workers(factory, workers):
+    # Pre-fork `workers` processes that each bind the same port with
+    # SO_REUSEPORT and let the kernel balance accepts. Falls back to a single
+    # process where fork or SO_REUSEPORT is unavailable.
+    if workers <= 1 or not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+        asyncio.run(factory(False).serve())
+        return
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                asyncio.run(factory(True).serve())
+            except Exception:
+                code = 1
+            finally:
+                os._exit(code)
+        pids.append(pid)
+    def forward(sig, frame):
+        for p in pids:
+            try:
+                os.kill(p, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for p in pids:
+        try:
+            os.waitpid(p, 0)
+        except ChildProcessError:
+            pass
@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+def parse_range(header, size):
+    # Single byte-range per RFC 7233. Returns (start, end) inclusive, None for
+    # "serve the whole file" (absent, malformed or multi-range), or "invalid"
+    # when the range cannot be satisfied.
+    if not header or not header.strip().lower().startswith("bytes="):
+        return None
+    spec = header.strip()[6:]
+    if "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                return "invalid"
+            return (max(0, size - n), size - 1) if size else "invalid"
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start < 0 or end < start:
+        return "invalid"
+    return (start, min(end, size - 1))
+
+def follow(f, path, idle_seconds=None, chunk=65536):
+    # Yields a file that is still being written to `path` (a ".part"). Once the
+    # writer renames or removes it, whatever is left on the open handle is
+    # drained and the stream ends; a writer that stalls for idle_seconds ends
+    # it too.
+    idle = float(idle_seconds or os.environ.get("AUDIO_FOLLOW_IDLE_SECONDS", "30"))
+    last = time.monotonic()
+    try:
+        while True:
+            b = f.read(chunk)
+            if b:
+                last = time.monotonic()
+                yield b
+                continue
+            if not os.path.exists(path):
+                while True:
+                    b = f.read(chunk)
+                    if not b:
+                        return
+                    yield b
+            if time.monotonic() - last > idle:
+                return
+            time.sleep(0.05)
+    finally:
+        f.close()
+
+def file_etag(st):
+    return '"%x-%x"' % (st.st_size, st.st_mtime_ns)
+
+class AudioIndex:
+    # id -> absolute audio path, resolved from the cached feed first and the
+    # processed item index second; bounded LRU so memory stays flat.
+    def __init__(self, root, resolvers, max_entries=None):
+        self.root = root
+        self.resolvers = list(resolvers)
+        self.max_entries = int(max_entries or os.environ.get("AUDIO_INDEX_SIZE", "10000"))
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _full(self, ap):
+        if not ap:
+            return None
+        return ap if os.path.isabs(ap) else os.path.join(self.root, ap)
+
+    def put(self, item_id, audio_path):
+        full = self._full(audio_path)
+        if not full:
+            return None
+        with self.lock:
+            self.paths[item_id] = full
+            self.paths.move_to_end(item_id)
+            while len(self.paths) > self.max_entries:
+                self.paths.popitem(last=False)
+        return full
+
+    def _present(self, full):
+        return os.path.exists(full) or os.path.exists(full + ".part")
+
+    def lookup(self, item_id):
+        with self.lock:
+            full = self.paths.get(item_id)
+            if full:
+                self.paths.move_to_end(item_id)
+        if full and self._present(full):
+            return full
+        for resolve in self.resolvers:
+            try:
+                ap = resolve(item_id)
+            except Exception:
+                ap = None
+            full = self._full(ap)
+            if full and self._present(full):
+                return self.put(item_id, ap)
+        with self.lock:
+            self.paths.pop(item_id, None)
+        return None
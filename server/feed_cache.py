@@ -0,0 +1,171 @@
+import os
+import json
+import gzip
+import bisect
+import hashlib
+import threading
+import datetime as dt
+from agents.trend import _ts, EPOCH
+
+def _epoch(s):
+    if s is None or s == "":
+        return None
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        pass
+    try:
+        t = dt.datetime.fromisoformat(s)
+        if t.tzinfo is not None:
+            t = t.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    except Exception:
+        t = _ts(s)
+    return (t - EPOCH).total_seconds()
+
+def _priority(x):
+    try:
+        return float(x.get("priority_score") or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class Body:
+    # A pre-serialized JSON response with its gzip form; each variant has its
+    # own strong ETag (the gzip one suffixed -gz), as their bytes differ.
+    def __init__(self, obj):
+        self.raw = json.dumps(obj).encode("utf-8")
+        self.gz = gzip.compress(self.raw, 6, mtime=0)
+        h = hashlib.sha1(self.raw).hexdigest()[:20]
+        self.etag = '"' + h + '"'
+        self.etag_gz = '"' + h + '-gz"'
+
+class Snapshot:
+    def __init__(self, data, key):
+        self.key = key
+        self.data = data
+        self.items = data.get("items", []) if isinstance(data, dict) else []
+        self.feed = Body(data)
+        self.sample = Body(self._sample()) if self.items else None
+        self._index()
+
+    def _index(self):
+        # Built once per load. Every scope (all items, a category, a language,
+        # a category+language pair) gets a list ordered by priority_score desc
+        # (stable) with its descending score keys for min_priority cuts, and
+        # a list ordered by timestamp with its ascending keys for `since`, so
+        # a page is a bisect plus a slice.
+        items = self.items
+        self.prio = [_priority(x) for x in items]
+        self.stamps = [_epoch(x.get("timestamp")) or 0.0 for x in items]
+        self.by_priority = sorted(range(len(items)), key=lambda i: -self.prio[i])
+        self.by_time = sorted(range(len(items)), key=lambda i: self.stamps[i])
+        self.time_keys = [self.stamps[i] for i in self.by_time]
+        self.scopes = {}
+        for name, order in (("prio", self.by_priority), ("time", self.by_time)):
+            for i in order:
+                x = items[i]
+                c = x.get("category") or "general"
+                l = x.get("language") or "unknown"
+                for key in ((None, None), (c, None), (None, l), (c, l)):
+                    self.scopes.setdefault(key, {"prio": [], "time": []})[name].append(i)
+        for sc in self.scopes.values():
+            sc["prio_keys"] = [-self.prio[i] for i in sc["prio"]]
+            sc["time_keys"] = [self.stamps[i] for i in sc["time"]]
+        self.by_category = {c: sc["prio"] for (c, l), sc in self.scopes.items() if c and not l}
+        self.by_language = {l: sc["prio"] for (c, l), sc in self.scopes.items() if l and not c}
+        self.audio = {x.get("id"): x.get("audio_path") for x in items if x.get("audio_path")}
+
+    def query(self, category=None, language=None, min_priority=None, since=None, limit=50, cursor=0):
+        # Returns (items, next_cursor). Without `since` items come by
+        # priority_score desc; with it, oldest first from `since` on (then
+        # min_priority is a filter on that window). The cursor is a position
+        # in the chosen list, so pages stay consistent for one report snapshot.
+        sc = self.scopes.get((category or None, language or None))
+        if sc is None:
+            return [], None
+        if since is None:
+            base = sc["prio"]
+            n = len(base)
+            if min_priority is not None:
+                n = bisect.bisect_right(sc["prio_keys"], -min_priority)
+            end = min(n, cursor + limit)
+            return [self.items[i] for i in base[cursor:end]], (str(end) if end < n else None)
+        base = sc["time"]
+        cut = bisect.bisect_left(sc["time_keys"], since)
+        n = len(base) - cut
+        if min_priority is None:
+            end = min(n, cursor + limit)
+            return [self.items[i] for i in base[cut+cursor:cut+end]], (str(end) if end < n else None)
+        out = []
+        pos = cursor
+        while pos < n and len(out) < limit:
+            i = base[cut+pos]
+            pos += 1
+            if self.prio[i] >= min_priority:
+                out.append(self.items[i])
+        return out, (str(pos) if pos < n else None)
+
+    def _sample(self):
+        it = dict(self.items[0])
+        it["script"] = it.get("script") or it.get("summary_medium") or it.get("summary_short") or it.get("title")
+        if it.get("rl_reward_score") is None:
+            it["rl_reward_score"] = it.get("reward_score", 0.0)
+        return it
+
+class FeedCache:
+    # Holds the parsed weekly report and its serialized responses; the file is
+    # only re-read when its (mtime, inode, size) changes.
+    def __init__(self, path):
+        self.path = path
+        self.snap = None
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def _key(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def get(self):
+        key = self._key()
+        snap = self.snap
+        if snap is not None and snap.key == key:
+            return snap
+        with self.lock:
+            if self.snap is not None and self.snap.key == key:
+                return self.snap
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.snap = self.make_snapshot(data, key)
+            self.loads += 1
+            return self.snap
+
+    def make_snapshot(self, data, key):
+        return Snapshot(data, key)
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        t = tag.strip()
+        if t.startswith("W/"):
+            t = t[2:]
+        if t == etag:
+            return True
+    return False
+
+def accepts_gzip(header):
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for prm in params.split(";"):
+            k, _, v = prm.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+
+def parse_rules(spec):
+    # "/feedback=30/60,/feed=600/60" -> {"/feedback": (30, 60.0), ...}
+    rules = {}
+    for part in (spec or "").split(","):
+        route, _, rate = part.strip().partition("=")
+        count, _, per = rate.partition("/")
+        try:
+            rules[route.strip()] = (int(count), float(per or "60"))
+        except ValueError:
+            continue
+    return rules
+
+class Rule:
+    # GCRA: `count` requests per `per` seconds with a burst of `count`. The
+    # only state per key is its theoretical arrival time (TAT).
+    def __init__(self, count, per):
+        self.count = max(1, int(count))
+        self.per = float(per)
+        self.interval = self.per / self.count
+        self.tolerance = self.interval * (self.count - 1)
+
+class RateLimiter:
+    # Keys are (route, client). A key whose TAT is in the past is identical to
+    # a fresh one, so the periodic sweep just drops those. Rejections of a key
+    # already over its limit are decided from a lock-free dict read; admits
+    # take one of a few striped locks to advance the TAT.
+    def __init__(self, rules=None, sweep_seconds=None, stripes=16):
+        self.rules = {r: Rule(c, p) for r, (c, p) in (rules or {}).items()}
+        self.sweep_seconds = float(sweep_seconds or os.environ.get("RATE_SWEEP_SECONDS", "60"))
+        self.tat = {}
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.sweep_lock = threading.Lock()
+        self.count_lock = threading.Lock()
+        self.next_sweep = time.monotonic() + self.sweep_seconds
+        self.allowed = {}
+        self.limited = {}
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls, default_routes=()):
+        count = int(os.environ.get("RATE_LIMIT_PER_WINDOW", "60"))
+        per = float(os.environ.get("RATE_WINDOW_SECONDS", "60"))
+        rules = {r: (count, per) for r in default_routes}
+        rules.update(parse_rules(os.environ.get("RATE_LIMITS", "")))
+        return cls({r: v for r, v in rules.items() if v[0] > 0})
+
+    def _bump(self, counters, route):
+        with self.count_lock:
+            counters[route] = counters.get(route, 0) + 1
+
+    def allow(self, route, client, now=None):
+        # Returns (ok, retry_after_seconds).
+        rule = self.rules.get(route)
+        if rule is None:
+            return True, 0.0
+        now = time.monotonic() if now is None else now
+        if now >= self.next_sweep:
+            self.sweep(now)
+        key = (route, client)
+        tat = self.tat.get(key)
+        if tat is not None and tat - now > rule.tolerance:
+            self._bump(self.limited, route)
+            return False, tat - now - rule.tolerance
+        with self.locks[hash(key) % len(self.locks)]:
+            tat = max(self.tat.get(key, now), now)
+            if tat - now > rule.tolerance:
+                self._bump(self.limited, route)
+                return False, tat - now - rule.tolerance
+            self.tat[key] = tat + rule.interval
+        self._bump(self.allowed, route)
+        return True, 0.0
+
+    def sweep(self, now=None):
+        now = time.monotonic() if now is None else now
+        if not self.sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self.next_sweep = now + self.sweep_seconds
+            idle = [k for k, t in list(self.tat.items()) if t <= now]
+            for k in idle:
+                with self.locks[hash(k) % len(self.locks)]:
+                    if self.tat.get(k, now + 1) <= now:
+                        del self.tat[k]
+                        self.evicted += 1
+            return len(idle)
+        finally:
+            self.sweep_lock.release()
+
+    def stats(self):
+        with self.count_lock:
+            allowed = dict(self.allowed)
+            limited = dict(self.limited)
+        return {
+            "keys": len(self.tat),
+            "evicted": self.evicted,
+            "rules": {r: {"count": x.count, "per": x.per} for r, x in self.rules.items()},
+            "allowed": allowed,
+            "limited": limited
+        }
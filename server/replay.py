@@ -0,0 +1,127 @@
+import os
+import time
+import hmac
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+class NonceStore:
+    # Nonces live in time buckets of ttl/buckets seconds. A dict gives O(1)
+    # membership; whole buckets are dropped once older than the TTL, so each
+    # nonce is expired exactly once and memory is bounded by ttl * rate.
+    def __init__(self, ttl=None, buckets=None):
+        self.ttl = float(ttl or os.environ.get("API_NONCE_TTL_SECONDS", "86400"))
+        n = int(buckets or os.environ.get("API_NONCE_BUCKETS", "60"))
+        self.width = max(1.0, self.ttl / max(1, n))
+        self.seen = {}
+        self.buckets = deque()
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        floor = int((now - self.ttl) // self.width)
+        while self.buckets and self.buckets[0][0] < floor:
+            _, names = self.buckets.popleft()
+            for k in names:
+                self.seen.pop(k, None)
+
+    def add(self, nonce, now=None):
+        now = time.time() if now is None else now
+        b = int(now // self.width)
+        with self.lock:
+            self._expire(now)
+            if nonce in self.seen:
+                return False
+            if not self.buckets or self.buckets[-1][0] != b:
+                self.buckets.append((b, []))
+            self.buckets[-1][1].append(nonce)
+            self.seen[nonce] = b
+            return True
+
+    def __len__(self):
+        return len(self.seen)
+
+class TokenCache:
+    # LRU of JWTs that already passed verification, valid until their exp.
+    def __init__(self, max_entries=None):
+        self.max_entries = int(max_entries or os.environ.get("API_JWT_CACHE_SIZE", "4096"))
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _key(self, token, secret):
+        return hashlib.sha256((secret + "\0" + token).encode("utf-8")).digest()
+
+    def get(self, token, secret, now=None):
+        now = time.time() if now is None else now
+        k = self._key(token, secret)
+        with self.lock:
+            exp = self.entries.get(k)
+            if exp is None:
+                return False
+            if exp <= now:
+                del self.entries[k]
+                return False
+            self.entries.move_to_end(k)
+            return True
+
+    def put(self, token, secret, exp):
+        k = self._key(token, secret)
+        with self.lock:
+            self.entries[k] = exp
+            self.entries.move_to_end(k)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class ReplayGuard:
+    # Timestamped requests only need their nonce remembered for the window.
+    # Unstamped ones are refused unless API_REQUIRE_TIMESTAMP=0; their nonces
+    # are then kept for API_NONCE_TTL_SECONDS (a day), so memory stays
+    # bounded and a replay is only possible after that.
+    def __init__(self, window=None, tokens=None, require_timestamp=None):
+        self.window = float(window or os.environ.get("API_TIMESTAMP_WINDOW_SECONDS", "300"))
+        if require_timestamp is None:
+            require_timestamp = os.environ.get("API_REQUIRE_TIMESTAMP", "1") != "0"
+        self.require_timestamp = require_timestamp
+        self.nonces = NonceStore(ttl=2*self.window)
+        self.legacy = NonceStore()
+        self.tokens = tokens or TokenCache()
+
+    def verify_token(self, token, secret, decode):
+        if self.tokens.get(token, secret):
+            return True
+        try:
+            claims = decode(token, secret)
+        except Exception:
+            return False
+        exp = (claims or {}).get("exp") if isinstance(claims, dict) else None
+        ttl = float(os.environ.get("API_JWT_CACHE_SECONDS", "300"))
+        until = time.time() + ttl
+        if exp is not None:
+            try:
+                until = min(until, float(exp))
+            except (TypeError, ValueError):
+                return True
+        self.tokens.put(token, secret, until)
+        return True
+
+    def timestamp_ok(self, ts, now=None):
+        now = time.time() if now is None else now
+        try:
+            return abs(now - float(ts)) <= self.window
+        except (TypeError, ValueError):
+            return False
+
+    def check(self, secret, nonce, sig, raw, ts=None):
+        # With X-Timestamp the signature covers ts + nonce + body so an old
+        # request cannot be replayed with a fresh timestamp; without it the
+        # legacy nonce + body form is accepted when timestamps are optional.
+        if not nonce or not secret:
+            return False
+        if ts is None and self.require_timestamp:
+            return False
+        if ts is not None and not self.timestamp_ok(ts):
+            return False
+        msg = (ts.encode("utf-8") if ts is not None else b"") + nonce.encode("utf-8") + raw
+        h = hmac.new(secret.encode("utf-8"), msg, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(h.encode("utf-8"), (sig or "").strip().lower().encode("utf-8")):
+            return False
+        return (self.nonces if ts is not None else self.legacy).add(nonce)
@@ -20,4 +20,128 @@ def test_feedback_and_requeue():
     assert r.status_code == 200
     time.sleep(0.3)
     rq = requests.post(base + "/requeue", json={"id": item.get("id")}, timeout=5)
-    assert rq.status_code == 200
\ No newline at end of file
+    assert rq.status_code == 200
+
+def test_async_server_keepalive_routes(tmp_path, monkeypatch):
+    import sys
+    import asyncio
+    import threading
+    import http.client
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(ROOT)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "news.db"))
+    monkeypatch.setenv("ITEM_LOCK_DIR", str(tmp_path / "locks"))
+    monkeypatch.setenv("RL_EVENTS_FILE", "0")
+    import agents.db
+    agents.db.reset_default_db()
+    from scripts.api_server import make_server
+    srv = make_server("127.0.0.1", 0)
+    srv.ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=lambda: loop.run_until_complete(srv.serve(install_signals=False)), daemon=True)
+    t.start()
+    assert srv.ready.wait(5)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=5)
+        conn.request("GET", "/health")
+        r1 = conn.getresponse()
+        assert r1.status == 200 and json.loads(r1.read()) == {"status": "ok"}
+        sock = conn.sock
+        conn.request("POST", "/requeue", body=json.dumps({"id": "missing"}), headers={"Content-Type": "application/json"})
+        r2 = conn.getresponse()
+        assert r2.status == 200 and json.loads(r2.read())["requeued"] is False
+        assert conn.sock is sock
+        conn.request("GET", "/nope")
+        r3 = conn.getresponse()
+        assert r3.status == 404
+        r3.read()
+        conn.close()
+    finally:
+        srv.stop(loop)
+        t.join(5)
+        agents.db.reset_default_db()
+    assert not t.is_alive()
+
+def test_async_server_streams_growing_part_file(tmp_path):
+    import sys
+    import asyncio
+    import threading
+    import http.client
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(ROOT)
+    from server.aio import AsyncHTTPServer, StreamResponse, Response
+    from server.audio import follow
+    final = str(tmp_path / "a.wav")
+    part = final + ".part"
+    w = open(part, "wb")
+    w.write(b"RIFF")
+    w.flush()
+    def handler(req):
+        if req.path == "/audio":
+            return StreamResponse(200, follow(open(part, "rb"), part), "audio/wav")
+        return Response(200, b"{}")
+    def writer():
+        for i in range(5):
+            time.sleep(0.05)
+            w.write(bytes([i]) * 1000)
+            w.flush()
+        w.close()
+        os.replace(part, final)
+    srv = AsyncHTTPServer(handler, "127.0.0.1", 0)
+    srv.ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=lambda: loop.run_until_complete(srv.serve(install_signals=False)), daemon=True)
+    t.start()
+    assert srv.ready.wait(5)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=5)
+        conn.request("GET", "/audio")
+        threading.Thread(target=writer).start()
+        r = conn.getresponse()
+        assert r.status == 200 and r.getheader("Transfer-Encoding") == "chunked"
+        body = r.read()
+        assert body == b"RIFF" + b"".join(bytes([i]) * 1000 for i in range(5))
+        conn.request("GET", "/health")
+        assert conn.getresponse().read() == b"{}"
+        conn.close()
+    finally:
+        srv.stop(loop)
+        t.join(5)
+
+def test_async_server_streams_close_delimited_to_http10(monkeypatch):
+    import sys
+    import socket
+    import asyncio
+    import threading
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(ROOT)
+    from server.aio import AsyncHTTPServer, StreamResponse
+    monkeypatch.setenv("API_MAX_STREAMS", "1")
+    seen = []
+    def handler(req):
+        seen.append(threading.current_thread().name)
+        return StreamResponse(200, iter([b"ab", b"", b"cd"]), "audio/wav")
+    srv = AsyncHTTPServer(handler, "127.0.0.1", 0)
+    srv.ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=lambda: loop.run_until_complete(srv.serve(install_signals=False)), daemon=True)
+    t.start()
+    assert srv.ready.wait(5)
+    try:
+        s = socket.create_connection(("127.0.0.1", srv.port), timeout=5)
+        s.sendall(b"GET /audio HTTP/1.0\r\n\r\n")
+        data = b""
+        while True:
+            b = s.recv(4096)
+            if not b:
+                break
+            data += b
+        s.close()
+        head, _, body = data.partition(b"\r\n\r\n")
+        assert b"chunked" not in head.lower() and b"Connection: close" in head
+        assert body == b"abcd"
+        assert srv.stream_pool is not srv.pool and seen[0].startswith("api_")
+    finally:
+        srv.stop(loop)
+        t.join(5)
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import numpy as np
+from agents.column_store import ColumnStore, migrate, has_columns
+from agents.item_store import ItemStore
+
+def item(i, cat="business", pol="positive"):
+    return {"id": f"id-{i}", "title": f"title {i}", "category": cat, "language": "en", "polarity": pol, "tone": "calm",
+            "confidence": (i % 10) / 10.0, "timestamp": "2025-01-0%dT10:00:00" % (1 + i % 9), "reward_score": 0.0}
+
+def test_append_mmap_and_latest_row_wins(tmp_path):
+    day = str(tmp_path)
+    st = ColumnStore(day)
+    assert st.append([(os.path.join(day, f"item_{i}.json"), item(i)) for i in range(5)]) == 5
+    st.append([(os.path.join(day, "item_2.json"), dict(item(2), reward_score=0.9, category="sports"))])
+    st = ColumnStore(day)
+    assert len(st) == 6 and isinstance(st.column("confidence"), np.memmap)
+    rows = st.latest()
+    assert len(rows) == 5 and 2 not in rows.tolist() and 5 in rows.tolist()
+    assert st.values("category", rows).tolist().count("sports") == 1
+    path, obj = st.find("id-2")
+    assert obj["reward_score"] == 0.9 and path.endswith("item_2.json")
+    with open(os.path.join(day, "columns", "confidence.bin"), "ab") as f:
+        f.write(b"\0" * 3)
+    st.append([(os.path.join(day, "item_9.json"), item(9))])
+    assert os.path.getsize(os.path.join(day, "columns", "confidence.bin")) == 7 * 8
+    assert ColumnStore(day).find("id-9")[1]["title"] == "title 9"
+
+def test_migrated_day_ranks_like_the_json_files(tmp_path):
+    from agents.ranker import rank, rank_store
+    day = str(tmp_path)
+    items = [item(i, cat=["business", "sports", "general"][i % 3], pol=["positive", "neutral", "negative"][i % 3]) for i in range(12)]
+    for i, x in enumerate(items):
+        with open(os.path.join(day, f"item_{i:02d}.json"), "w", encoding="utf-8") as f:
+            json.dump(x, f)
+    assert migrate(day) == 12 and has_columns(day)
+    want = [(x["id"], x["priority_score"]) for x in rank(items)]
+    got = [(x["id"], x["priority_score"]) for x in rank_store(ColumnStore(day))]
+    assert got == want
+
+def test_item_store_reads_keys_and_appends_updates(tmp_path):
+    base = tmp_path / "processed"
+    day = base / "20250101"
+    day.mkdir(parents=True)
+    with open(day / "item_a.json", "w", encoding="utf-8") as f:
+        json.dump(item(1), f)
+    migrate(str(day))
+    store = ItemStore(str(base), str(tmp_path / "locks"))
+    assert store.path_for("id-1") == str(day / "item_a.json")
+    store.update_fields("id-1", {"skip": True})
+    assert ColumnStore(str(day)).find("id-1")[1]["skip"] is True
+
+def test_updates_compact_shadowed_rows(tmp_path, monkeypatch):
+    from agents.column_store import append_items
+    monkeypatch.setenv("COLUMN_STORE", "1")
+    monkeypatch.setenv("COLUMN_STORE_COMPACT_RATIO", "2")
+    day = str(tmp_path)
+    append_items(day, [(os.path.join(day, f"item_{i}.json"), item(i)) for i in range(3)])
+    for n in range(20):
+        append_items(day, [(os.path.join(day, "item_1.json"), dict(item(1), reward_score=n / 10.0))])
+        assert len(ColumnStore(day)) <= 6
+    st = ColumnStore(day)
+    assert st.find("id-1")[1]["reward_score"] == 1.9
+    assert sorted(o["id"] for _, o in st.records()) == ["id-0", "id-1", "id-2"]
+    st.append([(os.path.join(day, "item_2.json"), dict(item(2), skip=True))])
+    assert st.compact() == 1 and len(st) == 3 and st.shadowed() == 0
+    assert st.find("id-2")[1]["skip"] is True
+    assert sorted(os.listdir(tmp_path)) == ["columns"]
+
+def test_migrate_keeps_concurrent_appends(tmp_path):
+    import threading
+    day = str(tmp_path)
+    migrate(day)
+    def writer():
+        for i in range(60):
+            p = os.path.join(day, f"item_{i:02d}.json")
+            with open(p, "w", encoding="utf-8") as f:
+                json.dump(item(i), f)
+            ColumnStore(day).append([(p, item(i))])
+    t = threading.Thread(target=writer)
+    t.start()
+    while t.is_alive():
+        migrate(day)
+    t.join()
+    st = ColumnStore(day)
+    assert sorted(o["id"] for _, o in st.records()) == sorted(f"id-{i}" for i in range(60))
+    assert sorted(os.listdir(tmp_path))[-1] == "item_59.json" and "columns.tmp" not in os.listdir(tmp_path)
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import threading
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from agents.db import Database
+
+def item(i, cat="business", p=0.5):
+    return {"id": f"id-{i}", "title": f"t{i}", "category": cat, "language": "en", "priority_score": p, "timestamp": "2025-01-01T00:00:00"}
+
+def test_wal_indexes_and_top_queries(tmp_path):
+    db = Database(str(tmp_path / "news.db"))
+    assert db.conn().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.upsert_items([item(i, "sports" if i % 2 else "business", i / 10.0) for i in range(10)])
+    plan = " ".join(r[-1] for r in db.conn().execute("EXPLAIN QUERY PLAN SELECT id FROM items WHERE category = ? AND skip = 0 ORDER BY priority_score DESC LIMIT 3", ("sports",)))
+    assert "items_category_priority" in plan
+    assert [x["id"] for x in db.top("sports", 3)] == ["id-9", "id-7", "id-5"]
+    assert db.top(limit=1)[0]["id"] == "id-9"
+
+def test_feedback_updates_state_and_events(tmp_path):
+    db = Database(str(tmp_path / "news.db"))
+    db.upsert_items([(str(tmp_path / "item.json"), item(1, p=0.5))])
+    assert db.apply_feedback("id-1", 0.7, "queue")
+    assert db.apply_feedback("id-1", -0.5, "escalate")
+    assert not db.apply_feedback("missing", 1.0, "skip")
+    path, obj = db.get_item("id-1")
+    assert path.endswith("item.json")
+    assert obj["reward_score"] == -0.5 and obj["requeue_requested"] and obj["demote"] and abs(obj["priority_score"] - 0.4) < 1e-9
+    db.upsert_items([item(1, p=0.8)])
+    assert db.get_item("id-1")[1]["demote"] is True
+    for r in (1.0, 0.0, 0.5):
+        db.add_event({"type": "feedback", "id": "id-1", "reward": r})
+    assert db.recent_rewards(2) == [0.0, 0.5]
+
+def test_connection_per_thread(tmp_path):
+    db = Database(str(tmp_path / "news.db"))
+    seen = []
+    def work(n):
+        seen.append(id(db.conn()))
+        db.add_event({"type": "t", "id": str(n), "reward": 0.1})
+    ts = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    assert len(set(seen)) == 4
+    assert db.conn().execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 4
+
+def test_event_log_batches_into_feedback_table(tmp_path):
+    from agents.rl_feedback import EventLog
+    db = Database(str(tmp_path / "news.db"))
+    seen = []
+    real = db.add_events
+    def add_events(recs):
+        seen.append(len(recs))
+        time.sleep(0.2)
+        return real(recs)
+    db.add_events = add_events
+    log = EventLog(path=str(tmp_path / "rl.log"), batch=64, flush_seconds=0.05, window=4, db=lambda: db, to_file=False)
+    for i in range(10):
+        assert log.put({"type": "feedback", "id": f"t{i}", "reward": i/10.0})
+    assert log.flush()
+    log.close()
+    assert sum(seen) == 10 and len(seen) <= 2
+    assert db.conn().execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 10
+    assert not os.path.exists(str(tmp_path / "rl.log"))
+    st = EventLog(window=4, db=lambda: db, to_file=False).stats()
+    assert st["count"] == 4 and abs(st["mean"] - 0.75) < 1e-9
+
+def test_item_lookup_reads_file_with_db_state(tmp_path, monkeypatch):
+    from agents import automator
+    from agents.item_store import ItemStore
+    day = tmp_path / "processed" / "20250101"
+    day.mkdir(parents=True)
+    path = day / "item_a.json"
+    path.write_text(json.dumps(item(1)))
+    db = Database(str(tmp_path / "news.db"))
+    store = ItemStore(str(tmp_path / "processed"), str(tmp_path / "locks"))
+    monkeypatch.setattr(automator, "default_db", lambda: db)
+    monkeypatch.setattr(automator, "default_store", lambda: store)
+    assert automator._find_processed_by_id("id-1")[1]["title"] == "t1"
+    assert db.get_item("id-1") == (None, None)
+    db.upsert_items([(str(path), item(1))])
+    db.apply_feedback("id-1", 0.7, "skip")
+    store.update_fields("id-1", {"audio_path": "data/audio/a.wav"})
+    p, obj = automator._find_processed_by_id("id-1")
+    assert p == str(path) and obj["audio_path"] == "data/audio/a.wav"
+    assert obj["reward_score"] == 0.7 and obj["skip"] is True
+    assert automator._find_processed_by_id("missing") == (None, None)
+
+def test_feedback_writes_item_once_and_queues_in_one_transaction(tmp_path, monkeypatch):
+    from agents import automator, item_store
+    from agents.item_store import ItemStore
+    from agents.work_queue import RequeueQueue
+    day = tmp_path / "processed" / "20250101"
+    day.mkdir(parents=True)
+    path = day / "item_a.json"
+    path.write_text(json.dumps(item(1, p=0.3)))
+    db = Database(str(tmp_path / "news.db"))
+    store = ItemStore(str(tmp_path / "processed"), str(tmp_path / "locks"))
+    q = RequeueQueue(db)
+    monkeypatch.setattr(automator, "default_db", lambda: db)
+    monkeypatch.setattr(automator, "default_store", lambda: store)
+    monkeypatch.setattr(automator, "default_queue", lambda: q)
+    writes, txs = [], []
+    real_write, real_tx = item_store.write_atomic, db.tx
+    monkeypatch.setattr(item_store, "write_atomic", lambda p, o: writes.append(p) or real_write(p, o))
+    db.tx = lambda: txs.append(1) or real_tx()
+    assert automator.apply_feedback("id-1", 0.8, "queue")
+    assert writes == [str(path)] and len(txs) == 1
+    p, obj = db.get_item("id-1")
+    assert p == str(path) and obj["reward_score"] == 0.8 and obj["requeue_requested"] is True
+    assert json.loads(path.read_text())["requeue_requested"] is True
+    e = q.claim(5)[0]
+    assert e["id"] == "id-1" and e["action"] == "queue" and abs(e["priority"] - 0.3) < 1e-9 and e["reward"] == 0.8
+    monkeypatch.setenv("DB_MIRROR_JSON", "0")
+    del txs[:]
+    assert automator.set_demote("id-1")
+    assert len(writes) == 1 and len(txs) == 1
+    assert db.get_item("id-1")[1]["demote"] is True and "demote" not in json.loads(path.read_text())
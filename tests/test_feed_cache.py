@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import gzip
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from server.feed_cache import FeedCache, etag_matches, accepts_gzip
+
+def write_report(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": "2025-11-21T00:00:00", "items": items}, f)
+
+def test_feed_cache_reloads_only_on_change(tmp_path):
+    path = str(tmp_path / "weekly_report.json")
+    write_report(path, [{"id": "a", "summary_medium": "m"}])
+    cache = FeedCache(path)
+    s1 = cache.get()
+    assert cache.get() is s1 and cache.loads == 1
+    assert json.loads(gzip.decompress(s1.feed.gz)) == json.loads(s1.feed.raw)
+    assert json.loads(s1.sample.raw)["script"] == "m"
+    write_report(path, [{"id": "b"}, {"id": "c"}])
+    os.utime(path, ns=(1, 10**18))
+    s2 = cache.get()
+    assert cache.loads == 2 and s2.feed.etag != s1.feed.etag
+    assert etag_matches("W/" + s2.feed.etag + ", \"x\"", s2.feed.etag)
+    assert accepts_gzip("br, gzip;q=0.8") and not accepts_gzip("gzip;q=0, deflate")
+
+def test_feed_query_filters_and_pages(tmp_path):
+    path = str(tmp_path / "weekly_report.json")
+    items = []
+    for i in range(7):
+        items.append({"id": f"i{i}", "category": "sports" if i % 2 else "business", "language": "en" if i < 5 else "hi", "priority_score": round(0.9 - 0.1*i, 2), "timestamp": f"2025-11-2{i}T00:00:00"})
+    write_report(path, items)
+    snap = FeedCache(path).get()
+    page, nxt = snap.query(category="business", limit=2)
+    assert [x["id"] for x in page] == ["i0", "i2"] and nxt == "2"
+    page, nxt = snap.query(category="business", limit=2, cursor=int(nxt))
+    assert [x["id"] for x in page] == ["i4", "i6"] and nxt is None
+    page, _ = snap.query(language="hi", limit=10)
+    assert [x["id"] for x in page] == ["i5", "i6"]
+    page, _ = snap.query(min_priority=0.65, limit=10)
+    assert [x["id"] for x in page] == ["i0", "i1", "i2"]
+    since = (snap.stamps[4] + snap.stamps[5]) / 2
+    page, _ = snap.query(since=since, limit=10)
+    assert [x["id"] for x in page] == ["i5", "i6"]
+
+def test_audio_range_parsing():
+    from server.audio import parse_range
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=100-", 100) == "invalid"
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+def test_gzip_variant_has_its_own_etag(tmp_path):
+    from scripts.api_server import send_cached
+    from server.aio import Request
+    path = str(tmp_path / "weekly_report.json")
+    write_report(path, [{"id": "a"}])
+    body = FeedCache(path).get().feed
+    assert body.etag_gz != body.etag and body.etag_gz.endswith('-gz"')
+    gz = send_cached(Request("GET", "/feed", [("Accept-Encoding", "gzip")]), body)
+    plain = send_cached(Request("GET", "/feed", []), body)
+    assert dict(gz.headers)["ETag"] == body.etag_gz and dict(plain.headers)["ETag"] == body.etag
+    assert dict(gz.headers)["Vary"] == "Accept-Encoding"
+    assert send_cached(Request("GET", "/feed", [("Accept-Encoding", "gzip"), ("If-None-Match", body.etag_gz)]), body).code == 304
+    assert send_cached(Request("GET", "/feed", [("Accept-Encoding", "gzip"), ("If-None-Match", body.etag)]), body).code == 200
+
+def test_feed_query_category_language_and_since_pages(tmp_path):
+    path = str(tmp_path / "weekly_report.json")
+    items = [{"id": f"i{i}", "category": "sports" if i % 2 else "business", "language": "en" if i % 3 else "hi",
+              "priority_score": (i * 7 % 10) / 10.0, "timestamp": f"2025-11-{10+i}T00:00:00"} for i in range(12)]
+    write_report(path, items)
+    snap = FeedCache(path).get()
+    page, nxt = snap.query(category="sports", language="en", limit=10)
+    want = sorted([x for x in items if x["category"] == "sports" and x["language"] == "en"], key=lambda x: -x["priority_score"])
+    assert page == want and nxt is None
+    page, nxt = snap.query(category="business", min_priority=0.4, limit=10)
+    assert [x["id"] for x in page] == [x["id"] for x in sorted(items, key=lambda x: -x["priority_score"]) if x["category"] == "business" and x["priority_score"] >= 0.4]
+    since = snap.stamps[5]
+    first, nxt = snap.query(category="sports", since=since, limit=2)
+    rest, last = snap.query(category="sports", since=since, limit=2, cursor=int(nxt))
+    assert [x["id"] for x in first + rest] == ["i5", "i7", "i9", "i11"] and last is None
+    page, _ = snap.query(since=since, min_priority=0.5, limit=10)
+    assert [x["id"] for x in page] == [x["id"] for x in items[5:] if x["priority_score"] >= 0.5]
+    assert snap.query(category="nope") == ([], None)
@@ -0,0 +1,70 @@
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from pipeline.incremental import process_changes, ChangeLog, changed_records
+
+def raw(i, summary="Markets rose sharply today as investors welcomed strong earnings from large companies."):
+    return {"id": f"story-{i}", "title": f"Stock market rally number {i} lifts shares", "summary": summary, "published": "2025-01-01T10:00:00Z"}
+
+def test_only_new_or_changed_items_are_processed(tmp_path, monkeypatch):
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    day = str(tmp_path)
+    first = process_changes([raw(1), raw(2)], day)
+    assert len(first["added"]) == 2 and first["unchanged"] == 0
+    names = sorted(first["added"])
+    again = process_changes([raw(2), raw(1)], day)
+    assert again["records"] == [] and again["unchanged"] == 2
+    edited = process_changes([raw(1), raw(2, "Shares slipped later as traders booked profits after the rally.")], day)
+    assert edited["added"] == [] and len(edited["changed"]) == 1
+    assert sorted(f for f in os.listdir(day) if f.startswith("item_")) == names
+    assert edited["changed"][0] in names
+
+def test_consumers_see_only_deltas_since_their_cursor(tmp_path, monkeypatch):
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    day = str(tmp_path)
+    assert changed_records(day, "audio") == (None, 0)
+    process_changes([raw(1), raw(2)], day)
+    recs, off = changed_records(day, "audio", ignore=("audio",))
+    assert len(recs) == 2
+    log = ChangeLog(day)
+    log.append([os.path.basename(recs[0][0])], "audio")
+    log.ack("audio", off)
+    assert changed_records(day, "audio", ignore=("audio",))[0] == []
+    files, _ = log.since("rank")
+    assert len(files) == 2
+    process_changes([raw(3)], day)
+    recs, _ = changed_records(day, "audio", ignore=("audio",))
+    assert [o["id"] for _, o in recs] == ["story-3"]
+
+def test_reprocess_keeps_earned_fields(tmp_path, monkeypatch):
+    import json
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    day = str(tmp_path)
+    name = process_changes([raw(1)], day)["added"][0]
+    path = os.path.join(day, name)
+    with open(path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    obj.update({"reward_score": 0.9, "skip": True, "audio_path": "data/audio/a.wav"})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    process_changes([raw(1, "Shares slipped later as traders booked profits after the rally.")], day)
+    with open(path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    assert "Shares slipped" in obj["summary_medium"]
+    assert obj["reward_score"] == 0.9 and obj["skip"] is True and obj["audio_path"] == "data/audio/a.wav"
+
+def test_feedback_writes_are_journaled(tmp_path, monkeypatch):
+    from agents.item_store import ItemStore
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    day = tmp_path / "processed" / "20250101"
+    day.mkdir(parents=True)
+    process_changes([raw(1)], str(day))
+    log = ChangeLog(str(day))
+    log.ack("rank", log.since("rank")[1])
+    log.ack("audio", log.since("audio")[1])
+    store = ItemStore(base=str(tmp_path / "processed"), lock_dir=str(tmp_path / "locks"))
+    store.update_fields("story-1", {"reward_score": 0.5})
+    files, _ = log.since("rank")
+    assert [os.path.basename(f) for f in files] == [os.path.basename(store.get("story-1")[0])]
+    assert changed_records(str(day), "audio", ignore=("audio", "feedback", "requeue"))[0] == []
@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from agents.item_store import ItemStore
+
+def write_item(d, name, obj):
+    os.makedirs(d, exist_ok=True)
+    p = os.path.join(d, name)
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    return p
+
+def test_store_indexes_across_dates_and_updates(tmp_path):
+    base = str(tmp_path / "processed")
+    old = write_item(os.path.join(base, "20250101"), "item_1.json", {"id": "a", "priority_score": 0.5})
+    write_item(os.path.join(base, "20250102"), "item_1.json", {"id": "b"})
+    store = ItemStore(base, str(tmp_path / "locks"))
+    path, obj = store.get("a")
+    assert path == old and obj["priority_score"] == 0.5
+    assert store.update_fields("a", {"skip": True, "reward_score": 0.4})["skip"] is True
+    with open(old, "r", encoding="utf-8") as f:
+        assert json.load(f) == {"id": "a", "priority_score": 0.5, "skip": True, "reward_score": 0.4}
+    write_item(os.path.join(base, "20250102"), "item_1.json", {"id": "c"})
+    assert store.get("b") == (None, None)
+    assert store.get("c")[1] == {"id": "c"}
+    assert store.get("missing") == (None, None)
+
+def test_concurrent_feedback_updates_are_not_lost(tmp_path):
+    import threading
+    base = str(tmp_path / "processed")
+    write_item(os.path.join(base, "20250101"), "item_1.json", {"id": "a", "hits": 0})
+    store = ItemStore(base, str(tmp_path / "locks"))
+    def bump(o):
+        o["hits"] += 1
+        return o
+    threads = [threading.Thread(target=lambda: [store.update("a", bump) for _ in range(25)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("a")[1]["hits"] == 200
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from pipeline import stages
+from pipeline.engine import Pipeline
+
+def fake_feed(url, limit=20):
+    n = 3 if "bbc" in url else 0
+    return [{
+        "id": f"{url}#{i}",
+        "title": f"Stock market rally number {i} lifts technology shares",
+        "summary": "Markets rose sharply today as investors welcomed strong earnings from several large companies.",
+        "published": "2025-01-0%dT10:00:00Z" % (i + 1)
+    } for i in range(n)]
+
+def test_pipeline_runs_in_process_with_timings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(stages, "fetch_rss", fake_feed)
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    p = Pipeline(checkpoint=False)
+    report = p.run(avatars=())
+    names = [s["stage"] for s in report["stages"]]
+    assert names == ["ingest", "process", "rank"]
+    assert report["stages"][0]["items"] == 3 and report["stages"][1]["items"] == 3
+    assert all(s["ok"] and s["seconds"] >= 0 for s in report["stages"])
+    assert not os.path.exists(tmp_path / "data" / "raw")
+    with open(tmp_path / "exports" / "weekly_report.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+    assert len(data["items"]) == 3
+
+def test_pipeline_checkpoint_writes_intermediate_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(stages, "fetch_rss", fake_feed)
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    report = Pipeline(checkpoint=True).run(avatars=())
+    day = os.listdir(tmp_path / "data" / "processed")[0]
+    assert len([f for f in os.listdir(tmp_path / "data" / "processed" / day) if f.startswith("item_")]) == 3
+    assert len(os.listdir(tmp_path / "data" / "raw" / day)) == len(stages.SOURCES)
+    assert report["feed"]["top_counts"]
+    # A second run only reprocesses what changed, like the scheduler, and
+    # still ranks the whole day.
+    again = Pipeline(checkpoint=True).run(avatars=())
+    assert again["stages"][1]["items"] == 0 and sum(again["feed"]["top_counts"].values()) == 3
+
+def test_pipeline_without_checkpoint_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(stages, "fetch_rss", fake_feed)
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    records = stages.process(stages.ingest(checkpoint=False), checkpoint=False)
+    assert len(records) == 3 and all(p is None for p, _ in records)
+    assert not os.path.exists(tmp_path / "trend.json") and not os.path.exists(tmp_path / "data")
+
+def test_stream_pipeline_exports_top_k(tmp_path, monkeypatch):
+    from pipeline.stream import stream_json
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(stages, "fetch_rss", fake_feed)
+    monkeypatch.setenv("TREND_STATE_PATH", str(tmp_path / "trend.json"))
+    report = Pipeline(checkpoint=False).run_stream(avatars=(), k=2, queue_size=1)
+    counts = {s["stage"]: s.get("items") for s in report["stages"]}
+    assert counts["ingest"] == 3 and counts["sentiment"] == 3
+    assert report["feed"]["seen"] == 3 and sum(report["feed"]["top_counts"].values()) == 2
+    items = list(stream_json(str(tmp_path / "exports" / "weekly_report.json")))
+    assert len(items) == 2
+    assert items[0]["priority_score"] >= items[1]["priority_score"]
+
+def test_bounded_applies_backpressure_and_reraises():
+    import time
+    from pipeline.stream import bounded
+    produced = []
+    def gen():
+        for i in range(10):
+            produced.append(i)
+            yield i
+        raise RuntimeError("boom")
+    it = bounded(gen(), 2)
+    assert next(it) == 0
+    time.sleep(0.3)
+    assert len(produced) <= 4
+    rest = []
+    try:
+        for x in it:
+            rest.append(x)
+    except RuntimeError:
+        rest.append("err")
+    assert rest == list(range(1, 10)) + ["err"]
+
+def test_stream_ranker_matches_full_sort_with_fixed_trend():
+    from agents.ranker import StreamRanker, iter_ranked
+    items = [{"id": str(i), "category": "general" if i % 2 else "sports", "polarity": ["positive", "neutral", "negative"][i % 3], "confidence": (i * 7 % 10) / 10.0, "timestamp": "2025-01-01T00:00:00"} for i in range(30)]
+    tscores = {"general": 0.5, "sports": 0.1}
+    r = StreamRanker(3, tscores)
+    for x in items:
+        r.push(dict(x))
+    got = [(x["id"], x["priority_score"]) for x in r.ranked()]
+    full = list(iter_ranked([dict(x) for x in items], tscores))
+    want = []
+    for c in ("general", "sports"):
+        want += [x for x in full if x["category"] == c][:3]
+    want.sort(key=lambda x: -x["priority_score"])
+    assert sorted(got) == sorted((x["id"], x["priority_score"]) for x in want)
+    assert [s for _, s in got] == sorted((s for _, s in got), reverse=True)
@@ -2,7 +2,7 @@ import os
 import sys
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT)
-from scripts.smart_feed import priority
+from agents.ranker import priority
 
 def test_priority_sorting():
     ts = {"general": 0.8}
@@ -10,4 +10,39 @@ def test_priority_sorting():
     b = {"category": "general", "polarity": "negative", "confidence_score": 0.1, "timestamp": "2025-11-21T00:00:00Z"}
     sa = priority(a, ts)
     sb = priority(b, ts)
-    assert sa >= sb
\ No newline at end of file
+    assert sa >= sb
+
+def test_rank_matches_priority_and_top_k():
+    from agents.ranker import rank, rank_top_k
+    from agents.trend import compute
+    items = []
+    for i, (cat, pol) in enumerate([("general", "positive"), ("general", "negative"), ("sports", "neutral"), ("general", "neutral"), ("sports", "positive")]):
+        items.append({"id": f"r{i}", "category": cat, "polarity": pol, "confidence_score": 0.1*i, "timestamp": "2025-11-21T00:00:00Z"})
+    ts = compute(items)
+    feed = rank(items)
+    assert [x["priority_score"] for x in feed] == sorted((priority(x, ts) for x in items), reverse=True)
+    top = rank_top_k(items, 2)
+    assert [x["id"] for x in top["general"]] == [x["id"] for x in feed if x["category"] == "general"][:2]
+    assert len(top["sports"]) == 2
+
+
+def test_category_top_k_heap():
+    from agents.ranker import CategoryTopK
+    top = CategoryTopK(2)
+    for i, s in enumerate([0.2, 0.9, 0.5, 0.9, 0.1]):
+        top.push({"id": f"h{i}", "category": "general", "priority_score": s})
+    assert [x["id"] for x in top.items()["general"]] == ["h1", "h3"]
+    assert top.counts() == {"general": 2}
+
+def test_export_weekly_reraises_after_abort(tmp_path, monkeypatch):
+    from agents.ranker import export_weekly
+    monkeypatch.chdir(tmp_path)
+    def feed():
+        yield {"id": "e1", "category": "general"}
+        raise RuntimeError("rank failed")
+    try:
+        export_weekly(feed())
+        assert False
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path / "exports") == []
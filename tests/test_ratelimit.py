@@ -0,0 +1,24 @@
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from server.ratelimit import RateLimiter, parse_rules
+
+def test_parse_rules():
+    assert parse_rules("/feedback=30/60, /feed=600/1,bad") == {"/feedback": (30, 60.0), "/feed": (600, 1.0)}
+
+def test_gcra_burst_refill_and_eviction():
+    lim = RateLimiter({"/feedback": (3, 3)}, sweep_seconds=1000)
+    t = 100.0
+    assert all(lim.allow("/feedback", "a", t)[0] for _ in range(3))
+    ok, wait = lim.allow("/feedback", "a", t)
+    assert not ok and abs(wait - 1.0) < 1e-9
+    assert lim.allow("/feedback", "b", t)[0]
+    assert lim.allow("/feed", "a", t) == (True, 0.0)
+    assert lim.allow("/feedback", "a", t + 1.0)[0]
+    assert not lim.allow("/feedback", "a", t + 1.0)[0]
+    assert lim.sweep(t + 2.0) == 1
+    assert lim.sweep(t + 10.0) == 1
+    st = lim.stats()
+    assert st["keys"] == 0 and st["evicted"] == 2
+    assert st["allowed"]["/feedback"] == 5 and st["limited"]["/feedback"] == 2
@@ -0,0 +1,59 @@
+import os
+import sys
+import hmac
+import hashlib
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from server.replay import NonceStore, TokenCache, ReplayGuard
+
+def sign(secret, msg):
+    return hmac.new(secret.encode("utf-8"), msg, hashlib.sha256).hexdigest()
+
+def test_nonce_store_rejects_reuse_and_expires():
+    s = NonceStore(ttl=60, buckets=6)
+    assert s.add("n1", now=1000)
+    assert not s.add("n1", now=1030)
+    for i in range(1000):
+        assert s.add(f"x{i}", now=1000 + i * 0.05)
+    assert s.add("n1", now=1200)
+    assert len(s) == 1
+    assert not s.add("n1", now=1201)
+
+def test_token_cache_lru_and_expiry():
+    c = TokenCache(max_entries=2)
+    c.put("a", "k", 100)
+    c.put("b", "k", 100)
+    assert c.get("a", "k", now=50)
+    c.put("c", "k", 100)
+    assert not c.get("b", "k", now=50)
+    assert c.get("a", "k", now=50)
+    assert not c.get("a", "other", now=50)
+    assert not c.get("a", "k", now=100)
+
+def test_guard_checks_signature_timestamp_and_nonce():
+    body = b'{"id": "x"}'
+    assert not ReplayGuard(window=30).check("s", "n1", sign("s", b"n1" + body), body)
+    g = ReplayGuard(window=30, require_timestamp=False)
+    assert g.check("s", "n1", sign("s", b"n1" + body), body)
+    assert not g.check("s", "n1", sign("s", b"n1" + body), body)
+    legacy = ReplayGuard(require_timestamp=False).legacy
+    legacy.add("n0", now=0)
+    assert not legacy.add("n0", now=legacy.ttl - 1)
+    assert legacy.add("n0", now=3 * legacy.ttl) and len(legacy) == 1
+    assert not g.check("s", "n2", "bad", body)
+    import time
+    ts = str(int(time.time()))
+    assert g.check("s", "n3", sign("s", ts.encode() + b"n3" + body), body, ts)
+    assert not g.check("s", "n3", sign("s", ts.encode() + b"n3" + body), body, ts)
+    old = str(int(time.time()) - 120)
+    assert not g.check("s", "n4", sign("s", old.encode() + b"n4" + body), body, old)
+    calls = []
+    def decode(t, s):
+        calls.append(t)
+        if t != "good":
+            raise ValueError("bad token")
+        return {"exp": time.time() + 60}
+    assert g.verify_token("good", "k", decode)
+    assert g.verify_token("good", "k", decode)
+    assert not g.verify_token("bad", "k", decode)
+    assert calls == ["good", "bad"]
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from pipeline.schedule import Scheduler, Stage, RunLock, parse_every, next_due
+
+def test_next_due_stays_on_wall_clock_grid():
+    assert parse_every("10m") == 600 and parse_every("hourly") == 3600 and parse_every("demand") is None
+    assert parse_every("weekly") == 3600 and parse_every("5x") == 3600 and parse_every("90s") == 90
+    assert next_due(1000, 600) == 1200
+    assert next_due(1200, 600) == 1800
+    assert next_due(1799.9, 600, anchor=30) == 1830
+
+def test_scheduler_counts_missed_slots_and_skips_unchanged_input(tmp_path):
+    calls = []
+    sig = ["a"]
+    stages = [
+        Stage("ingest", lambda: calls.append("ingest") or True, 600),
+        Stage("rank", lambda: calls.append("rank") or True, 1800, inputs=lambda: sig[0]),
+    ]
+    s = Scheduler(stages, state_path=str(tmp_path / "state.json"), lock_path=str(tmp_path / "run.lock"))
+    s.tick(100)
+    assert calls == ["ingest", "rank"]
+    assert s.state["ingest"]["next"] == 600
+    s.tick(500)
+    assert calls == ["ingest", "rank"]
+    s.tick(2500)
+    assert calls == ["ingest", "rank", "ingest"]
+    assert s.state["ingest"]["missed"] == 3 and s.state["ingest"]["next"] == 3000
+    assert s.state["rank"]["skips"] == 1
+    sig[0] = "b"
+    s.tick(3700)
+    assert calls[-1] == "rank"
+    again = Scheduler(stages, state_path=str(tmp_path / "state.json"), lock_path=str(tmp_path / "run.lock"))
+    assert again.state["ingest"]["missed"] == 4 and again.state["rank"]["hist"].n == 2
+
+def test_scheduler_runs_on_demand_and_respects_lock(tmp_path):
+    calls = []
+    lock_path = str(tmp_path / "run.lock")
+    s = Scheduler([Stage("audio", lambda: calls.append(1) or True)], state_path=str(tmp_path / "state.json"), lock_path=lock_path)
+    s.tick(0)
+    assert calls == []
+    s.trigger("audio")
+    held = RunLock(lock_path)
+    assert held.acquire()
+    s.tick(1)
+    assert calls == [] and s.state["audio"]["overlaps"] == 1
+    held.release()
+    s.tick(2)
+    assert calls == [1]
+    s.tick(3)
+    assert calls == [1]
+    with open(tmp_path / "state.json", "r", encoding="utf-8") as f:
+        assert json.load(f)["audio"]["hist"]["n"] == 1
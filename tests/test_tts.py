@@ -5,20 +5,211 @@ import json
 import subprocess
 import datetime as dt
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
 
-def today_dirs():
+def today_dirs(base):
     d = dt.datetime.utcnow().strftime("%Y%m%d")
-    pproc = os.path.join(ROOT, "data", "processed", d)
-    paud = os.path.join(ROOT, "data", "audio", d, "vaani")
+    pproc = os.path.join(base, "data", "processed", d)
+    paud = os.path.join(base, "data", "audio", d, "vaani")
     return pproc, paud
 
-def test_generate_audio_creates_wavs():
-    pproc, paud = today_dirs()
+def test_generate_audio_creates_wavs(tmp_path):
+    pproc, paud = today_dirs(str(tmp_path))
     os.makedirs(pproc, exist_ok=True)
     # Ensure at least one processed file exists
     sample = os.path.join(pproc, "item_999.json")
     with open(sample, "w", encoding="utf-8") as f:
         json.dump({"id": "t999", "title": "Test", "summary_short": "a", "summary_medium": "b", "category": "general", "language": "en", "polarity": "neutral", "confidence_score": 0.5, "tone": "calm", "timestamp": dt.datetime.utcnow().isoformat()}, f)
-    subprocess.run([sys.executable, os.path.join(ROOT, "scripts", "generate_audio.py"), "--avatar", "vaani", "--voice", "default", "--limit", "1"], check=False, cwd=ROOT)
+    subprocess.run([sys.executable, os.path.join(ROOT, "scripts", "generate_audio.py"), "--avatar", "vaani", "--voice", "default", "--limit", "1"], check=False, cwd=str(tmp_path))
     files = glob.glob(os.path.join(paud, "*.wav"))
-    assert len(files) >= 1
\ No newline at end of file
+    assert len(files) >= 1
+
+
+def _wav_bytes(frames=800):
+    import io
+    import wave
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\x00\x00" * frames)
+    return buf.getvalue()
+
+def test_generate_audio_multiple_avatars_one_run(tmp_path):
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    body = _wav_bytes()
+    hits = []
+    class H(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            hits.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/wav")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *a):
+            pass
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        proc = tmp_path / "data" / "processed" / "20250101"
+        proc.mkdir(parents=True)
+        for i in range(3):
+            (proc / f"item_{i}.json").write_text(json.dumps({"id": f"t{i}", "summary_medium": f"text {i}", "tone": "calm", "language": "en"}))
+        env = dict(os.environ, VAANI_TTS_URL=f"http://127.0.0.1:{srv.server_address[1]}/tts", PYTHONPATH=ROOT, TTS_CACHE_DIR=str(tmp_path / "cache"))
+        cmd = [sys.executable, os.path.join(ROOT, "scripts", "generate_audio.py"), "--avatars", "asha,dev", "--date", "20250101", "--limit", "10", "--all"]
+        first = json.loads(subprocess.run(cmd, check=True, cwd=str(tmp_path), env=env, capture_output=True, text=True).stdout)
+        second = json.loads(subprocess.run(cmd, check=True, cwd=str(tmp_path), env=env, capture_output=True, text=True).stdout)
+    finally:
+        srv.shutdown()
+    # Both avatars share a voice, so each script is synthesized once and the
+    # second run is served entirely from the cache.
+    assert len(hits) == 3
+    assert first["cache"] == {"hits": 3, "misses": 3}
+    assert second["cache"] == {"hits": 6, "misses": 0}
+    obj = json.loads((proc / "item_1.json").read_text())
+    assert set(obj["audio_paths"]) == {"asha", "dev"}
+    assert obj["avatar"] == "dev" and obj["synthesis_status"] == "success"
+    assert obj["audio_duration"] == 0.1
+    assert os.path.exists(tmp_path / obj["audio_paths"]["asha"])
+    assert obj["audio_hashes"]["asha"] == obj["audio_hashes"]["dev"]
+
+def test_audio_cache_lru_by_bytes(tmp_path):
+    from tts.cache import AudioCache, cache_key
+    src = tmp_path / "a.wav"
+    src.write_bytes(b"x" * 100)
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=250)
+    k1, k2, k3 = (cache_key(t, "v", "calm", "en", "pyttsx3") for t in ("one", "two", "three"))
+    cache.put(k1, str(src))
+    cache.put(k2, str(src))
+    assert cache.materialize(k1, str(tmp_path / "out.wav"))
+    cache.put(k3, str(src))
+    assert cache.get(k2) is None
+    assert cache.get(k1) and cache.get(k3)
+    reopened = AudioCache(str(tmp_path / "cache"), max_bytes=250)
+    assert reopened.stats()["entries"] == 2 and reopened.stats()["bytes"] == 200
+    assert (tmp_path / "out.wav").read_bytes() == b"x" * 100
+
+def test_local_host_restarts_after_timeout():
+    from tts.fallback import LocalTTSHost
+    host = LocalTTSHost(timeout=0.001)
+    try:
+        assert host.synthesize("hello", out_path=None) is None
+        assert host.restarts == 1 and host.proc is None
+        host.timeout = 30
+        host.synthesize("hello", out_path=None)
+        assert host.proc is not None and host.proc.is_alive()
+    finally:
+        host.close()
+
+def test_vaani_streams_base64_json_to_part_then_file(tmp_path, monkeypatch):
+    import base64
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from tts import vaani_client
+    audio = _wav_bytes(30000)
+    payload = json.dumps({"ok": True, "audio_base64": base64.b64encode(audio).decode()}).replace("/", "\\/").encode()
+    class H(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            for i in range(0, len(payload), 7001):
+                self.wfile.write(payload[i:i+7001])
+        def log_message(self, *a):
+            pass
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setenv("VAANI_TTS_URL", f"http://127.0.0.1:{srv.server_address[1]}/tts")
+    try:
+        out = str(tmp_path / "x.wav")
+        assert vaani_client.synthesize("hi", out_path=out) == out
+        assert not os.path.exists(out + ".part")
+        with open(out, "rb") as f:
+            assert f.read() == audio
+        chunks = []
+        assert vaani_client.synthesize_stream("hi", chunks.append)
+        assert b"".join(chunks) == audio and len(chunks) > 1
+        assert vaani_client.synthesize("hi") == audio
+    finally:
+        srv.shutdown()
+
+def test_split_sentences_and_concat_wavs(tmp_path):
+    from tts.longform import split_sentences, concat_wavs
+    text = "First one. Second sentence here! Third? " + "word " * 30
+    chunks = split_sentences(text, max_chars=40)
+    assert chunks[0] == "First one. Second sentence here! Third?"
+    assert all(len(c) <= 40 for c in chunks)
+    assert " ".join(chunks).split() == text.split()
+    paths = []
+    for i, n in enumerate((800, 1600)):
+        p = tmp_path / f"{i}.wav"
+        p.write_bytes(_wav_bytes(n))
+        paths.append(str(p))
+    out = str(tmp_path / "out.wav")
+    assert concat_wavs(paths, out) == 0.3
+    import wave
+    with wave.open(out, "rb") as w:
+        assert w.getnframes() == 2400 and w.getframerate() == 8000
+    bad = tmp_path / "bad.wav"
+    bad.write_bytes(b"nope")
+    try:
+        concat_wavs(paths + [str(bad)], out)
+        assert False
+    except ValueError:
+        pass
+    assert not os.path.exists(out + ".part")
+
+def test_pool_chunks_long_scripts_in_parallel(tmp_path, monkeypatch):
+    from tts import pool as pool_mod
+    calls = []
+    def fake_vaani(text, voice="default", tone="calm", lang="en", out_path=None):
+        calls.append(text)
+        with open(out_path, "wb") as f:
+            f.write(_wav_bytes(800))
+        return out_path
+    monkeypatch.setenv("VAANI_TTS_URL", "http://unused")
+    monkeypatch.setenv("TTS_CHUNK_CHARS", "30")
+    monkeypatch.setattr(pool_mod, "vaani_synth", fake_vaani)
+    text = "One short sentence. " * 12
+    with pool_mod.SynthesisPool(cache=False) as pool:
+        ok, status, key, dur = pool.submit(text, "v", "calm", "en", str(tmp_path / "long.wav")).result()
+    assert ok and status == "success"
+    assert len(calls) == 12 and dur == 1.2
+    assert sorted(os.listdir(tmp_path)) == ["long.wav"]
+
+def test_pool_prefers_remote_over_cached_fallback(tmp_path, monkeypatch):
+    from tts import pool as pool_mod
+    from tts.cache import AudioCache
+    up = [False]
+    remote, local = [], []
+    def fake_vaani(text, voice="default", tone="calm", lang="en", out_path=None):
+        remote.append(text)
+        if not up[0]:
+            return None
+        with open(out_path, "wb") as f:
+            f.write(_wav_bytes(800))
+        return out_path
+    def fake_local(self, text, voice, tone, lang, out_path, simplify=True):
+        local.append(text)
+        with open(out_path, "wb") as f:
+            f.write(_wav_bytes(400))
+        return out_path
+    monkeypatch.setenv("VAANI_TTS_URL", "http://unused")
+    monkeypatch.setattr(pool_mod, "vaani_synth", fake_vaani)
+    monkeypatch.setattr(pool_mod.SynthesisPool, "_fallback", fake_local)
+    cache = AudioCache(str(tmp_path / "cache"))
+    out = str(tmp_path / "a.wav")
+    with pool_mod.SynthesisPool(cache=cache) as pool:
+        assert pool.submit("Hello there.", "v", "calm", "en", out).result()[1] == "fallback"
+        assert pool.submit("Hello there.", "v", "calm", "en", out).result()[1] == "fallback"
+        assert len(remote) == 2 and len(local) == 1
+        up[0] = True
+        assert pool.submit("Hello there.", "v", "calm", "en", out).result()[1] == "success"
+        assert pool.submit("Hello there.", "v", "calm", "en", out).result()[1] == "success"
+    assert len(remote) == 3 and len(local) == 1
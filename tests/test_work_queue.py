@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from agents.db import Database
+from agents.work_queue import RequeueQueue
+
+def test_priority_order_dedupe_and_visibility(tmp_path):
+    q = RequeueQueue(Database(str(tmp_path / "q.db")), visibility=60, max_attempts=2)
+    q.push("a", "queue", 0.2, 0.9, now=0)
+    q.push("b", "queue", 0.8, 0.1, now=1)
+    q.push("c", "queue", 0.8, 0.5, now=2)
+    q.push("a", "requeue", 0.1, -0.2, now=3)
+    assert q.depth(now=3)["depth"] == 3
+    got = q.claim(2, now=10)
+    assert [e["id"] for e in got] == ["c", "b"]
+    assert q.depth(now=10) == {"depth": 3, "ready": 1, "in_flight": 2, "dropped": 0}
+    a = q.claim(5, now=11)
+    assert [(e["id"], e["action"], e["priority"]) for e in a] == [("a", "requeue", 0.2)]
+    assert q.ack(got[0], now=12)
+    assert [e["id"] for e in q.claim(5, now=80)] == ["b", "a"]
+    assert q.claim(5, now=200) == []
+    assert q.depth(now=200)["depth"] == 0 and q.dropped == 2
+
+def test_push_while_claimed_survives_ack(tmp_path):
+    q = RequeueQueue(Database(str(tmp_path / "q.db")), visibility=60)
+    q.push("x", "queue", 0.5, 0.0, now=0)
+    e = q.claim(1, now=1)[0]
+    q.push("x", "queue", 0.5, 0.0, now=2)
+    assert not q.ack(e, now=3)
+    again = q.claim(1, now=4)
+    assert [x["id"] for x in again] == ["x"] and again[0]["attempts"] == 1
+    assert q.ack(again[0], now=5)
+
+def test_drain_resummarizes_and_acks(tmp_path, monkeypatch):
+    from pipeline import requeue, stages
+    from agents.item_store import ItemStore
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "news.db"))
+    import agents.db
+    agents.db.reset_default_db()
+    raw = {"id": "r1", "title": "Stock market rally lifts technology shares", "summary": "Markets rose sharply today as investors welcomed strong earnings.", "published": "2025-01-01T10:00:00Z"}
+    os.makedirs("data/raw/20250101")
+    with open("data/raw/20250101/rss_1.json", "w", encoding="utf-8") as f:
+        json.dump({"items": [raw]}, f)
+    os.makedirs("data/processed/20250101")
+    path = os.path.join("data", "processed", "20250101", stages.item_filename("r1"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"id": "r1", "title": "old", "summary_medium": "stale", "reward_score": -0.5, "requeue_requested": True, "audio_paths": {"asha": "x.wav"}}, f)
+    calls = []
+    def fake_synth(records, avatars, **kw):
+        calls.append((len(records), avatars))
+        # feedback landing while the item is being synthesized
+        ItemStore().update_fields("r1", {"reward_score": 0.8})
+        for _, o in records:
+            o["audio_paths"] = {"asha": "new.wav"}
+        return records, {}
+    monkeypatch.setattr(stages, "synthesize", fake_synth)
+    monkeypatch.setattr(requeue, "default_store", lambda: ItemStore())
+    q = RequeueQueue(Database(str(tmp_path / "news.db")))
+    q.push("r1", "requeue", 0.3, -0.5)
+    q.push("gone", "queue", 0.9, 0.5)
+    res = requeue.drain(queue=q)
+    assert res["claimed"] == 2 and res["done"] == 1 and res["missing"] == 1
+    assert res["queue"]["depth"] == 0
+    assert calls == [(1, ["asha"])]
+    _, obj = agents.db.default_db().get_item("r1")
+    assert obj["title"].startswith("Stock market") and "requeue_requested" not in obj
+    with open(path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    assert obj["title"].startswith("Stock market") and obj["reward_score"] == 0.8
+    assert obj["audio_paths"] == {"asha": "new.wav"} and "requeue_requested" not in obj
+    assert os.listdir("data/locks")
+    agents.db.reset_default_db()
+
+def test_failed_drain_is_retried_later(tmp_path, monkeypatch):
+    from pipeline import requeue, stages
+    from agents.item_store import ItemStore
+    monkeypatch.setenv("REQUEUE_RETRY_SECONDS", "30")
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "news.db"))
+    import agents.db
+    agents.db.reset_default_db()
+    day = tmp_path / "processed" / "20250101"
+    day.mkdir(parents=True)
+    (day / "item_a.json").write_text(json.dumps({"id": "q1", "title": "t"}))
+    store = ItemStore(str(tmp_path / "processed"), str(tmp_path / "locks"))
+    monkeypatch.setattr(requeue, "default_store", lambda: store)
+    def broken(records, avatars, **kw):
+        raise RuntimeError("tts down")
+    monkeypatch.setattr(stages, "synthesize", broken)
+    q = RequeueQueue(Database(str(tmp_path / "news.db")))
+    q.push("q1", "queue", 0.5, 0.0)
+    before = q.signature()
+    res = requeue.drain(queue=q)
+    assert res["done"] == 0 and res["queue"] == {"depth": 1, "ready": 0, "in_flight": 1, "dropped": 0}
+    after = q.signature()
+    assert after == "empty" != before
+    assert q.signature(now=time.time() + 31) not in (before, after)
+    assert [e["attempts"] for e in q.claim(5, now=time.time() + 31)] == [2]
+    agents.db.reset_default_db()
@@ -0,0 +1,71 @@
+import os
+import re
+import wave
+
+SENTENCE_END = re.compile(r"(?<=[.!?।])[\"')\]]*\s+")
+
+def split_sentences(text, max_chars=None):
+    # Sentences packed greedily into chunks of at most max_chars; a single
+    # sentence longer than that is cut at the last space that fits.
+    limit = int(max_chars or os.environ.get("TTS_CHUNK_CHARS", "400"))
+    t = " ".join((text or "").split())
+    if not t:
+        return []
+    pieces = []
+    for s in SENTENCE_END.split(t):
+        s = s.strip()
+        while len(s) > limit:
+            cut = s.rfind(" ", 0, limit + 1)
+            if cut <= 0:
+                cut = limit
+            pieces.append(s[:cut].strip())
+            s = s[cut:].strip()
+        if s:
+            pieces.append(s)
+    chunks = []
+    cur = ""
+    for p in pieces:
+        if cur and len(cur) + 1 + len(p) > limit:
+            chunks.append(cur)
+            cur = p
+        else:
+            cur = (cur + " " + p) if cur else p
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def concat_wavs(paths, out_path):
+    # Appends PCM frames of same-format WAVs with no re-encoding. Returns the
+    # duration in seconds from the summed frame counts; raises ValueError if
+    # the inputs differ in channels, width, rate or compression or are not
+    # readable WAVs.
+    if not paths:
+        raise ValueError("no wav chunks to join")
+    part = out_path + ".part"
+    frames = 0
+    params = None
+    try:
+        with wave.open(part, "wb") as out:
+            for p in paths:
+                with wave.open(p, "rb") as w:
+                    fmt = (w.getnchannels(), w.getsampwidth(), w.getframerate(), w.getcomptype())
+                    if params is None:
+                        params = fmt
+                        out.setnchannels(fmt[0])
+                        out.setsampwidth(fmt[1])
+                        out.setframerate(fmt[2])
+                    elif fmt != params:
+                        raise ValueError(f"wav format mismatch in {p}: {fmt} != {params}")
+                    n = w.getnframes()
+                    out.writeframes(w.readframes(n))
+                    frames += n
+        os.replace(part, out_path)
+    except Exception as e:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        if isinstance(e, (wave.Error, EOFError)):
+            raise ValueError(f"unreadable wav chunk: {e}") from e
+        raise
+    return round(frames / float(params[2]), 2) if params else 0.0
@@ -0,0 +1,211 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tts.vaani_client import synthesize as vaani_synth
+from tts.fallback import simplify_text, LocalTTSHost
+from tts.cache import AudioCache, cache_key
+from tts.longform import split_sentences, concat_wavs
+
+class SynthesisPool:
+    # Remote Vaani calls are network-bound, so they run on a thread pool. The
+    # pyttsx3 fallback is CPU-bound and not thread-safe, so it goes to a few
+    # LocalTTSHost processes, each started on first use and kept warm. Scripts
+    # longer than one chunk are split at sentence boundaries, the chunks run
+    # on their own pool and are joined frame-for-frame with `wave`.
+    def __init__(self, remote_workers=None, local_workers=None, cache=None):
+        self.remote_workers = int(remote_workers or os.environ.get("TTS_REMOTE_WORKERS", "8"))
+        self.local_workers = int(local_workers or os.environ.get("TTS_LOCAL_WORKERS", "2"))
+        self.remote = ThreadPoolExecutor(max_workers=self.remote_workers, thread_name_prefix="tts")
+        self.chunker = ThreadPoolExecutor(max_workers=int(os.environ.get("TTS_CHUNK_WORKERS", str(self.remote_workers))), thread_name_prefix="tts-chunk")
+        self.longform = os.environ.get("TTS_LONGFORM", "1") != "0"
+        self.hosts = [LocalTTSHost() for _ in range(max(1, self.local_workers))]
+        self.free = queue.Queue()
+        for h in self.hosts:
+            self.free.put(h)
+        self.lock = threading.Lock()
+        if cache is None and os.environ.get("TTS_CACHE", "1") != "0":
+            cache = AudioCache()
+        self.cache = cache or None
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fallback(self, text, voice, tone, lang, out_path, simplify=True):
+        host = self.free.get()
+        try:
+            return host.synthesize(simplify_text(text) if simplify else text, voice=voice, tone=tone, lang=lang, out_path=out_path)
+        finally:
+            self.free.put(host)
+
+    def _chunks(self, text):
+        if not self.longform:
+            return None
+        chunks = split_sentences(text)
+        return chunks if len(chunks) > 1 else None
+
+    def _keys(self, text, voice, tone, lang, chunks=None):
+        # Each engine is keyed on the text it actually receives; the local
+        # fallback only sees the simplified script unless it is chunked. With
+        # Vaani configured the fallback key is only looked up once Vaani has
+        # failed for the request, so a clip cached during an outage is not
+        # served in place of remote audio later.
+        keys = []
+        if os.environ.get("VAANI_TTS_URL"):
+            keys.append((cache_key(text, voice, tone, lang, "vaani"), "success"))
+        if chunks:
+            keys.append((cache_key(text, voice, tone, lang, "pyttsx3-long"), "fallback"))
+        else:
+            keys.append((cache_key(simplify_text(text), voice, tone, lang, "pyttsx3"), "fallback"))
+        return keys
+
+    def _from_cache(self, keys, out_path):
+        for key, status in keys:
+            try:
+                if self.cache.materialize(key, out_path):
+                    return key, status
+            except OSError:
+                continue
+        return None
+
+    def _cached_fallback(self, keys, out_path):
+        if self.cache is None:
+            return None
+        return self._from_cache(keys[-1:], out_path)
+
+    def _synthesize(self, keys, text, voice, tone, lang, out_path, chunks=None):
+        # (ok, status, key, duration, cached). out_path may be a hard link to
+        # an older cache entry; engines write in place, so unlink first rather
+        # than truncate the shared file.
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+        if chunks:
+            return self._synthesize_chunks(keys, chunks, voice, tone, lang, out_path)
+        if len(keys) > 1:
+            res = vaani_synth(text, voice=voice, tone=tone, lang=lang, out_path=out_path)
+            if isinstance(res, str) and os.path.exists(res):
+                return True, "success", keys[0][0], None, False
+            hit = self._cached_fallback(keys, out_path)
+            if hit:
+                return True, hit[1], hit[0], None, True
+        res = self._fallback(text, voice, tone, lang, out_path)
+        if isinstance(res, str) and os.path.exists(res):
+            return True, "fallback", keys[-1][0], None, False
+        return False, "failed", None, None, False
+
+    def _chunk(self, text, voice, tone, lang, out_path, remote):
+        if remote:
+            res = vaani_synth(text, voice=voice, tone=tone, lang=lang, out_path=out_path)
+            return "success" if isinstance(res, str) and os.path.exists(res) else None
+        res = self._fallback(text, voice, tone, lang, out_path, simplify=False)
+        return "fallback" if isinstance(res, str) and os.path.exists(res) else None
+
+    def _local_chunks(self, chunks, voice, tone, lang, paths, idx):
+        futs = [self.chunker.submit(self._chunk, chunks[i], voice, tone, lang, paths[i], False) for i in idx]
+        return [f.result() for f in futs]
+
+    def _synthesize_chunks(self, keys, chunks, voice, tone, lang, out_path):
+        paths = [f"{out_path}.{i}.chunk.wav" for i in range(len(chunks))]
+        results = [None] * len(chunks)
+        try:
+            if len(keys) > 1:
+                futs = [self.chunker.submit(self._chunk, c, voice, tone, lang, p, True) for c, p in zip(chunks, paths)]
+                results = [f.result() for f in futs]
+                if not all(results):
+                    hit = self._cached_fallback(keys, out_path)
+                    if hit:
+                        return True, hit[1], hit[0], None, True
+            missing = [i for i, r in enumerate(results) if not r]
+            for i, r in zip(missing, self._local_chunks(chunks, voice, tone, lang, paths, missing)):
+                results[i] = r
+            if not all(results):
+                return False, "failed", None, None, False
+            try:
+                dur = concat_wavs(paths, out_path)
+            except ValueError:
+                # Vaani and pyttsx3 chunks rarely share a sample format; redo
+                # the remote ones locally so the frames can be joined as-is.
+                redo = [i for i, r in enumerate(results) if r == "success"]
+                if not redo or not all(self._local_chunks(chunks, voice, tone, lang, paths, redo)):
+                    return False, "failed", None, None, False
+                results = ["fallback"] * len(results)
+                try:
+                    dur = concat_wavs(paths, out_path)
+                except ValueError:
+                    return False, "failed", None, None, False
+            if all(r == "success" for r in results):
+                return True, "success", keys[0][0], dur, False
+            return True, "fallback", keys[-1][0], dur, False
+        finally:
+            for p in paths:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _run(self, text, voice, tone, lang, out_path):
+        chunks = self._chunks(text)
+        keys = self._keys(text, voice, tone, lang, chunks)
+        if self.cache is None:
+            return self._synthesize(keys, text, voice, tone, lang, out_path, chunks)[:4]
+        hit = self._from_cache(keys[:1], out_path)
+        if hit:
+            self._count(True)
+            return True, hit[1], hit[0], None
+        # Identical scripts (e.g. several avatars sharing a voice) are only
+        # synthesized once; later jobs wait for the first and link its output.
+        primary = keys[0][0]
+        with self.lock:
+            ev = self.inflight.get(primary)
+            owner = ev is None
+            if owner:
+                ev = self.inflight[primary] = threading.Event()
+        if not owner:
+            ev.wait()
+            hit = self._from_cache(keys[:1], out_path)
+            if hit:
+                self._count(True)
+                return True, hit[1], hit[0], None
+        try:
+            ok, status, key, dur, cached = self._synthesize(keys, text, voice, tone, lang, out_path, chunks)
+            self._count(cached)
+            if ok and not cached:
+                try:
+                    self.cache.put(key, out_path)
+                except OSError:
+                    pass
+            return ok, status, key, dur
+        finally:
+            if owner:
+                with self.lock:
+                    self.inflight.pop(primary, None)
+                ev.set()
+
+    def submit(self, text, voice, tone, lang, out_path):
+        # Future resolving to (ok, status, audio_hash, duration); status is
+        # success/fallback/failed, cache hits report the engine that
+        # originally produced the audio, and duration is only known (from
+        # frame counts) for chunked synthesis.
+        return self.remote.submit(self._run, text, voice, tone, lang, out_path)
+
+    def close(self):
+        self.remote.shutdown(wait=True)
+        self.chunker.shutdown(wait=True)
+        for h in self.hosts:
+            h.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False